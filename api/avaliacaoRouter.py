@@ -1,35 +1,64 @@
+import os
+import asyncio
 from fastapi import APIRouter, Request
 from services.avaliacaoService import avaliar
 
 router = APIRouter()
 
+# Avaliações simultâneas (cada uma é uma chamada longa ao gpt-5) e limite de tempo por item
+AVALIACAO_CONCORRENCIA = int(os.getenv("AVALIACAO_CONCORRENCIA", "5"))
+AVALIACAO_TIMEOUT_S = float(os.getenv("AVALIACAO_TIMEOUT_S", "120"))
+
+async def _avaliar_item(a: dict, semaforo: asyncio.Semaphore) -> dict:
+    async with semaforo:
+        try:
+            resultado = await asyncio.wait_for(
+                avaliar(
+                    pergunta=a["pergunta"],
+                    resposta=a["resposta"],
+                    chunks=a.get("chunks")
+                ),
+                timeout=AVALIACAO_TIMEOUT_S
+            )
+        except asyncio.TimeoutError:
+            return {
+                "pergunta": a.get("pergunta"),
+                "resposta": a.get("resposta"),
+                "erro": f"Tempo limite de {AVALIACAO_TIMEOUT_S:g}s excedido"
+            }
+        except Exception as e:
+            return {
+                "pergunta": a.get("pergunta"),
+                "resposta": a.get("resposta"),
+                "erro": str(e)
+            }
+
+    return {
+        "pergunta": a["pergunta"],
+        "resposta": a["resposta"],
+        "precisao": resultado["precisao"],
+        "cobertura": resultado["cobertura"],
+        "recall3": resultado["recall3"],
+        "justificativa": resultado["justificativa"],
+        "fontes": resultado["fontes"]
+    }
+
 @router.post("/api/rag/avaliar")
 async def avaliar_respostas(request: Request):
     body = await request.json()
     avaliacoes_input = body.get("avaliacoes", [])
 
-    resultados = []
-
-    for a in avaliacoes_input:
-        resultado = await avaliar(
-            pergunta=a["pergunta"],
-            resposta=a["resposta"]
-        )
-        resultados.append({
-            "pergunta": a["pergunta"],
-            "resposta": a["resposta"],
-            "precisao": resultado["precisao"],
-            "cobertura": resultado["cobertura"],
-            "recall3": resultado["recall3"],
-            "justificativa": resultado["justificativa"],
-            "fontes": resultado["fontes"]
-        })
-
-    # Calcular médias
-    total = len(resultados)
-    media_precisao = sum(r["precisao"] for r in resultados) / total
-    media_cobertura = sum(r["cobertura"] for r in resultados) / total
-    media_recall = sum(r["recall3"] for r in resultados) / total
+    semaforo = asyncio.Semaphore(max(1, AVALIACAO_CONCORRENCIA))
+    resultados = await asyncio.gather(
+        *(_avaliar_item(a, semaforo) for a in avaliacoes_input)
+    )
+
+    # Calcular médias (apenas itens avaliados com sucesso)
+    ok = [r for r in resultados if "erro" not in r]
+    total = len(ok)
+    media_precisao = sum(r["precisao"] for r in ok) / total if total else 0
+    media_cobertura = sum(r["cobertura"] for r in ok) / total if total else 0
+    media_recall = sum(r["recall3"] for r in ok) / total if total else 0
 
     return {
         "metricas": {
@@ -37,5 +66,6 @@ async def avaliar_respostas(request: Request):
             "mediaCobertura": round(media_cobertura, 2),
             "mediaRecall": round(media_recall, 2)
         },
-        "avaliacoes": resultados
+        "avaliacoes": resultados,
+        "falhas": len(resultados) - total
     }
@@ -1,7 +1,8 @@
 # api/chatRouter.py
 from fastapi import APIRouter, Body, Query
 from pydantic import BaseModel
-from services.chatService import chat_with_rag, new_session_id, reset_history
+from services.chatService import chat_with_rag, chat_with_rag_stream, new_session_id, reset_history
+from services.sseService import resposta_sse
 
 router = APIRouter()
 
@@ -15,7 +16,12 @@ async def chat_message(payload: ChatInput):
     result = await chat_with_rag(session_id, payload.message)
     return result
 
+@router.post("/api/chat/message/stream")
+async def chat_message_stream(payload: ChatInput):
+    session_id = payload.session_id or new_session_id()
+    return resposta_sse(chat_with_rag_stream(session_id, payload.message))
+
 @router.post("/api/chat/reset")
-async def chat_reset(session_id: str = Query(...)):
+def chat_reset(session_id: str = Query(...)):
     reset_history(session_id)
     return {"ok": True}
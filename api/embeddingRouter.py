@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+from services.embeddingService import estatisticas
+
+router = APIRouter()
+
+@router.get('/api/embeddings/cache', summary="Estatísticas do cache de embeddings")
+async def cache_embeddings_router():
+    return estatisticas()
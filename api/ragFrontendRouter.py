@@ -12,7 +12,7 @@ async def responder_frontend(request: Request):
         return {"resposta": "❌ Nenhuma pergunta fornecida."}
 
     try:
-        resposta = responder_simples(pergunta)
+        resposta = await responder_simples(pergunta)
         return {"resposta": resposta}
     except Exception as e:
         return {"resposta": f"❌ Erro ao gerar resposta: {str(e)}"}
@@ -2,7 +2,8 @@
 
 from fastapi import APIRouter
 from pydantic import BaseModel
-from services.ragService import gerar_resposta_com_citacoes
+from services.ragService import gerar_resposta_com_citacoes, gerar_resposta_com_citacoes_stream
+from services.sseService import resposta_sse
 from services.avaliacaoService import avaliar  # sua função que já calcula métricas
 
 router = APIRouter()
@@ -28,4 +29,22 @@ async def responder_avaliar(dados: Pergunta):
         "resposta": result["resposta"],
         "fontes": result["fontes"],
         "avaliacao": metricas,
+        "tempos": result["tempos"],
+        "tokens": result.get("tokens"),
+        "cache": result["cache"],
     }
+
+async def _stream_com_avaliacao(pergunta: str):
+    async for evento, dados in gerar_resposta_com_citacoes_stream(pergunta):
+        yield evento, dados
+        if evento == "fim":
+            metricas = await avaliar(
+                pergunta=pergunta,
+                resposta=dados["resposta"],
+                chunks=[f["trecho"] for f in dados["fontes"]]
+            )
+            yield "avaliacao", metricas
+
+@router.post("/api/rag/pergunta/stream")
+async def responder_avaliar_stream(dados: Pergunta):
+    return resposta_sse(_stream_com_avaliacao(dados.pergunta))
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.telemetriaService import metricas_prometheus
+
+router = APIRouter()
+
+@router.get('/metrics', summary="Métricas no formato texto do Prometheus", response_class=PlainTextResponse)
+async def metrics_router():
+    return PlainTextResponse(metricas_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
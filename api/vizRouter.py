@@ -1,8 +1,9 @@
 # api/vizRouter.py
-from fastapi import APIRouter
+import json
+from fastapi import APIRouter, HTTPException, Query, Response
 from pydantic import BaseModel
-from services.vizService import project_space, build_heatmap
 
+# vizService/projecaoService (NumPy, índice) só são importados na primeira chamada a /api/viz
 router = APIRouter()
 
 class VizInput(BaseModel):
@@ -12,8 +13,48 @@ class VizInput(BaseModel):
 
 @router.post("/api/viz/space")
 def viz_space(payload: VizInput):
+    from services.vizService import project_space
     return project_space(pergunta=payload.pergunta, resposta=payload.resposta, top_k=payload.top_k)
 
 @router.post("/api/viz/heatmap")
 def viz_heatmap(payload: VizInput):
+    from services.vizService import build_heatmap
     return build_heatmap(pergunta=payload.pergunta, resposta=payload.resposta, top_k=payload.top_k)
+
+@router.post("/api/viz/combinado")
+def viz_combinado(payload: VizInput):
+    from services.vizService import build_viz
+    # scatter + heatmap numa chamada: 1 embedding (pergunta/resposta) e 1 consulta ao índice
+    return build_viz(pergunta=payload.pergunta, resposta=payload.resposta, top_k=payload.top_k)
+
+@router.get("/api/viz/mapa")
+def viz_mapa(
+    formato: str = Query("json", pattern="^(json|binario)$"),
+    pagina: int = Query(0, ge=0),
+    tamanho: int = Query(5000, ge=0, le=200000),
+):
+    """
+    Mapa 2D pré-calculado de todo o corpus.
+    json: página com [x, y, código da categoria] + ids.
+    binario: registros de 10 bytes (x, y float32; categoria uint16), `tamanho=0` = corpus inteiro.
+    """
+    from services.projecaoService import mapa_binario, pagina_mapa
+
+    if formato == "binario":
+        dados = mapa_binario(pagina, tamanho)
+        if dados is None:
+            raise HTTPException(status_code=404, detail="Projeção não gerada; rode a ingestão.")
+        return Response(
+            content=dados["conteudo"],
+            media_type="application/octet-stream",
+            headers={
+                "X-Total": str(dados["total"]),
+                "X-Inicio": str(dados["inicio"]),
+                # ASCII puro no header: categorias com acento vão escapadas
+                "X-Categorias": json.dumps(dados["categorias"]),
+            },
+        )
+    dados = pagina_mapa(pagina, tamanho or 5000)
+    if dados is None:
+        raise HTTPException(status_code=404, detail="Projeção não gerada; rode a ingestão.")
+    return dados
@@ -0,0 +1,300 @@
+# bench/carga.py
+"""
+Teste de carga da API sem chamadas pagas: sobe o app FastAPI em processo com
+dublês da OpenAI e do índice vetorial (bench/falsos.py), dispara cada cenário
+com N requisições simultâneas e reporta vazão e latência p50/p95/p99.
+
+    python bench/carga.py --concorrencia 10 --requisicoes 100 --saida bench/resultados/atual.json
+    python bench/carga.py --cenarios chat,rag_pergunta --perfil chat=1500:0.5:0.02
+    python bench/carga.py --escala 0.05 --comparar bench/resultados/base.json
+
+Perfis: "servico=mediana_ms[:sigma[:falhas]]" (log-normal); serviços: chat,
+classificacao, avaliacao, embedding, whisper, tts, indice. `--escala`
+multiplica todas as latências (0.05 = rodada rápida de fumaça).
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench.falsos import IndiceFalso, OpenAIFalsoAsync, OpenAIFalsoSync, Perfil, VetoresFalsos  # noqa: E402
+
+PERFIS_PADRAO = {
+    "chat": "900:0.4",
+    "classificacao": "350:0.3",
+    "avaliacao": "2500:0.4",
+    "embedding": "120:0.3",
+    "whisper": "600:0.3",
+    "tts": "500:0.3",
+    "indice": "40:0.3",
+}
+RESPOSTA_FALSA = (
+    "Resumo: o processo segue as etapas descritas na política interna. "
+    "• Verificação cadastral completa • Validação em bureaus externos • Aprovação pelo comitê"
+)
+
+
+# === Corpus e perguntas ===
+def carregar_corpus(caminho: str, tamanho: int) -> List[Dict[str, Any]]:
+    """Chunks da ingestão, replicados (com ids novos) até `tamanho` se pedido."""
+    with open(caminho, "r", encoding="utf-8") as f:
+        base = [json.loads(linha) for linha in f if linha.strip()]
+    corpus = list(base)
+    copia = 1
+    while len(corpus) < tamanho:
+        for c in base:
+            if len(corpus) >= tamanho:
+                break
+            # sentenças rotacionadas: conteúdo parecido, não idêntico
+            sentencas = c["content"].split(". ")
+            k = copia % len(sentencas)
+            corpus.append({**c, "id": f"{c['id']}#r{copia}", "content": ". ".join(sentencas[k:] + sentencas[:k])})
+        copia += 1
+    return corpus
+
+
+def montar_perguntas(corpus: List[Dict[str, Any]]) -> List[str]:
+    perguntas = []
+    for c in corpus[:50]:
+        frase = c["content"].split(".")[0].strip()
+        perguntas.append(f"Sobre {c['categoria']}: {frase.lower()}?")
+    return perguntas
+
+
+# === Cenários: (método, rota, função que monta a requisição n) ===
+def cenarios(perguntas: List[str], corpus: List[Dict[str, Any]], repetir: bool) -> Dict[str, tuple]:
+    def pergunta(n: int) -> str:
+        p = perguntas[n % len(perguntas)]
+        # sufixo único: sem ele, a partir da 2ª volta tudo viria dos caches
+        return p if repetir else f"{p} (caso {n})"
+
+    trechos = [c["content"] for c in corpus[:4]]
+    viz = lambda n: {"json": {"pergunta": pergunta(n), "resposta": RESPOSTA_FALSA, "top_k": 8}}  # noqa: E731
+    return {
+        "chat": ("POST", "/api/chat/message", lambda n: {"json": {"message": pergunta(n)}}),
+        "rag_pergunta": ("POST", "/api/rag/pergunta", lambda n: {"json": {"pergunta": pergunta(n)}}),
+        "rag_avaliar": ("POST", "/api/rag/avaliar", lambda n: {"json": {"avaliacoes": [
+            {"pergunta": pergunta(n), "resposta": RESPOSTA_FALSA, "chunks": list(trechos)}
+        ]}}),
+        "viz_space": ("POST", "/api/viz/space", viz),
+        "viz_heatmap": ("POST", "/api/viz/heatmap", viz),
+        "viz_combinado": ("POST", "/api/viz/combinado", viz),
+        "viz_mapa": ("GET", "/api/viz/mapa", lambda n: {"params": {"tamanho": 5000}}),
+        "voz": ("POST", "/api/voice/talk", lambda n: {
+            "files": {"audio": ("fala.webm", b"\x1aE\xdf\xa3" + b"\0" * 16000, "audio/webm")},
+        }),
+    }
+
+
+# === Ambiente: variáveis antes do import do app, dublês depois ===
+def preparar_app(args, perfis: Dict[str, Perfil], diretorio: str):
+    corpus = carregar_corpus(args.corpus, args.tamanho_corpus)
+    caminho_corpus = os.path.join(diretorio, "chunks.jsonl")
+    with open(caminho_corpus, "w", encoding="utf-8") as f:
+        for c in corpus:
+            f.write(json.dumps(c, ensure_ascii=False) + "\n")
+
+    os.environ.update({
+        "BM25_CHUNKS_PATH": caminho_corpus,
+        "EMBED_CACHE_PATH": os.path.join(diretorio, "embeddings.sqlite"),
+        "VECTOR_STORE_DIR": diretorio,
+        "PROJECAO_DIR": diretorio,
+        "SESSION_BACKEND": "memoria",
+        "USE_SERVER_TTS": "true",
+        "RESPOSTA_CACHE_ATIVO": "true" if args.com_cache else "false",
+    })
+    os.chdir(RAIZ)
+
+    import main
+    import services.clientService as clientes
+    import services.vectorStoreService as vetores_app
+    from services.intentService import salvar_centroides
+    from services.projecaoService import salvar_projecao
+
+    vetores = VetoresFalsos(args.dimensao)
+    perguntas = montar_perguntas(corpus)
+    openai_falso = OpenAIFalsoAsync(perfis, vetores, perguntas, RESPOSTA_FALSA)
+    clientes._async_openai = openai_falso
+    clientes._openai = OpenAIFalsoSync(openai_falso)
+    vetores_app._index_cache[vetores_app.VECTOR_BACKEND] = IndiceFalso(corpus, vetores, perfis["indice"])
+    # centróides de intenção e mapa 2D do corpus, como a ingestão faria
+    embeddings = [vetores.vetor(c["content"]) for c in corpus]
+    salvar_centroides(corpus, embeddings)
+    salvar_projecao(corpus, embeddings, diretorio)
+    return main.app, corpus, perguntas
+
+
+# === Execução ===
+async def rodar_cenario(cliente, metodo: str, rota: str, montar: Callable[[int], dict],
+                        requisicoes: int, concorrencia: int, inicio_n: int) -> Dict[str, Any]:
+    latencias: List[float] = []
+    erros: Dict[str, int] = {}
+    proximo = iter(range(inicio_n, inicio_n + requisicoes))
+
+    async def trabalhador():
+        for n in proximo:
+            t = time.perf_counter()
+            try:
+                resp = await cliente.request(metodo, rota, **montar(n))
+                falha = None if resp.status_code < 400 else f"http_{resp.status_code}"
+            except Exception as e:
+                falha = type(e).__name__
+            latencias.append((time.perf_counter() - t) * 1000)
+            if falha:
+                erros[falha] = erros.get(falha, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - t0
+
+    ms = np.asarray(latencias)
+    total_erros = sum(erros.values())
+    return {
+        "requisicoes": len(latencias),
+        "erros": total_erros,
+        "erros_por_tipo": erros,
+        "taxa_erro": round(total_erros / len(latencias), 4) if latencias else 0.0,
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(latencias) / duracao, 2) if duracao else 0.0,
+        "media_ms": round(float(ms.mean()), 1) if len(ms) else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 1) if len(ms) else None,
+        "p95_ms": round(float(np.percentile(ms, 95)), 1) if len(ms) else None,
+        "p99_ms": round(float(np.percentile(ms, 99)), 1) if len(ms) else None,
+        "max_ms": round(float(ms.max()), 1) if len(ms) else None,
+    }
+
+
+async def executar(args) -> Dict[str, Any]:
+    import httpx
+
+    perfis = {}
+    for i, (nome, padrao) in enumerate(PERFIS_PADRAO.items()):
+        perfil = Perfil.de_texto(args.perfis.get(nome, padrao), semente=args.semente + i)
+        if nome not in args.perfis and args.falhas:
+            perfil.falhas = args.falhas
+        perfil.mediana_ms *= args.escala
+        perfis[nome] = perfil
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as diretorio:
+        app, corpus, perguntas = preparar_app(args, perfis, diretorio)
+        todos = cenarios(perguntas, corpus, args.repetir_perguntas)
+        escolhidos = args.cenarios or list(todos)
+        desconhecidos = set(escolhidos) - set(todos)
+        if desconhecidos:
+            raise SystemExit(f"Cenários desconhecidos: {sorted(desconhecidos)}; opções: {sorted(todos)}")
+
+        transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        resultados = {}
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+            n = 0
+            for nome in escolhidos:
+                metodo, rota, montar = todos[nome]
+                # aquecimento (centróides de intenção, tokenizer, índice BM25...) fora da medição
+                await rodar_cenario(cliente, metodo, rota, montar, args.aquecimento, args.concorrencia, n)
+                n += args.aquecimento
+                resultados[nome] = await rodar_cenario(
+                    cliente, metodo, rota, montar, args.requisicoes, args.concorrencia, n
+                )
+                n += args.requisicoes
+                r = resultados[nome]
+                print(
+                    f"{nome:<14} {r['vazao_rps']:>8.2f} req/s  p50 {r['p50_ms']:>8.1f}  p95 {r['p95_ms']:>8.1f}  "
+                    f"p99 {r['p99_ms']:>8.1f} ms  erros {r['erros']}",
+                    file=sys.stderr,
+                )
+
+    return {
+        "commit": _commit(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "concorrencia": args.concorrencia,
+            "requisicoes": args.requisicoes,
+            "aquecimento": args.aquecimento,
+            "tamanho_corpus": len(corpus),
+            "dimensao": args.dimensao,
+            "com_cache": args.com_cache,
+            "repetir_perguntas": args.repetir_perguntas,
+            "escala": args.escala,
+            "perfis": {nome: p.descrever() for nome, p in perfis.items()},
+            "env": {k: os.environ[k] for k in ("MODO_BUSCA", "MMR_ATIVO", "BUSCA_ESPECULATIVA") if k in os.environ},
+        },
+        "cenarios": resultados,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+        return commit + ("-modificado" if sujo else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual: Dict[str, Any], base: Dict[str, Any]):
+    """Variação percentual por cenário (positivo em latência = piorou)."""
+    print(f"\nComparação com {base.get('commit')} ({base.get('data')}):", file=sys.stderr)
+    for nome, r in atual["cenarios"].items():
+        b = base.get("cenarios", {}).get(nome)
+        if not b:
+            continue
+        campos = []
+        for campo in ("vazao_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if b.get(campo):
+                campos.append(f"{campo} {100 * (r[campo] - b[campo]) / b[campo]:+.1f}%")
+        print(f"  {nome:<14} " + "  ".join(campos), file=sys.stderr)
+
+
+def _perfil(texto: str):
+    nome, _, valor = texto.partition("=")
+    if nome not in PERFIS_PADRAO or not valor:
+        raise argparse.ArgumentTypeError(f"use servico=mediana_ms[:sigma[:falhas]] com servico em {list(PERFIS_PADRAO)}")
+    return nome, valor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cenarios", type=lambda s: [c for c in s.split(",") if c], help="lista separada por vírgula (padrão: todos)")
+    parser.add_argument("--concorrencia", type=int, default=10)
+    parser.add_argument("--requisicoes", type=int, default=100, help="por cenário")
+    parser.add_argument("--aquecimento", type=int, default=10, help="requisições descartadas por cenário")
+    parser.add_argument("--perfil", dest="perfis", type=_perfil, action="append", default=[])
+    parser.add_argument("--falhas", type=float, default=0.0, help="taxa de falha de todos os serviços sem --perfil")
+    parser.add_argument("--escala", type=float, default=1.0, help="multiplica as latências dos dublês")
+    parser.add_argument("--corpus", default=os.path.join(RAIZ, "chunks_limpos.jsonl"))
+    parser.add_argument("--tamanho-corpus", type=int, default=0, help="replica os chunks até este total")
+    parser.add_argument("--dimensao", type=int, default=1536)
+    parser.add_argument("--com-cache", action="store_true", help="mantém o cache semântico de respostas ligado")
+    parser.add_argument("--repetir-perguntas", action="store_true", help="reusa as perguntas (acerta nos caches)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    parser.add_argument("--comparar", help="JSON de uma rodada anterior para comparar")
+    args = parser.parse_args()
+    args.perfis = dict(args.perfis)
+
+    resultado = asyncio.run(executar(args))
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
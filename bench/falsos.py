@@ -0,0 +1,277 @@
+# bench/falsos.py
+"""
+Dublês em processo da OpenAI (chat, embeddings, Whisper, TTS) e do índice
+vetorial, com latência e taxa de falhas configuráveis. Mesma interface que
+os serviços usam dos SDKs reais, então a API roda inteira sem rede nem custo.
+"""
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace as NS
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class FalhaSimulada(Exception):
+    """Erro injetado pelos dublês (status 503, como uma indisponibilidade da API)."""
+
+    status_code = 503
+
+
+class Perfil:
+    """
+    Latência log-normal (mediana em ms e dispersão `sigma`) e probabilidade de
+    falha de um serviço falso. Formato de texto: "mediana_ms[:sigma[:falhas]]",
+    ex.: "800:0.4:0.01".
+    """
+
+    def __init__(self, mediana_ms: float, sigma: float = 0.3, falhas: float = 0.0, semente: int = 0):
+        self.mediana_ms = mediana_ms
+        self.sigma = sigma
+        self.falhas = falhas
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def de_texto(cls, texto: str, semente: int = 0) -> "Perfil":
+        partes = [float(p) for p in texto.split(":")]
+        return cls(*partes, semente=semente)
+
+    def sortear(self) -> float:
+        """Latência em segundos; levanta FalhaSimulada com probabilidade `falhas`."""
+        with self._lock:
+            falhou = self._rng.random() < self.falhas
+            segundos = self.mediana_ms / 1000 * self._rng.lognormvariate(0, self.sigma) if self.mediana_ms > 0 else 0.0
+        if falhou:
+            raise FalhaSimulada("falha simulada")
+        return segundos
+
+    def descrever(self) -> Dict[str, float]:
+        return {"mediana_ms": self.mediana_ms, "sigma": self.sigma, "falhas": self.falhas}
+
+
+async def _esperar(perfil: Perfil):
+    await asyncio.sleep(perfil.sortear())
+
+
+class VetoresFalsos:
+    """
+    Embeddings determinísticos: soma de vetores aleatórios fixos por palavra,
+    normalizada. Textos com palavras em comum ficam próximos, o que basta para
+    classificação por centróide, MMR e visualização se comportarem como no real.
+    """
+
+    def __init__(self, dimensao: int = 1536):
+        self.dimensao = dimensao
+        self._palavras: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _palavra(self, palavra: str) -> np.ndarray:
+        v = self._palavras.get(palavra)
+        if v is None:
+            semente = int.from_bytes(hashlib.blake2b(palavra.encode("utf-8"), digest_size=8).digest(), "little")
+            v = np.random.default_rng(semente).standard_normal(self.dimensao).astype("float32")
+            with self._lock:
+                self._palavras[palavra] = v
+        return v
+
+    def vetor(self, texto: str) -> List[float]:
+        soma = np.zeros(self.dimensao, dtype="float32")
+        for palavra in (texto or "").lower().split():
+            soma += self._palavra(palavra)
+        return (soma / (np.linalg.norm(soma) + 1e-9)).tolist()
+
+
+def _uso(entrada: int, saida: int) -> NS:
+    return NS(prompt_tokens=entrada, completion_tokens=saida, total_tokens=entrada + saida)
+
+
+def _tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+_AVALIACAO = json.dumps({
+    "precisao": 8, "cobertura": 7, "recall3": 8,
+    "justificativa": "Resposta sustentada pelos trechos.",
+    "evidencias": [{"trecho_resposta": "-", "status": "suportado", "chunks_citados": ["C1"], "evidencia": "-"}],
+})
+
+
+class _Stream:
+    def __init__(self, partes: List[str], entrada: int, intervalo_s: float):
+        self._partes = partes
+        self._entrada = entrada
+        self._intervalo_s = intervalo_s
+
+    def __aiter__(self):
+        async def gerar():
+            for p in self._partes:
+                yield NS(choices=[NS(delta=NS(content=p))], usage=None)
+                await asyncio.sleep(self._intervalo_s)
+            yield NS(choices=[], usage=_uso(self._entrada, len(self._partes)))
+        return gerar()
+
+
+class _Chat:
+    # fração da latência total gasta até o primeiro token (streaming)
+    _FRACAO_PRIMEIRO_TOKEN = 0.3
+
+    def __init__(self, perfis: Dict[str, Perfil], resposta: str):
+        self._perfis = perfis
+        self._resposta = resposta
+
+    async def create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **_: Any):
+        entrada = sum(_tokens(m.get("content") or "") for m in messages)
+        sistema = messages[0].get("content", "") if messages else ""
+        if "classificador" in sistema:
+            perfil = self._perfis["classificacao"]
+            pergunta = messages[-1]["content"].split("Pergunta:")[-1].lower()
+            texto = next((c for c in _CATEGORIAS if c.lower() in pergunta), _CATEGORIAS[0])
+        elif model.startswith("gpt-5"):
+            perfil = self._perfis["avaliacao"]
+            texto = _AVALIACAO
+        else:
+            perfil = self._perfis["chat"]
+            texto = self._resposta
+
+        total = perfil.sortear()
+        if stream:
+            partes = [p + " " for p in texto.split(" ")]
+            await asyncio.sleep(total * self._FRACAO_PRIMEIRO_TOKEN)
+            return _Stream(partes, entrada, total * (1 - self._FRACAO_PRIMEIRO_TOKEN) / len(partes))
+        await asyncio.sleep(total)
+        return NS(choices=[NS(message=NS(content=texto))], usage=_uso(entrada, _tokens(texto)))
+
+
+_CATEGORIAS = ["Produtos e Serviços", "Política de Crédito", "Onboarding", "Segurança da Informação", "Compliance"]
+
+
+class _Embeddings:
+    def __init__(self, perfil: Perfil, vetores: VetoresFalsos):
+        self._perfil = perfil
+        self._vetores = vetores
+
+    def _resposta(self, input: Any) -> NS:
+        textos = [input] if isinstance(input, str) else list(input)
+        return NS(
+            data=[NS(embedding=self._vetores.vetor(t), index=i) for i, t in enumerate(textos)],
+            usage=_uso(sum(_tokens(t) for t in textos), 0),
+        )
+
+    async def create(self, model: str, input: Any, **_: Any):
+        await _esperar(self._perfil)
+        return self._resposta(input)
+
+    def criar_sincrono(self, model: str, input: Any, **_: Any):
+        time.sleep(self._perfil.sortear())
+        return self._resposta(input)
+
+
+class _Transcricoes:
+    def __init__(self, perfil: Perfil, perguntas: Sequence[str]):
+        self._perfil = perfil
+        self._perguntas = list(perguntas)
+        self._i = 0
+
+    async def create(self, model: str, file: Any, **_: Any):
+        await _esperar(self._perfil)
+        self._i += 1
+        return NS(text=self._perguntas[self._i % len(self._perguntas)])
+
+
+class _RespostaAudio:
+    def __init__(self, tamanho: int):
+        self._tamanho = tamanho
+
+    async def read(self) -> bytes:
+        return b"\0" * self._tamanho
+
+
+class _Fala:
+    def __init__(self, perfil: Perfil):
+        self._perfil = perfil
+
+    def create(self, model: str, voice: str, input: str, **_: Any):
+        perfil = self._perfil
+
+        class _Contexto:
+            async def __aenter__(self):
+                await _esperar(perfil)
+                return _RespostaAudio(len(input) * 40)   # ~mp3 de baixa taxa
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Contexto()
+
+
+class OpenAIFalsoAsync:
+    """Substitui o AsyncOpenAI do clientService."""
+
+    def __init__(self, perfis: Dict[str, Perfil], vetores: VetoresFalsos, perguntas: Sequence[str], resposta: str):
+        self.embeddings = _Embeddings(perfis["embedding"], vetores)
+        self.chat = NS(completions=_Chat(perfis, resposta))
+        self.audio = NS(
+            transcriptions=_Transcricoes(perfis["whisper"], perguntas),
+            speech=NS(with_streaming_response=_Fala(perfis["tts"])),
+        )
+
+    async def close(self):
+        pass
+
+
+class OpenAIFalsoSync:
+    """Substitui o OpenAI síncrono (embeddings de /api/viz e do cálculo de centróides)."""
+
+    def __init__(self, assincrono: OpenAIFalsoAsync):
+        self.embeddings = NS(create=assincrono.embeddings.criar_sincrono)
+
+    def close(self):
+        pass
+
+
+class IndiceFalso:
+    """
+    Índice vetorial com a interface de `query` do Pinecone/FaissIndex: busca
+    exata em NumPy sobre o corpus, mais a latência e as falhas do perfil.
+    """
+
+    def __init__(self, chunks: Sequence[Dict[str, Any]], vetores: VetoresFalsos, perfil: Perfil):
+        self._perfil = perfil
+        self._chunks = list(chunks)
+        self._matriz = np.asarray([vetores.vetor(c["content"]) for c in chunks], dtype="float32")
+        self._categorias = np.asarray([c.get("categoria", "") for c in chunks])
+
+    def query(self, vector: Sequence[float], top_k: int = 10, include_metadata: bool = False,
+              include_values: bool = False, filter: Optional[Dict[str, Any]] = None, **_: Any) -> Dict[str, Any]:
+        time.sleep(self._perfil.sortear())
+        sims = self._matriz @ np.asarray(vector, dtype="float32")
+        if filter and "categoria" in filter:
+            alvo = filter["categoria"]
+            alvo = alvo.get("$eq") if isinstance(alvo, dict) else alvo
+            sims = np.where(self._categorias == alvo, sims, -np.inf)
+        ordem = np.argsort(-sims)[:top_k]
+        matches = []
+        for i in ordem:
+            if not np.isfinite(sims[i]):
+                break
+            c = self._chunks[i]
+            m = {"id": c["id"], "score": float(sims[i])}
+            if include_metadata:
+                m["metadata"] = {
+                    "titulo": c.get("titulo", ""),
+                    "titulos": c.get("titulos") or [c.get("titulo", "")],
+                    "categoria": c.get("categoria", ""),
+                    "content": c["content"],
+                }
+            if include_values:
+                m["values"] = self._matriz[i].tolist()
+            matches.append(m)
+        return {"matches": matches}
+
+    def describe_index_stats(self, **_: Any) -> Dict[str, Any]:
+        return {"total_vector_count": len(self._chunks)}
@@ -0,0 +1,76 @@
+# bench/partida_fria.py
+"""
+Mede a partida a frio da API: cada rodada sobe um interpretador novo, importa
+`main`, executa o lifespan do FastAPI (com ou sem aquecimento) e reporta
+tempo de import, tempo de startup, RSS máximo do processo e quais módulos
+pesados já estavam carregados antes da primeira requisição.
+
+    python bench/partida_fria.py --rodadas 5 [--aquecer] [--saida partida.json]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ["openai", "pinecone", "numpy", "tiktoken", "faiss", "sklearn"]
+
+_RODADA = r"""
+import sys, json, time, asyncio, resource
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+carregados = [m for m in MODULOS if m in sys.modules]
+
+async def _subir():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(_subir())
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "startup_s": t2 - t1,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modulos_no_import": carregados,
+}))
+"""
+
+
+def rodada(aquecer: bool) -> dict:
+    env = dict(os.environ, AQUECER_CLIENTES="1" if aquecer else "0")
+    codigo = f"MODULOS = {MODULOS_PESADOS!r}\n" + _RODADA
+    proc = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--aquecer", action="store_true", help="roda o lifespan com AQUECER_CLIENTES=1")
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    args = parser.parse_args()
+
+    rodadas = [rodada(args.aquecer) for _ in range(args.rodadas)]
+    resultado = {
+        "rodadas": args.rodadas,
+        "aquecer": args.aquecer,
+        "backend": os.getenv("VECTOR_BACKEND", "pinecone"),
+        "import_s_mediana": round(statistics.median(r["import_s"] for r in rodadas), 4),
+        "startup_s_mediana": round(statistics.median(r["startup_s"] for r in rodadas), 4),
+        "rss_mb_mediana": round(statistics.median(r["rss_mb"] for r in rodadas), 1),
+        "modulos_no_import": rodadas[-1]["modulos_no_import"],
+    }
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# bench/recuperacao.py
+"""
+Benchmark offline da recuperação (sem juiz gpt-5): roda cada pergunta de um
+gabarito por várias configurações de busca e compara recall@k, nDCG@k, MRR e
+latência p50/p95/p99 lado a lado.
+
+Gabarito (JSONL), uma pergunta por linha:
+    {"pergunta": "...", "relevantes": ["id_chunk", ...], "categoria": "Compliance"}
+`relevantes` também aceita relevância graduada ({"id": 2, ...}); com
+`--nivel titulo`, os relevantes são títulos de documento em vez de ids de chunk
+(gabarito estável entre re-chunkings). `categoria` é opcional e só é usada pelo
+filtro `gabarito`.
+
+Configurações = filtros × modos × mmr:
+    filtros: intencao (classificador, como na API) | nenhum | gabarito
+    modos:   denso | hibrido (denso + BM25 por RRF)
+    mmr:     sim | nao
+
+    python bench/recuperacao.py gabarito.jsonl --k 1,3,5,10 --saida bench/resultados/recuperacao.json
+    python bench/recuperacao.py gabarito.jsonl --filtros intencao,nenhum --modos denso,hibrido --mmr sim,nao
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from typing import Any, Dict, List, Optional, Sequence
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def carregar_gabarito(caminho: str) -> List[Dict[str, Any]]:
+    with open(caminho, "r", encoding="utf-8") as f:
+        itens = [json.loads(linha) for linha in f if linha.strip()]
+    for i, item in enumerate(itens):
+        if not item.get("pergunta") or not item.get("relevantes"):
+            raise SystemExit(f"Linha {i + 1} do gabarito sem 'pergunta' ou 'relevantes'.")
+    return itens
+
+
+def ranking(trechos: Sequence[Dict[str, Any]], nivel: str, relevantes) -> List[str]:
+    """
+    Ids (ou títulos) na ordem recuperada. No nível de título, cada chunk vale
+    pelo primeiro título relevante que carrega (chunks deduplicados acumulam
+    vários) e o mesmo documento só conta na primeira posição em que aparece.
+    """
+    if nivel == "id":
+        return [t["id"] for t in trechos]
+    vistos, saida = set(), []
+    for t in trechos:
+        md = t.get("metadata") or {}
+        titulos = md.get("titulos") or [md.get("titulo", "")]
+        chave = next((x for x in titulos if x in relevantes), titulos[0])
+        if chave not in vistos:
+            vistos.add(chave)
+            saida.append(chave)
+    return saida
+
+
+async def avaliar(args) -> Dict[str, Any]:
+    from services.embeddingService import embed_async
+    from services.intentService import classificar_intencao_detalhada
+    from services.metricasService import calcular_metricas_recuperacao, percentis
+    from services.searchService import buscar_chunks_por_vetor
+
+    gabarito = carregar_gabarito(args.gabarito)
+    top_k = max(args.k)
+    configs = list(itertools.product(args.filtros, args.modos, args.mmr))
+    semaforo = asyncio.Semaphore(max(1, args.concorrencia))
+
+    # etapas comuns a todas as configurações: embedding e intenção, uma vez por pergunta
+    async def preparar(item):
+        async with semaforo:
+            t = time.perf_counter()
+            embedding = await embed_async(item["pergunta"])
+            embed_ms = (time.perf_counter() - t) * 1000
+            intencao, intencao_ms = None, None
+            if "intencao" in args.filtros:
+                t = time.perf_counter()
+                intencao = await classificar_intencao_detalhada(item["pergunta"], embedding)
+                intencao_ms = (time.perf_counter() - t) * 1000
+            return {"embedding": embedding, "intencao": intencao, "embedding_ms": embed_ms, "intencao_ms": intencao_ms}
+
+    preparados = await asyncio.gather(*(preparar(item) for item in gabarito))
+
+    async def buscar(item, prep, filtro, modo, mmr):
+        categoria = {
+            "intencao": (prep["intencao"] or {}).get("categoria"),
+            "gabarito": item.get("categoria"),
+            "nenhum": None,
+        }[filtro]
+        async with semaforo:
+            t = time.perf_counter()
+            trechos = await buscar_chunks_por_vetor(
+                prep["embedding"], categoria, top_k=top_k, pergunta=item["pergunta"], modo=modo, mmr=mmr == "sim"
+            )
+            latencia_ms = (time.perf_counter() - t) * 1000
+        return {
+            "recuperados": ranking(trechos, args.nivel, item["relevantes"]),
+            "relevantes": item["relevantes"],
+            "latencia_ms": latencia_ms,
+        }
+
+    # uma busca fora da medição por modo: abertura do índice e do BM25 não entram no p99
+    for modo in args.modos:
+        await buscar_chunks_por_vetor(preparados[0]["embedding"], None, top_k=top_k, pergunta=gabarito[0]["pergunta"], modo=modo)
+
+    resultados: Dict[str, Any] = {}
+    for filtro, modo, mmr in configs:
+        consultas = await asyncio.gather(
+            *(buscar(item, prep, filtro, modo, mmr) for item, prep in zip(gabarito, preparados))
+        )
+        nome = f"{modo}{'+mmr' if mmr == 'sim' else ''}/{filtro}"
+        resultados[nome] = calcular_metricas_recuperacao(consultas, ks=args.k)
+
+    def resumo(valores):
+        return {nome: round(v, 1) for nome, v in percentis(valores).items()}
+
+    etapas = {"embedding": resumo([p["embedding_ms"] for p in preparados])}
+    if "intencao" in args.filtros:
+        etapas["intencao"] = resumo([p["intencao_ms"] for p in preparados])
+        acertos = [p["intencao"]["categoria"] == item["categoria"] for item, p in zip(gabarito, preparados) if item.get("categoria")]
+        if acertos:
+            etapas["intencao"]["acuracia"] = round(sum(acertos) / len(acertos), 4)
+
+    return {
+        "gabarito": args.gabarito,
+        "perguntas": len(gabarito),
+        "nivel": args.nivel,
+        "k": args.k,
+        "etapas_ms": etapas,
+        "configuracoes": resultados,
+    }
+
+
+def imprimir_tabela(resultado: Dict[str, Any]):
+    colunas = [f"recall@{k}" for k in resultado["k"]] + [f"ndcg@{k}" for k in resultado["k"]] + ["mrr", "p50_ms", "p95_ms", "p99_ms"]
+    largura = max([len(n) for n in resultado["configuracoes"]] + [12])
+    print(f"{'config':<{largura}} " + " ".join(f"{c:>9}" for c in colunas), file=sys.stderr)
+    for nome, m in resultado["configuracoes"].items():
+        valores = [m.get(c) for c in colunas]
+        print(f"{nome:<{largura}} " + " ".join(f"{v:>9}" if v is not None else f"{'-':>9}" for v in valores), file=sys.stderr)
+
+
+def _lista(texto: str) -> List[str]:
+    return [x.strip() for x in texto.split(",") if x.strip()]
+
+
+def _escolhas(opcoes: Sequence[str]):
+    def validar(texto: str) -> List[str]:
+        valores = _lista(texto)
+        invalidos = set(valores) - set(opcoes)
+        if invalidos or not valores:
+            raise argparse.ArgumentTypeError(f"opções válidas: {','.join(opcoes)}")
+        return valores
+    return validar
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("gabarito", help="JSONL com pergunta, relevantes e (opcional) categoria")
+    parser.add_argument("--k", type=lambda s: sorted({int(x) for x in _lista(s)}), default=[1, 3, 5, 10])
+    parser.add_argument("--filtros", type=_escolhas(["intencao", "nenhum", "gabarito"]), default=["intencao", "nenhum"])
+    parser.add_argument("--modos", type=_escolhas(["denso", "hibrido"]), default=["denso", "hibrido"])
+    parser.add_argument("--mmr", type=_escolhas(["sim", "nao"]), default=["sim", "nao"])
+    parser.add_argument("--nivel", choices=["id", "titulo"], default="id", help="o que o gabarito lista como relevante")
+    parser.add_argument("--concorrencia", type=int, default=8, help="buscas simultâneas")
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+    args.gabarito = os.path.abspath(args.gabarito)
+    args.saida = os.path.abspath(args.saida) if args.saida else None
+
+    os.chdir(RAIZ)   # caminhos padrão dos serviços (chunks_limpos.jsonl, .cache/) são relativos à raiz
+    resultado = asyncio.run(avaliar(args))
+    imprimir_tabela(resultado)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        os.makedirs(os.path.dirname(args.saida), exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
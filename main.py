@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from api.indexRouter import router as api_index_router
 from api.ragRouter import router as api_rag_router
@@ -7,11 +9,27 @@ from api.chatRouter import router as api_chat_router
 from api.vizRouter import router as api_viz_router
 from api.homeRouter import router as home_router
 from api.voiceRouter import router as voice_router
+from api.embeddingRouter import router as embedding_router
+from api.telemetriaRouter import router as telemetria_router
 
 from fastapi.staticfiles import StaticFiles
+from services.clientService import AQUECER_CLIENTES, aquecer_clientes, fechar_clientes
+from services.telemetriaService import MiddlewareTelemetria
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # clientes (OpenAI, Pinecone, índice) nascem no primeiro uso; o lifespan só aquece e fecha
+    if AQUECER_CLIENTES:
+        await aquecer_clientes()
+    yield
+    await fechar_clientes()
+
 
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+# latência por etapa, tokens e erros → /metrics e header Server-Timing
+app.add_middleware(MiddlewareTelemetria)
 
 # Rotas
 app.include_router(frontend_router)
@@ -22,6 +40,8 @@ app.include_router(api_chat_router)
 app.include_router(api_viz_router)
 app.include_router(home_router)
 app.include_router(voice_router)
+app.include_router(embedding_router)
+app.include_router(telemetria_router)
 
 # Servir pasta HTML
 app.mount("/html", StaticFiles(directory="HTML"), name="html")
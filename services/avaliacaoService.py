@@ -1,27 +1,16 @@
 
-from openai import OpenAI
-from pinecone import Pinecone
-import os
 import re
 import json
+import asyncio
 
-# === Configurações ===
-OPENAI_API_KEY = os.getenv("api_key_openIA")
-PINECONE_API_KEY = os.getenv("api_key_pinecone")
-INDEX_NAME = "testeanalistasr"
-
-# === Inicialização ===
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-pinecone_client = Pinecone(api_key=PINECONE_API_KEY)
-index = pinecone_client.Index(INDEX_NAME)
+from services.clientService import get_async_openai
+from services.embeddingService import embed, embed_async
+from services.telemetriaService import etapa, registrar_uso
+from services.vectorStoreService import obter_index
 
 # === Embedding da pergunta ===
 def embed_query(query: str) -> list:
-    resp = openai_client.embeddings.create(
-        input=query,
-        model="text-embedding-3-small"
-    )
-    return resp.data[0].embedding
+    return embed(query)
 
 # === Busca os chunks mais relevantes (top_k maior para reduzir falso negativo) ===
 def buscar_top_chunks(embedding: list, top_k: int = 5) -> list:
@@ -29,11 +18,12 @@ def buscar_top_chunks(embedding: list, top_k: int = 5) -> list:
     Retorna uma lista de strings (conteúdo) dos top_k chunks mais relevantes.
     Garante pelo menos 3 posições (preenche com string vazia se necessário).
     """
-    resp = index.query(
-        vector=embedding,
-        top_k=top_k,
-        include_metadata=True
-    )
+    with etapa("indice"):
+        resp = obter_index().query(  # Pinecone ou FAISS local, conforme VECTOR_BACKEND
+            vector=embedding,
+            top_k=top_k,
+            include_metadata=True
+        )
     matches = resp.get("matches", []) if isinstance(resp, dict) else getattr(resp, "matches", [])
     chunks = []
     for m in matches:
@@ -46,7 +36,7 @@ def buscar_top_chunks(embedding: list, top_k: int = 5) -> list:
     return chunks[:top_k]
 
 # === Avaliação com GPT-5 (sem temperature), exigindo JSON com evidências ===
-def avaliar_resposta(pergunta: str, resposta: str, chunks: list) -> str:
+async def avaliar_resposta(pergunta: str, resposta: str, chunks: list) -> str:
     """
     Monta um prompt que:
     - Rotula os chunks como [C1], [C2], ...
@@ -102,13 +92,15 @@ Definições:
 """
 
     # gpt-5: usar default; não enviar temperature != 1
-    resp = openai_client.chat.completions.create(
-        model="gpt-5",
-        messages=[
-            {"role": "system", "content": "Você avalia respostas RAG e SEMPRE cita chunks [C#] como evidência. Devolva somente JSON."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    with etapa("avaliacao"):
+        resp = await get_async_openai().chat.completions.create(
+            model="gpt-5",
+            messages=[
+                {"role": "system", "content": "Você avalia respostas RAG e SEMPRE cita chunks [C#] como evidência. Devolva somente JSON."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+    registrar_uso("gpt-5", getattr(resp, "usage", None))
     return resp.choices[0].message.content
 
 # === Parser do retorno da IA, com fallback e “regra de segurança” opcional ===
@@ -165,12 +157,16 @@ def extrair_metricas(avaliacao_str: str, chunks: list) -> dict:
     return out
 
 # === Função principal reutilizável ===
-async def avaliar(pergunta: str, resposta: str, chunks: list) -> dict:
+async def avaliar(pergunta: str, resposta: str, chunks: list | None = None) -> dict:
     """
     - Se 'chunks' já vierem do seu fluxo RAG, use-os.
-    - Caso deseje avaliar com novos top-k, você pode recalcular embedding e buscar aqui.
+    - Sem 'chunks', recalcula o embedding da pergunta e busca os top-k aqui.
     """
-    avaliacao_str = avaliar_resposta(pergunta, resposta, chunks)
+    if chunks is None:
+        embedding = await embed_async(pergunta)
+        chunks = await asyncio.to_thread(buscar_top_chunks, embedding)
+
+    avaliacao_str = await avaliar_resposta(pergunta, resposta, chunks)
     return extrair_metricas(avaliacao_str, chunks)
 
 
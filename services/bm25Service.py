@@ -0,0 +1,166 @@
+# services/bm25Service.py
+import os
+import re
+import json
+import math
+import time
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+# Índice lexical em memória, alimentado pela saída da ingestão (chunks_limpos.jsonl)
+BM25_CHUNKS_PATH = os.getenv("BM25_CHUNKS_PATH", "chunks_limpos.jsonl")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# intervalo mínimo entre verificações de novas linhas no arquivo de chunks
+BM25_VERIFICAR_S = float(os.getenv("BM25_VERIFICAR_S", "5"))
+
+_STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na", "nos", "nas",
+    "um", "uma", "uns", "umas", "por", "para", "com", "sem", "que", "se", "ao", "aos", "ou",
+    "como", "mais", "sao", "ser", "sua", "seu", "suas", "seus", "qual", "quais", "ha",
+}
+
+
+def normalizar_termos(texto: str) -> List[str]:
+    # mesma normalização do `limpar_texto` da ingestão: sem acentos, minúsculas, só [a-z0-9]
+    s = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode().lower()
+    return [t for t in re.findall(r"[a-z0-9]+", s) if t not in _STOPWORDS]
+
+
+class IndiceBM25:
+    """Índice invertido incremental (termo → {doc: tf}) com ranking BM25."""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._docs: Dict[int, Dict[str, Any]] = {}   # doc → {id, metadata, tamanho, termos}
+        self._por_id: Dict[str, int] = {}
+        self._proximo = 0
+        self._soma_tamanhos = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def adicionar(self, chunk_id: str, content: str, metadata: Dict[str, Any]):
+        """Indexa (ou reindexa, se o id já existir) um chunk."""
+        termos = Counter(normalizar_termos(content))
+        with self._lock:
+            self._remover(chunk_id)
+            doc = self._proximo
+            self._proximo += 1
+            self._por_id[chunk_id] = doc
+            tamanho = sum(termos.values())
+            self._docs[doc] = {"id": chunk_id, "metadata": metadata, "tamanho": tamanho, "termos": list(termos)}
+            self._soma_tamanhos += tamanho
+            for termo, tf in termos.items():
+                self._postings[termo][doc] = tf
+
+    def remover(self, chunk_id: str):
+        with self._lock:
+            self._remover(chunk_id)
+
+    def _remover(self, chunk_id: str):
+        doc = self._por_id.pop(chunk_id, None)
+        if doc is None:
+            return
+        info = self._docs.pop(doc)
+        self._soma_tamanhos -= info["tamanho"]
+        for termo in info["termos"]:
+            postings = self._postings.get(termo)
+            if postings is not None:
+                postings.pop(doc, None)
+                if not postings:
+                    del self._postings[termo]
+
+    def buscar(self, consulta: str, top_k: int = 5, categoria: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top-k por BM25, no mesmo formato normalizado do searchService."""
+        termos = set(normalizar_termos(consulta))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not termos:
+                return []
+            media = self._soma_tamanhos / n
+            scores: Dict[int, float] = defaultdict(float)
+            for termo in termos:
+                postings = self._postings.get(termo)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings.items():
+                    tamanho = self._docs[doc]["tamanho"]
+                    scores[doc] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * tamanho / media))
+
+            if categoria:
+                scores = {d: s for d, s in scores.items() if self._docs[d]["metadata"].get("categoria") == categoria}
+            melhores = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+            return [
+                {"id": self._docs[d]["id"], "score": round(s, 4), "metadata": self._docs[d]["metadata"]}
+                for d, s in melhores
+            ]
+
+
+class _IndiceDoArquivo:
+    """
+    Mantém um IndiceBM25 sincronizado com o JSONL da ingestão: lê só as linhas
+    novas (offset) e reconstrói do zero se o arquivo for substituído ou regravado.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.indice = IndiceBM25()
+        self._offset = 0
+        self._inode = None
+        self._cabecalho = b""     # primeiros bytes já lidos: detecta regravação no mesmo inode
+        self._verificado = 0.0
+        self._lock = threading.Lock()
+
+    def atualizar(self, forcar: bool = False) -> IndiceBM25:
+        agora = time.monotonic()
+        if not forcar and agora - self._verificado < BM25_VERIFICAR_S:
+            return self.indice
+        with self._lock:
+            self._verificado = agora
+            try:
+                st = os.stat(self.caminho)
+            except FileNotFoundError:
+                return self.indice
+            with open(self.caminho, "rb") as f:
+                if st.st_ino != self._inode or st.st_size < self._offset or f.read(len(self._cabecalho)) != self._cabecalho:
+                    self.indice = IndiceBM25()
+                    self._offset = 0
+                    self._inode = st.st_ino
+                if st.st_size == self._offset:
+                    return self.indice
+                f.seek(self._offset)
+                for linha in f:
+                    if not linha.endswith(b"\n"):
+                        break  # linha ainda sendo escrita: lida na próxima verificação
+                    self._offset += len(linha)
+                    try:
+                        c = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue
+                    self.indice.adicionar(c["id"], c.get("content", ""), {
+                        "titulo": c.get("titulo", ""),
+                        "titulos": c.get("titulos") or [c.get("titulo", "")],
+                        "categoria": c.get("categoria", ""),
+                        "content": c.get("content", ""),
+                    })
+                f.seek(0)
+                self._cabecalho = f.read(min(self._offset, 4096))
+            return self.indice
+
+
+_arquivo = _IndiceDoArquivo(BM25_CHUNKS_PATH)
+
+
+def obter_indice_bm25() -> IndiceBM25:
+    return _arquivo.atualizar()
+
+
+def buscar_bm25(consulta: str, top_k: int = 5, categoria: Optional[str] = None) -> List[Dict[str, Any]]:
+    return obter_indice_bm25().buscar(consulta, top_k=top_k, categoria=categoria)
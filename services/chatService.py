@@ -1,41 +1,28 @@
 
 # services/chatService.py
-import os
+import time
+import asyncio
 from uuid import uuid4
-from typing import Dict, List, Any
-from dotenv import load_dotenv
-from openai import OpenAI
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
-from services.intentService import classificar_intencao
-from services.searchService import buscar_chunks_relevantes_por_categoria
+from services.clientService import get_async_openai
+from services.contextoService import montar_contexto
+from services.pipelineService import recuperar_com_intencao
+from services.respostaCacheService import cache_chat, consultar, guardar
+from services.sessionStoreService import obter_session_store
+from services.telemetriaService import etapa, registrar_uso
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("api_key_openIA"))
-
-# memória simples em processo (produção: redis/db)
-_MEMORY: Dict[str, List[Dict[str, str]]] = {}
+# memória de conversa limitada (em processo ou SQLite, ver SESSION_BACKEND)
+_MEMORY = obter_session_store()
 
 def new_session_id() -> str:
     return str(uuid4())
 
 def get_history(session_id: str) -> List[Dict[str, str]]:
-    return _MEMORY.setdefault(session_id, [])
+    return _MEMORY.get(session_id)
 
 def reset_history(session_id: str):
-    _MEMORY.pop(session_id, None)
-
-def _montar_contexto(trechos: List[Dict[str, Any]]) -> str:
-    """
-    Formata os trechos como C1..Cn para o modelo varrer tudo sem repetir.
-    """
-    linhas = []
-    for i, t in enumerate(trechos, start=1):
-        md = t.get("metadata", {})
-        titulo = (md.get("titulo") or "-").strip()
-        conteudo = (md.get("content") or md.get("trecho") or "").strip()
-        if conteudo:
-            linhas.append(f"(C{i} • {titulo}) {conteudo}")
-    return "\n".join(linhas)
+    _MEMORY.reset(session_id)
 
 def _prompt_conversacional(pergunta: str, contexto: str) -> str:
     """
@@ -73,68 +60,200 @@ Quer saber também sobre:
 • <assunto 3>
 """
 
-async def chat_with_rag(session_id: str, user_message: str) -> Dict[str, Any]:
-    history = get_history(session_id)
-
-    # 1) Classificar intenção da pergunta atual
-    categoria = await classificar_intencao(user_message)
-
-    # 2) Recuperar chunks dessa categoria (mais cobertura)
-    trechos = buscar_chunks_relevantes_por_categoria(user_message, categoria, top_k=6)
-    contexto = _montar_contexto(trechos)
-
-    # 3) Histórico (mantém ~20 mensagens)
-    trimmed_history = history[-20:]
-
-    system_msg = {
-        "role": "system",
-        "content": (
-            "Você é um agente de suporte RAG conversacional em pt-BR. "
-            "Responda APENAS com base no contexto fornecido. "
-            "Não cite fontes no texto do usuário. "
-            "Se algo não estiver no contexto, diga que não há informação suficiente. "
-            "Seja cordial, claro e útil."
-        ),
-    }
+SYSTEM_MSG = {
+    "role": "system",
+    "content": (
+        "Você é um agente de suporte RAG conversacional em pt-BR. "
+        "Responda APENAS com base no contexto fornecido. "
+        "Não cite fontes no texto do usuário. "
+        "Se algo não estiver no contexto, diga que não há informação suficiente. "
+        "Seja cordial, claro e útil."
+    ),
+}
+
+def _fontes(trechos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Fontes para a UI (sem exibir no texto)
+    return [
+        {
+            "titulo": t["metadata"].get("titulo"),
+            "titulos": t["metadata"].get("titulos") or [t["metadata"].get("titulo")],
+            "categoria": t["metadata"].get("categoria"),
+            "trecho": t["metadata"].get("content") or t["metadata"].get("trecho") or "",
+        }
+        for t in trechos
+    ]
+
+async def _preparar(
+    history: List[Dict[str, str]],
+    user_message: str,
+    embedding: List[float] | None = None,
+    intencao: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    # 1+2) Classificar intenção e recuperar chunks dessa categoria (em paralelo)
+    recuperacao = await recuperar_com_intencao(
+        user_message, top_k=6, embedding=embedding, intencao=intencao
+    )
+    categoria = recuperacao["categoria"]
+
+    # 3) Contexto + histórico (até ~20 mensagens) dentro do orçamento de tokens
+    with etapa("contexto"):
+        montado = montar_contexto(recuperacao["trechos"], history[-20:])
+    contexto = montado["contexto"]
+    trimmed_history = montado["historico"]
 
     user_with_ctx = {
         "role": "user",
         "content": _prompt_conversacional(user_message, contexto)
     }
 
-    # 4) Chamar o modelo
-    messages = [system_msg] + trimmed_history + [user_with_ctx]
-    resp = client.chat.completions.create(
-        model="gpt-3.5-turbo",   
-        messages=messages,
-        temperature=0.45,
-        max_tokens=700,
-    )
-    answer = (resp.choices[0].message.content or "").strip()
+    return {
+        "embedding": recuperacao["embedding"],
+        "categoria": categoria,
+        "confianca": recuperacao["confianca"],
+        "tempos": recuperacao["tempos"],
+        "tokens": montado["tokens"],
+        "fontes": _fontes(montado["trechos"]),
+        "messages": [SYSTEM_MSG] + trimmed_history + [user_with_ctx],
+    }
 
-    # 5) Atualizar memória (histórico curto)
-    history.append({"role": "user", "content": user_message})
-    history.append({"role": "assistant", "content": answer})
+async def _carregar_historico(session_id: str) -> List[Dict[str, str]]:
+    # a memória pode ser SQLite (I/O com timeout de lock): fora do event loop
+    return await asyncio.to_thread(get_history, session_id)
 
-    # 6) Preparar fontes para a UI (sem exibir no texto)
-    fontes = [
-        {
-            "titulo": t["metadata"].get("titulo"),
-            "categoria": t["metadata"].get("categoria"),
-            "trecho": t["metadata"].get("content") or t["metadata"].get("trecho") or "",
+async def _salvar_turno(session_id: str, user_message: str, answer: str):
+    # Atualizar memória (histórico curto)
+    await asyncio.to_thread(_MEMORY.append, session_id, [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": answer},
+    ])
+
+async def _consultar_cache(history: List[Dict[str, str]], user_message: str):
+    """
+    Só o primeiro turno usa o cache semântico: depois dele a resposta
+    depende também do histórico da conversa.
+    """
+    if history:
+        return None, {}
+    return await consultar(cache_chat, user_message)
+
+def _guardar_cache(history_antes: int, prep: Dict[str, Any], answer: str):
+    if history_antes == 0:
+        guardar(cache_chat, prep["embedding"], prep["categoria"], {
+            "categoria": prep["categoria"],
+            "confianca": prep["confianca"],
+            "resposta": answer,
+            "fontes": prep["fontes"],
+        })
+
+async def chat_with_rag(session_id: str, user_message: str) -> Dict[str, Any]:
+    inicio = time.perf_counter()
+    history = await _carregar_historico(session_id)
+    history_antes = len(history)
+
+    em_cache, ctx = await _consultar_cache(history, user_message)
+    if em_cache is not None:
+        await _salvar_turno(session_id, user_message, em_cache["resposta"])
+        return {
+            "session_id": session_id,
+            **em_cache,
+            "tempos": {"total_ms": round((time.perf_counter() - inicio) * 1000, 1)},
+            "cache": True,
         }
-        for t in trechos
-    ]
+
+    prep = await _preparar(history, user_message, **ctx)
+
+    # 4) Chamar o modelo
+    with etapa("completion"):
+        resp = await get_async_openai().chat.completions.create(
+            model="gpt-3.5-turbo",   
+            messages=prep["messages"],
+            temperature=0.45,
+            max_tokens=700,
+        )
+    registrar_uso("gpt-3.5-turbo", getattr(resp, "usage", None))
+    answer = (resp.choices[0].message.content or "").strip()
+
+    # 5) Atualizar memória (e o cache, se for o primeiro turno)
+    await _salvar_turno(session_id, user_message, answer)
+    _guardar_cache(history_antes, prep, answer)
 
     return {
         "session_id": session_id,
-        "categoria": categoria,
+        "categoria": prep["categoria"],
+        "confianca": prep["confianca"],
         "resposta": answer,
-        "fontes": fontes,
+        "fontes": prep["fontes"],
+        "tempos": prep["tempos"],
+        "tokens": prep["tokens"],
+        "cache": False,
     }
 
+async def chat_with_rag_stream(session_id: str, user_message: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Variante em streaming de `chat_with_rag`. Emite eventos (nome, dados):
+    "meta" (categoria e fontes) → vários "delta" (pedaços da resposta) → "fim".
+    O turno só entra no histórico quando a resposta termina.
+    """
+    inicio = time.perf_counter()
+    history = await _carregar_historico(session_id)
+    history_antes = len(history)
 
+    em_cache, ctx = await _consultar_cache(history, user_message)
+    if em_cache is not None:
+        yield "meta", {
+            "session_id": session_id,
+            "categoria": em_cache["categoria"],
+            "confianca": em_cache.get("confianca"),
+            "fontes": em_cache["fontes"],
+            "tempos": {"total_ms": round((time.perf_counter() - inicio) * 1000, 1)},
+            "cache": True,
+        }
+        yield "delta", {"texto": em_cache["resposta"]}
+        await _salvar_turno(session_id, user_message, em_cache["resposta"])
+        yield "fim", {
+            "session_id": session_id,
+            "categoria": em_cache["categoria"],
+            "resposta": em_cache["resposta"],
+        }
+        return
 
+    prep = await _preparar(history, user_message, **ctx)
+    yield "meta", {
+        "session_id": session_id,
+        "categoria": prep["categoria"],
+        "confianca": prep["confianca"],
+        "fontes": prep["fontes"],
+        "tempos": prep["tempos"],
+        "tokens": prep["tokens"],
+        "cache": False,
+    }
 
+    partes: List[str] = []
+    with etapa("completion"):   # até o último token
+        stream = await get_async_openai().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=prep["messages"],
+            temperature=0.45,
+            max_tokens=700,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for evento in stream:
+            if getattr(evento, "usage", None) is not None:
+                registrar_uso("gpt-3.5-turbo", evento.usage)
+            if not evento.choices:
+                continue
+            delta = evento.choices[0].delta.content or ""
+            if delta:
+                partes.append(delta)
+                yield "delta", {"texto": delta}
 
+    answer = "".join(partes).strip()
+    await _salvar_turno(session_id, user_message, answer)
+    _guardar_cache(history_antes, prep, answer)
 
+    yield "fim", {
+        "session_id": session_id,
+        "categoria": prep["categoria"],
+        "resposta": answer,
+    }
@@ -0,0 +1,150 @@
+# services/clientService.py
+import os
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:  # SDKs pesados: importados só no primeiro uso
+    from openai import AsyncOpenAI, OpenAI
+    from pinecone import Pinecone
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OPENAI_API_KEY = os.getenv("api_key_openIA")
+PINECONE_API_KEY = os.getenv("api_key_pinecone")
+
+# Pool de conexões HTTP compartilhado por todas as chamadas à OpenAI
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "120"))
+
+# Abre clientes, índice e tokenizer no startup da API (em vez de na primeira requisição)
+AQUECER_CLIENTES = os.getenv("AQUECER_CLIENTES", "0") == "1"
+
+# Registro único de clientes do processo: criados no primeiro uso, fechados no shutdown (lifespan)
+_lock = threading.Lock()
+_async_openai: Optional["AsyncOpenAI"] = None
+_openai: Optional["OpenAI"] = None
+_pinecone: Optional["Pinecone"] = None
+
+
+def _limites():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+    )
+
+
+def get_async_openai() -> "AsyncOpenAI":
+    """Cliente assíncrono único (usado no caminho das requisições)."""
+    global _async_openai
+    with _lock:
+        if _async_openai is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            _async_openai = AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                http_client=httpx.AsyncClient(limits=_limites(), timeout=OPENAI_TIMEOUT_S),
+            )
+        return _async_openai
+
+
+def get_openai() -> "OpenAI":
+    """Cliente síncrono único (rotas síncronas e scripts de ingestão)."""
+    global _openai
+    with _lock:
+        if _openai is None:
+            import httpx
+            from openai import OpenAI
+
+            _openai = OpenAI(
+                api_key=OPENAI_API_KEY,
+                http_client=httpx.Client(limits=_limites(), timeout=OPENAI_TIMEOUT_S),
+            )
+        return _openai
+
+
+def get_pinecone() -> "Pinecone":
+    """Cliente Pinecone único (consultas ao índice e rotas de administração)."""
+    global _pinecone
+    with _lock:
+        if _pinecone is None:
+            from pinecone import Pinecone
+
+            _pinecone = Pinecone(api_key=PINECONE_API_KEY)
+        return _pinecone
+
+
+async def aquecer_clientes():
+    """
+    Paga na subida o que a primeira requisição pagaria: import dos SDKs,
+    criação dos clientes, abertura do índice (conexão TLS com o Pinecone ou
+    leitura do FAISS), carga do tokenizer e, na busca híbrida, do índice BM25.
+    Falhas só são registradas.
+    """
+    from services.bm25Service import obter_indice_bm25
+    from services.contextoService import contar_tokens
+    from services.searchService import MODO_BUSCA
+    from services.vectorStoreService import obter_index
+
+    def abrir_index():
+        index = obter_index()
+        index.describe_index_stats()  # Pinecone: abre a conexão | FAISS: lê os arquivos
+
+    etapas = {
+        "openai": lambda: (get_async_openai(), get_openai()),
+        "tokenizer": lambda: contar_tokens(""),
+        "indice": abrir_index,
+    }
+    if MODO_BUSCA == "hibrido":
+        etapas["bm25"] = obter_indice_bm25
+    for nome, etapa in etapas.items():
+        try:
+            await asyncio.to_thread(etapa)
+        except Exception:
+            logger.warning("Falha ao aquecer %s", nome, exc_info=True)
+
+
+def _fechar_pinecone(pc: "Pinecone"):
+    """
+    O SDK 7.x não tem `Pinecone.close()`: fecha o cliente do plano de controle
+    (criado só se alguma rota de administração o usou) e as conexões do pool.
+    O cliente do índice é fechado por `descartar_index`.
+    """
+    fechar = getattr(pc, "close", None)
+    if callable(fechar):
+        fechar()
+        return
+    controle = getattr(pc, "_db_control", None)
+    api_client = getattr(getattr(controle, "_index_api", None), "api_client", None)
+    if api_client is None:
+        return
+    api_client.close()
+    pool = getattr(getattr(api_client, "rest_client", None), "pool_manager", None)
+    if pool is not None:
+        pool.clear()
+
+
+async def fechar_clientes():
+    """Fecha os pools HTTP e esquece os clientes (shutdown do lifespan)."""
+    global _async_openai, _openai, _pinecone
+    from services.vectorStoreService import descartar_index
+
+    with _lock:
+        async_openai, openai_sync, pinecone = _async_openai, _openai, _pinecone
+        _async_openai = _openai = _pinecone = None
+    descartar_index()
+    if async_openai is not None:
+        await async_openai.close()
+    if openai_sync is not None:
+        openai_sync.close()
+    if pinecone is not None:
+        _fechar_pinecone(pinecone)
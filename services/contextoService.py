@@ -0,0 +1,148 @@
+# services/contextoService.py
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+# Orçamento de tokens para contexto + histórico no prompt
+CONTEXTO_MAX_TOKENS = int(os.getenv("CONTEXTO_MAX_TOKENS", "2500"))
+# parte do orçamento reservada ao histórico (quando houver histórico)
+CONTEXTO_RESERVA_HISTORICO = int(os.getenv("CONTEXTO_RESERVA_HISTORICO", "800"))
+# corte adaptativo: descarta trechos com score < score_do_melhor * fator
+CONTEXTO_SCORE_RELATIVO = float(os.getenv("CONTEXTO_SCORE_RELATIVO", "0.75"))
+CONTEXTO_SCORE_MIN = float(os.getenv("CONTEXTO_SCORE_MIN", "0.0"))
+CONTEXTO_MIN_TRECHOS = int(os.getenv("CONTEXTO_MIN_TRECHOS", "2"))
+
+# custo fixo aproximado de cada mensagem no formato de chat
+_TOKENS_POR_MENSAGEM = 4
+
+_SENTENCAS = re.compile(r"(?<=[.!?;])\s+")
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    # mesmo tokenizer usado na geração dos chunks (import adiado: só no primeiro uso)
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def contar_tokens(texto: str) -> int:
+    return len(_tokenizer().encode(texto or ""))
+
+
+def _tokens_mensagens(mensagens: List[Dict[str, str]]) -> int:
+    return sum(contar_tokens(m.get("content", "")) + _TOKENS_POR_MENSAGEM for m in mensagens)
+
+
+def _chave_sentenca(sentenca: str) -> str:
+    s = unicodedata.normalize("NFKD", sentenca).encode("ascii", "ignore").decode().lower()
+    s = re.sub(r"[^a-z0-9\s]", "", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _conteudo(trecho: Dict[str, Any]) -> str:
+    md = trecho.get("metadata", {}) or {}
+    return (md.get("content") or md.get("trecho") or "").strip()
+
+
+def _linha(i: int, trecho: Dict[str, Any], conteudo: str) -> str:
+    titulo = ((trecho.get("metadata", {}) or {}).get("titulo") or "-").strip()
+    return f"(C{i} • {titulo}) {conteudo}"
+
+
+def _formatar_original(trechos: List[Dict[str, Any]]) -> str:
+    linhas = []
+    for i, t in enumerate(trechos, start=1):
+        conteudo = _conteudo(t)
+        if conteudo:
+            linhas.append(_linha(i, t, conteudo))
+    return "\n".join(linhas)
+
+
+def _filtrar_por_score(trechos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if any("score_denso" in t for t in trechos):
+        # busca híbrida: já vêm na ordem do RRF e o corte usa o cosseno denso (o score
+        # fundido não é comparável); trechos que só o BM25 achou não têm cosseno e ficam
+        ordenados = list(trechos)
+        densos = [t["score_denso"] for t in trechos if t.get("score_denso") is not None]
+        if not densos:
+            return ordenados
+        corte = max(CONTEXTO_SCORE_MIN, max(densos) * CONTEXTO_SCORE_RELATIVO)
+        mantidos = [t for t in ordenados if t.get("score_denso") is None or t["score_denso"] >= corte]
+    else:
+        scores = [t.get("score") for t in trechos]
+        if not trechos or any(s is None for s in scores):
+            return list(trechos)
+        corte = max(CONTEXTO_SCORE_MIN, max(scores) * CONTEXTO_SCORE_RELATIVO)
+        ordenados = sorted(trechos, key=lambda t: t["score"], reverse=True)
+        mantidos = [t for t in ordenados if t["score"] >= corte]
+    return mantidos if len(mantidos) >= CONTEXTO_MIN_TRECHOS else ordenados[:CONTEXTO_MIN_TRECHOS]
+
+
+def montar_contexto(
+    trechos: List[Dict[str, Any]],
+    historico: Optional[List[Dict[str, str]]] = None,
+    max_tokens: int = CONTEXTO_MAX_TOKENS,
+) -> Dict[str, Any]:
+    """
+    Monta o bloco CONTEXTO (C1..Cn) e recorta o histórico dentro de `max_tokens`:
+    1) descarta trechos abaixo do corte adaptativo de score;
+    2) remove sentenças já presentes em trechos anteriores;
+    3) inclui trechos (melhor score primeiro) enquanto couberem no orçamento;
+    4) preenche o restante com as mensagens mais recentes do histórico.
+    Retorna {"contexto", "trechos" (usados), "historico", "tokens"}.
+    """
+    historico = historico or []
+    tokens_originais = contar_tokens(_formatar_original(trechos)) + _tokens_mensagens(historico)
+
+    reserva = min(_tokens_mensagens(historico), CONTEXTO_RESERVA_HISTORICO)
+    orcamento_contexto = max(0, max_tokens - reserva)
+
+    vistas = set()
+    linhas: List[str] = []
+    usados: List[Dict[str, Any]] = []
+    tokens_contexto = 0
+    for t in _filtrar_por_score(trechos):
+        sentencas = []
+        for s in _SENTENCAS.split(_conteudo(t)):
+            chave = _chave_sentenca(s)
+            if chave and chave not in vistas:
+                vistas.add(chave)
+                sentencas.append(s.strip())
+        if not sentencas:
+            continue
+        linha = _linha(len(usados) + 1, t, " ".join(sentencas))
+        custo = contar_tokens(linha) + 1  # +1 da quebra de linha
+        if tokens_contexto + custo > orcamento_contexto:
+            if usados:
+                break
+            continue
+        linhas.append(linha)
+        usados.append(t)
+        tokens_contexto += custo
+
+    restante = max(0, max_tokens - tokens_contexto)
+    mantidas: List[Dict[str, str]] = []
+    for m in reversed(historico):
+        custo = contar_tokens(m.get("content", "")) + _TOKENS_POR_MENSAGEM
+        if custo > restante:
+            break
+        mantidas.append(m)
+        restante -= custo
+    mantidas.reverse()
+
+    tokens_finais = tokens_contexto + _tokens_mensagens(mantidas)
+    return {
+        "contexto": "\n".join(linhas),
+        "trechos": usados,
+        "historico": mantidas,
+        "tokens": {
+            "contexto": tokens_contexto,
+            "historico": tokens_finais - tokens_contexto,
+            "total": tokens_finais,
+            "economizados": max(0, tokens_originais - tokens_finais),
+            "trechos_descartados": len(trechos) - len(usados),
+        },
+    }
@@ -0,0 +1,210 @@
+# services/dedupService.py
+import os
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from services.ruidoService import dividir_sentencas, normalizar
+
+# MinHash + LSH: NUM_PERM = BANDAS * LINHAS; o limiar efetivo do LSH fica em ~(1/BANDAS)^(1/LINHAS)
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_BANDAS = int(os.getenv("DEDUP_BANDAS", "16"))
+DEDUP_LIMIAR = float(os.getenv("DEDUP_LIMIAR", "0.8"))          # Jaccard estimado mínimo para colapsar
+DEDUP_SHINGLE = int(os.getenv("DEDUP_SHINGLE", "3"))            # n-gramas de palavras
+DEDUP_SENTENCAS = os.getenv("DEDUP_SENTENCAS", "1") == "1"      # também remove sentenças repetidas
+# "corpus": repetições entre documentos da mesma categoria
+# "arquivo": só repetições dentro do mesmo documento (editar um arquivo não muda ids de outros)
+DEDUP_ESCOPO = os.getenv("DEDUP_ESCOPO", "corpus").strip().lower()
+
+_PRIMO = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, 1 << 31, size=DEDUP_NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, size=DEDUP_NUM_PERM, dtype=np.uint64)
+
+
+def _shingles(texto: str) -> Set[str]:
+    palavras = normalizar(texto).split()
+    if len(palavras) <= DEDUP_SHINGLE:
+        return {" ".join(palavras)} if palavras else set()
+    return {" ".join(palavras[i:i + DEDUP_SHINGLE]) for i in range(len(palavras) - DEDUP_SHINGLE + 1)}
+
+
+def assinatura(texto: str) -> Optional[np.ndarray]:
+    """Assinatura MinHash (DEDUP_NUM_PERM mínimos) dos shingles do texto."""
+    shingles = _shingles(texto)
+    if not shingles:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # (a*h + b) mod p por permutação; a, h < 2^32 ⇒ sem overflow em uint64
+    return ((np.outer(hashes, _A) + _B) % _PRIMO).min(axis=0)
+
+
+def jaccard_estimado(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+class IndiceLSH:
+    """Índice LSH incremental: devolve o primeiro item já inserido parecido o bastante."""
+
+    def __init__(self, limiar: float = DEDUP_LIMIAR, bandas: int = DEDUP_BANDAS):
+        self.limiar = limiar
+        self.bandas = bandas
+        self.linhas = DEDUP_NUM_PERM // bandas
+        self._baldes: List[Dict[bytes, List[Any]]] = [defaultdict(list) for _ in range(bandas)]
+        self._assinaturas: Dict[Any, np.ndarray] = {}
+
+    def _chaves(self, sig: np.ndarray):
+        for b in range(self.bandas):
+            yield b, sig[b * self.linhas:(b + 1) * self.linhas].tobytes()
+
+    def buscar(self, sig: np.ndarray) -> Optional[Any]:
+        vistos = set()
+        for b, chave in self._chaves(sig):
+            for item in self._baldes[b].get(chave, ()):
+                if item in vistos:
+                    continue
+                vistos.add(item)
+                if jaccard_estimado(sig, self._assinaturas[item]) >= self.limiar:
+                    return item
+        return None
+
+    def inserir(self, item: Any, sig: np.ndarray):
+        self._assinaturas[item] = sig
+        for b, chave in self._chaves(sig):
+            self._baldes[b][chave].append(item)
+
+
+def _adicionar_titulo(titulos: List[str], titulo: str):
+    if titulo and titulo not in titulos:
+        titulos.append(titulo)
+
+
+# destino de um chunk: None se foi absorvido; senão (posição do sobrevivente,
+# índices das sentenças mantidas — None sem a deduplicação de sentenças)
+Destino = Optional[Tuple[int, Optional[Tuple[int, ...]]]]
+
+
+class Deduplicador:
+    """
+    Colapsa chunks quase idênticos e (opcionalmente) sentenças repetidas em
+    chunks diferentes da mesma categoria. O primeiro a chegar sobrevive e
+    acumula em `titulos` os títulos de todas as fontes que repetiam o conteúdo.
+    Processar na mesma ordem gera sempre o mesmo resultado.
+    (Por categoria: o ruído injetado em todas as categorias continua visível
+    ao filtro de ruído, que usa a repetição entre categorias como sinal.)
+
+    Com escopo "arquivo" os índices são separados por `fonte`: só a ordem dentro
+    de cada arquivo importa, e um chunk devolvido já é final. Com "corpus", um
+    sobrevivente ainda ganha `titulos` de arquivos processados depois dele.
+    Guarda só assinaturas e a lista de títulos de cada sobrevivente.
+    """
+
+    def __init__(self, limiar: float = DEDUP_LIMIAR, sentencas: bool = DEDUP_SENTENCAS, escopo: str = DEDUP_ESCOPO):
+        if escopo not in ("arquivo", "corpus"):
+            raise ValueError(f"DEDUP_ESCOPO inválido: {escopo} (use arquivo ou corpus)")
+        self.escopo = escopo
+        self._lock = threading.Lock()
+        self._limiar = limiar
+        self._com_sentencas = sentencas
+        self._indices: Dict[Any, tuple] = {}
+        self._titulos: List[List[str]] = []
+        self.chunks_removidos = 0
+        self.sentencas_removidas = 0
+
+    def decidir(self, chunk: Dict[str, Any]) -> Destino:
+        """Registra o chunk e devolve o destino dele (ver `Destino`)."""
+        with self._lock:
+            titulo = chunk.get("titulo", "")
+            categoria = chunk.get("categoria", "")
+            chave = categoria if self.escopo == "corpus" else (chunk.get("fonte", ""), categoria)
+            if chave not in self._indices:
+                self._indices[chave] = (
+                    IndiceLSH(self._limiar),
+                    IndiceLSH(self._limiar) if self._com_sentencas else None,
+                )
+            indice_chunks, indice_sentencas = self._indices[chave]
+
+            sig = assinatura(chunk["content"])
+            if sig is not None:
+                igual = indice_chunks.buscar(sig)
+                if igual is not None:
+                    _adicionar_titulo(self._titulos[igual], titulo)
+                    self.chunks_removidos += 1
+                    return None
+
+            posicao = len(self._titulos)
+            mantidas = None
+            if indice_sentencas is not None:
+                mantidas = []
+                for k, s in enumerate(dividir_sentencas(chunk["content"])):
+                    sig_s = assinatura(s)
+                    igual = indice_sentencas.buscar(sig_s) if sig_s is not None else None
+                    dono = igual[0] if igual is not None else None
+                    if dono is not None and dono != posicao:
+                        _adicionar_titulo(self._titulos[dono], titulo)
+                        self.sentencas_removidas += 1
+                        continue
+                    if sig_s is not None:
+                        indice_sentencas.inserir((posicao, k), sig_s)
+                    mantidas.append(k)
+                if not mantidas:
+                    self.chunks_removidos += 1
+                    return None
+                mantidas = tuple(mantidas)
+
+            if sig is not None:
+                indice_chunks.inserir(posicao, sig)
+            self._titulos.append([titulo])
+            return posicao, mantidas
+
+    def aplicar(self, chunk: Dict[str, Any], destino: Destino) -> Optional[Dict[str, Any]]:
+        """Versão deduplicada do chunk segundo `destino`, com os títulos acumulados até agora."""
+        if destino is None:
+            return None
+        posicao, mantidas = destino
+        novo = {**chunk, "titulos": self._titulos[posicao]}
+        if mantidas is not None:
+            sentencas = dividir_sentencas(chunk["content"])
+            novo["content"] = " ".join(sentencas[k] for k in mantidas)
+        return novo
+
+    def adicionar(self, chunk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Registra o chunk; devolve a versão deduplicada, ou None se ele foi absorvido."""
+        return self.aplicar(chunk, self.decidir(chunk))
+
+
+class PlanoDedup:
+    """
+    Deduplicação em duas passadas, sem guardar o conteúdo dos chunks:
+    `registrar` (arquivo a arquivo, sempre na mesma ordem) decide o destino de
+    cada chunk; depois `aplicar` — de qualquer thread, em qualquer ordem —
+    recebe os mesmos chunks refeitos e devolve pares (chunk, versão
+    deduplicada) dos sobreviventes, já com os `titulos` finais.
+    """
+
+    def __init__(self, dedup: Optional[Deduplicador] = None):
+        self.dedup = dedup or Deduplicador()
+        self._destinos: Dict[str, List[Destino]] = {}
+
+    def registrar(self, chave: str, chunks: Iterable[Dict[str, Any]]):
+        self._destinos[chave] = [self.dedup.decidir(c) for c in chunks]
+
+    def aplicar(self, chave: str, chunks: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        for chunk, destino in zip(chunks, self._destinos[chave]):
+            novo = self.dedup.aplicar(chunk, destino)
+            if novo is not None:
+                novo["titulos"] = list(novo["titulos"])
+                yield chunk, novo
+
+
+def deduplicar(chunks: Sequence[Dict[str, Any]], limiar: float = DEDUP_LIMIAR) -> List[Dict[str, Any]]:
+    """Versão em lote: devolve os chunks sobreviventes, na ordem original."""
+    dedup = Deduplicador(limiar)
+    return [c for c in (dedup.adicionar(c) for c in chunks) if c is not None]
@@ -0,0 +1,351 @@
+# services/embeddingService.py
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from services.clientService import get_async_openai, get_openai
+from services.telemetriaService import etapa, registrar_uso
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Camada em memória (LRU) na frente de uma camada em disco (SQLite), ambas limitadas em bytes
+EMBED_CACHE_MEM_BYTES = int(os.getenv("EMBED_CACHE_MEM_BYTES", str(64 * 1024 * 1024)))
+EMBED_CACHE_DISK_BYTES = int(os.getenv("EMBED_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite"))
+
+# Limites por requisição da API de embeddings (com folga sobre os 300k tokens / 2048 entradas)
+EMBED_LOTE_MAX_TOKENS = int(os.getenv("EMBED_LOTE_MAX_TOKENS", "250000"))
+EMBED_LOTE_MAX_ITENS = int(os.getenv("EMBED_LOTE_MAX_ITENS", "2048"))
+
+
+def normalizar_texto(texto: str) -> str:
+    texto = unicodedata.normalize("NFC", texto or "")
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def chave_embedding(texto: str, model: str = EMBEDDING_MODEL, dimensions: Optional[int] = None) -> str:
+    bruto = f"{model}|{dimensions or ''}|{normalizar_texto(texto)}"
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def _para_bytes(vetor: Sequence[float]) -> bytes:
+    return array("f", vetor).tobytes()
+
+
+def _de_bytes(blob: bytes) -> List[float]:
+    a = array("f")
+    a.frombytes(blob)
+    return a.tolist()
+
+
+class _CacheMemoria:
+    """LRU em processo, limitado pelo tamanho total (bytes) dos vetores."""
+
+    def __init__(self, limite_bytes: int):
+        self.limite_bytes = limite_bytes
+        self.bytes = 0
+        self._dados: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, chave: str) -> Optional[bytes]:
+        blob = self._dados.get(chave)
+        if blob is not None:
+            self._dados.move_to_end(chave)
+        return blob
+
+    def put(self, chave: str, blob: bytes):
+        if len(blob) > self.limite_bytes:
+            return
+        antigo = self._dados.pop(chave, None)
+        if antigo is not None:
+            self.bytes -= len(antigo)
+        self._dados[chave] = blob
+        self.bytes += len(blob)
+        while self.bytes > self.limite_bytes:
+            _, removido = self._dados.popitem(last=False)
+            self.bytes -= len(removido)
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class _CacheDisco:
+    """Camada persistente (SQLite/WAL); remove os menos acessados ao passar do limite."""
+
+    def __init__(self, caminho: str, limite_bytes: int):
+        self.limite_bytes = limite_bytes
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " chave TEXT PRIMARY KEY, vetor BLOB NOT NULL,"
+            " tamanho INTEGER NOT NULL, acesso REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_acesso ON embeddings(acesso)")
+        self._conn.commit()
+        self.bytes = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM embeddings").fetchone()[0]
+
+    def get_muitos(self, chaves: Sequence[str]) -> Dict[str, bytes]:
+        if not chaves:
+            return {}
+        achados: Dict[str, bytes] = {}
+        for i in range(0, len(chaves), 500):
+            parte = list(chaves[i:i + 500])
+            marcas = ",".join("?" * len(parte))
+            for chave, blob in self._conn.execute(
+                f"SELECT chave, vetor FROM embeddings WHERE chave IN ({marcas})", parte
+            ):
+                achados[chave] = blob
+        if achados:
+            agora = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET acesso = ? WHERE chave = ?",
+                [(agora, c) for c in achados],
+            )
+            self._conn.commit()
+        return achados
+
+    def put_muitos(self, itens: Sequence[Tuple[str, bytes]]):
+        if not itens:
+            return
+        agora = time.time()
+        novos = [(c, b, len(b), agora) for c, b in itens if len(b) <= self.limite_bytes]
+        existentes = self.get_tamanhos([c for c, *_ in novos])
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (chave, vetor, tamanho, acesso) VALUES (?, ?, ?, ?)",
+            novos,
+        )
+        self.bytes += sum(t for _, _, t, _ in novos) - sum(existentes.values())
+        if self.bytes > self.limite_bytes:
+            self._evict()
+        self._conn.commit()
+
+    def get_tamanhos(self, chaves: Sequence[str]) -> Dict[str, int]:
+        tamanhos: Dict[str, int] = {}
+        for i in range(0, len(chaves), 500):
+            parte = list(chaves[i:i + 500])
+            marcas = ",".join("?" * len(parte))
+            for chave, tamanho in self._conn.execute(
+                f"SELECT chave, tamanho FROM embeddings WHERE chave IN ({marcas})", parte
+            ):
+                tamanhos[chave] = tamanho
+        return tamanhos
+
+    def _evict(self):
+        # libera até ~90% do limite para não despejar a cada inserção
+        alvo = int(self.limite_bytes * 0.9)
+        cursor = self._conn.execute("SELECT chave, tamanho FROM embeddings ORDER BY acesso ASC")
+        remover = []
+        for chave, tamanho in cursor:
+            if self.bytes <= alvo:
+                break
+            remover.append((chave,))
+            self.bytes -= tamanho
+        cursor.close()
+        self._conn.executemany("DELETE FROM embeddings WHERE chave = ?", remover)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# `_lock` protege só a LRU e os contadores (operações em memória); o SQLite tem
+# o próprio lock e, no caminho assíncrono, roda em thread fora do event loop
+_lock = threading.Lock()
+_disco_lock = threading.Lock()
+_memoria = _CacheMemoria(EMBED_CACHE_MEM_BYTES)
+_disco: Optional[_CacheDisco] = None
+_contadores = {"hits_memoria": 0, "hits_disco": 0, "misses": 0, "chamadas_api": 0}
+
+
+def _cache_disco() -> Optional[_CacheDisco]:
+    # chamar com `_disco_lock`
+    global _disco
+    if _disco is None and EMBED_CACHE_DISK_BYTES > 0:
+        _disco = _CacheDisco(EMBED_CACHE_PATH, EMBED_CACHE_DISK_BYTES)
+    return _disco
+
+
+def _consultar_memoria(
+    textos: Sequence[str], model: str, dimensions: Optional[int]
+) -> Tuple[List[str], List[str], Dict[str, bytes]]:
+    normalizados = [normalizar_texto(t) for t in textos]
+    chaves = [chave_embedding(t, model, dimensions) for t in normalizados]
+    resultado: Dict[str, bytes] = {}
+    with _lock:
+        for chave in chaves:
+            blob = _memoria.get(chave)
+            if blob is not None:
+                resultado[chave] = blob
+                _contadores["hits_memoria"] += 1
+    return normalizados, chaves, resultado
+
+
+def _consultar_disco(chaves: Sequence[str]) -> Dict[str, bytes]:
+    """Busca no SQLite as chaves que faltaram na memória e as promove para a LRU."""
+    faltando = list(dict.fromkeys(chaves))
+    if not faltando:
+        return {}
+    with _disco_lock:
+        disco = _cache_disco()
+        achados = disco.get_muitos(faltando) if disco is not None else {}
+    with _lock:
+        for chave, blob in achados.items():
+            _memoria.put(chave, blob)
+        _contadores["hits_disco"] += len(achados)
+    return achados
+
+
+def _pendentes(normalizados: Sequence[str], chaves: Sequence[str], resultado: Dict[str, bytes]) -> Dict[str, str]:
+    pendentes: Dict[str, str] = {}
+    for chave, texto in zip(chaves, normalizados):
+        if chave not in resultado:
+            pendentes.setdefault(chave, texto)
+    return pendentes
+
+
+def _consultar_cache(
+    textos: Sequence[str], model: str, dimensions: Optional[int]
+) -> Tuple[List[str], Dict[str, bytes], Dict[str, str]]:
+    """Resolve o que der em memória → disco; devolve o que falta pedir à API."""
+    normalizados, chaves, resultado = _consultar_memoria(textos, model, dimensions)
+    resultado.update(_consultar_disco([c for c in chaves if c not in resultado]))
+    return chaves, resultado, _pendentes(normalizados, chaves, resultado)
+
+
+async def _consultar_cache_async(
+    textos: Sequence[str], model: str, dimensions: Optional[int]
+) -> Tuple[List[str], Dict[str, bytes], Dict[str, str]]:
+    """Igual a `_consultar_cache`, com a leitura do SQLite numa thread."""
+    normalizados, chaves, resultado = _consultar_memoria(textos, model, dimensions)
+    faltando = [c for c in chaves if c not in resultado]
+    if faltando:
+        resultado.update(await asyncio.to_thread(_consultar_disco, faltando))
+    return chaves, resultado, _pendentes(normalizados, chaves, resultado)
+
+
+def _kwargs_api(pendentes: Dict[str, str], model: str, dimensions: Optional[int]) -> dict:
+    kwargs = {"model": model, "input": list(pendentes.values())}
+    if dimensions:
+        kwargs["dimensions"] = dimensions
+    return kwargs
+
+
+def _gravar(pendentes: Dict[str, str], resp, resultado: Dict[str, bytes]) -> List[Tuple[str, bytes]]:
+    """Põe os vetores novos no resultado e na LRU; devolve o que ainda vai para o disco."""
+    novos = [(chave, _para_bytes(d.embedding)) for chave, d in zip(pendentes, resp.data)]
+    with _lock:
+        _contadores["misses"] += len(novos)
+        _contadores["chamadas_api"] += 1
+        for chave, blob in novos:
+            resultado[chave] = blob
+            _memoria.put(chave, blob)
+    return novos
+
+
+def _gravar_disco(novos: Sequence[Tuple[str, bytes]]):
+    with _disco_lock:
+        disco = _cache_disco()
+        if disco is not None:
+            disco.put_muitos(novos)
+
+
+def embed_lote(
+    textos: Sequence[str],
+    model: str = EMBEDDING_MODEL,
+    dimensions: Optional[int] = None,
+    cliente: Optional["OpenAI"] = None,
+) -> List[List[float]]:
+    """
+    Embeddings de vários textos, na mesma ordem. Consulta memória → disco
+    e só envia à OpenAI (numa única chamada) os textos ainda não vistos.
+    `cliente` substitui o compartilhado (ex.: ingestão com `max_retries=0`).
+    """
+    chaves, resultado, pendentes = _consultar_cache(textos, model, dimensions)
+    if pendentes:
+        with etapa("embedding"):
+            resp = (cliente or get_openai()).embeddings.create(**_kwargs_api(pendentes, model, dimensions))
+        registrar_uso(model, getattr(resp, "usage", None))
+        _gravar_disco(_gravar(pendentes, resp, resultado))
+    return [_de_bytes(resultado[c]) for c in chaves]
+
+
+def embed(texto: str, model: str = EMBEDDING_MODEL, dimensions: Optional[int] = None) -> List[float]:
+    return embed_lote([texto], model=model, dimensions=dimensions)[0]
+
+
+async def embed_lote_async(
+    textos: Sequence[str],
+    model: str = EMBEDDING_MODEL,
+    dimensions: Optional[int] = None,
+) -> List[List[float]]:
+    """Mesmo que `embed_lote`, sem bloquear o event loop (OpenAI assíncrona, SQLite em thread)."""
+    chaves, resultado, pendentes = await _consultar_cache_async(textos, model, dimensions)
+    if pendentes:
+        with etapa("embedding"):
+            resp = await get_async_openai().embeddings.create(**_kwargs_api(pendentes, model, dimensions))
+        registrar_uso(model, getattr(resp, "usage", None))
+        await asyncio.to_thread(_gravar_disco, _gravar(pendentes, resp, resultado))
+    return [_de_bytes(resultado[c]) for c in chaves]
+
+
+async def embed_async(texto: str, model: str = EMBEDDING_MODEL, dimensions: Optional[int] = None) -> List[float]:
+    return (await embed_lote_async([texto], model=model, dimensions=dimensions))[0]
+
+
+def lotes_por_tokens(
+    textos: Sequence[str],
+    max_tokens: int = EMBED_LOTE_MAX_TOKENS,
+    max_itens: int = EMBED_LOTE_MAX_ITENS,
+) -> List[Tuple[int, int, int]]:
+    """
+    Divide `textos` em faixas contíguas [inicio, fim) que respeitam os limites
+    de tokens e de entradas por requisição. Retorna (inicio, fim, tokens) por lote.
+    """
+    from services.contextoService import contar_tokens
+
+    lotes: List[Tuple[int, int, int]] = []
+    inicio, tokens = 0, 0
+    for i, texto in enumerate(textos):
+        n = contar_tokens(normalizar_texto(texto))
+        if i > inicio and (tokens + n > max_tokens or i - inicio >= max_itens):
+            lotes.append((inicio, i, tokens))
+            inicio, tokens = i, 0
+        tokens += n
+    if len(textos) > inicio:
+        lotes.append((inicio, len(textos), tokens))
+    return lotes
+
+
+def estatisticas() -> Dict[str, float]:
+    """Contadores de hit/miss e ocupação de cada camada."""
+    with _disco_lock:
+        disco = _cache_disco()
+        disco_itens = len(disco) if disco is not None else 0
+        disco_bytes = disco.bytes if disco is not None else 0
+    with _lock:
+        hits = _contadores["hits_memoria"] + _contadores["hits_disco"]
+        total = hits + _contadores["misses"]
+        return {
+            **_contadores,
+            "taxa_acerto": round(hits / total, 4) if total else 0.0,
+            "memoria_itens": len(_memoria),
+            "memoria_bytes": _memoria.bytes,
+            "memoria_limite_bytes": _memoria.limite_bytes,
+            "disco_itens": disco_itens,
+            "disco_bytes": disco_bytes,
+            "disco_limite_bytes": EMBED_CACHE_DISK_BYTES,
+        }
@@ -1,10 +1,10 @@
-from services.authenticationService import autentication_pinecone
-from pinecone import ServerlessSpec
+from services.clientService import get_pinecone
 
-pc = autentication_pinecone()
 
 def create_index(name: str):
-    response = pc.create_index(
+    from pinecone import ServerlessSpec
+
+    response = get_pinecone().create_index(
         name=name,
         dimension=1536,
         metric="cosine",
@@ -15,10 +15,10 @@ def create_index(name: str):
 
 
 def list_index():
-    response = pc.list_indexes()
+    response = get_pinecone().list_indexes()
     return response.to_dict()
 
 
 def detail_index(name: str):
-    response=pc.describe_index(name=name)
+    response=get_pinecone().describe_index(name=name)
     return response.to_dict()
\ No newline at end of file
@@ -1,5 +1,14 @@
 import os
-from openai import OpenAI
+import time
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.clientService import get_async_openai
+from services.embeddingService import embed_async
+from services.telemetriaService import etapa, registrar_uso
+from services.vectorStoreService import VECTOR_STORE_DIR, versao_indice
 
 CATEGORIAS = [
     "Produtos e Serviços",
@@ -9,13 +18,119 @@ CATEGORIAS = [
     "Compliance",
 ]
 
-_client = OpenAI(api_key=os.getenv("api_key_openIA"))
+# Classificador local (centroide por categoria dos chunks indexados);
+# o LLM só é consultado quando a confiança fica abaixo do limiar.
+# Os centróides são gravados pela ingestão (junto do índice) e relidos quando a versão do índice muda.
+INTENT_CENTROIDES_PATH = os.getenv("INTENT_CENTROIDES_PATH", os.path.join(VECTOR_STORE_DIR, "centroides.npy"))
+INTENT_CONFIANCA_MIN = float(os.getenv("INTENT_CONFIANCA_MIN", "0.6"))
+INTENT_TEMPERATURA = float(os.getenv("INTENT_TEMPERATURA", "0.02"))
+
+# intervalo entre verificações do marcador de versão do índice
+_VERSAO_INTERVALO_S = 5.0
 
-async def classificar_intencao(pergunta: str) -> str:
+_lock = threading.Lock()
+_estado: Dict[str, Any] = {"versao": None, "checado": None, "centroides": None}
+
+
+class AcumuladorCentroides:
     """
-    Classifica a pergunta em uma das categorias conhecidas.
-    Retorna sempre uma das strings em CATEGORIAS.
+    Soma, por categoria, os embeddings normalizados recebidos em lotes: a ingestão
+    calcula os centróides sem manter o corpus inteiro em memória.
     """
+
+    def __init__(self):
+        self._somas: Optional[np.ndarray] = None
+
+    def adicionar(self, vetores: Sequence[Sequence[float]], categorias: Sequence[str]):
+        vetores = np.asarray(vetores, dtype="float32")
+        if not len(vetores):
+            return
+        vetores = vetores / (np.linalg.norm(vetores, axis=1, keepdims=True) + 1e-9)
+        if self._somas is None:
+            self._somas = np.zeros((len(CATEGORIAS), vetores.shape[1]), dtype="float64")
+        cats = np.asarray(categorias)
+        for i, c in enumerate(CATEGORIAS):
+            mascara = cats == c
+            if mascara.any():
+                self._somas[i] += vetores[mascara].sum(axis=0)
+
+    def centroides(self) -> np.ndarray:
+        """Centroide normalizado de cada categoria (linhas na ordem de CATEGORIAS; zeros se vazia)."""
+        if self._somas is None:
+            raise ValueError("Nenhum embedding acumulado.")
+        # a média normalizada é a soma normalizada
+        somas = self._somas.astype("float32")
+        return somas / (np.linalg.norm(somas, axis=1, keepdims=True) + 1e-9)
+
+    def salvar(self, caminho: str = INTENT_CENTROIDES_PATH) -> np.ndarray:
+        """Grava os centróides; chame antes de `marcar_nova_versao` (a API relê quando a versão muda)."""
+        centroides = self.centroides()
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with open(caminho, "wb") as f:
+            np.save(f, centroides)
+        return centroides
+
+
+def salvar_centroides(
+    chunks: Sequence[Dict[str, Any]],
+    embeddings: Sequence[Sequence[float]],
+    caminho: str = INTENT_CENTROIDES_PATH,
+) -> np.ndarray:
+    """Versão em memória de `AcumuladorCentroides`, para quem já tem todos os embeddings."""
+    vetores = np.asarray(embeddings, dtype="float32")
+    if len(vetores) != len(chunks) or not len(vetores):
+        raise ValueError("Quantidade de chunks e de embeddings não confere.")
+    acumulador = AcumuladorCentroides()
+    acumulador.adicionar(vetores, [c.get("categoria", "") for c in chunks])
+    return acumulador.salvar(caminho)
+
+
+def _ler_centroides(caminho: str) -> Optional[np.ndarray]:
+    try:
+        centroides = np.load(caminho)
+    except (OSError, ValueError):
+        return None
+    return centroides if centroides.shape[0] == len(CATEGORIAS) else None
+
+
+def _obter_centroides() -> Optional[np.ndarray]:
+    """
+    Centroide normalizado de cada categoria (linhas na ordem de CATEGORIAS), ou
+    None se a ingestão ainda não os gerou (a classificação fica com o LLM).
+    """
+    agora = time.monotonic()
+    with _lock:
+        checado = _estado["checado"]
+        if checado is not None and agora - checado < _VERSAO_INTERVALO_S:
+            return _estado["centroides"]
+        _estado["checado"] = agora
+        versao = versao_indice()
+        if versao != _estado["versao"] or _estado["centroides"] is None:
+            _estado["versao"] = versao
+            _estado["centroides"] = _ler_centroides(INTENT_CENTROIDES_PATH)
+        return _estado["centroides"]
+
+
+def centroides_por_categoria(vetores: np.ndarray, categorias: Sequence[str]) -> np.ndarray:
+    acumulador = AcumuladorCentroides()
+    acumulador.adicionar(vetores, categorias)
+    return acumulador.centroides()
+
+
+def _classificar_local(embedding: Sequence[float], centroides: np.ndarray) -> Dict[str, Any]:
+    q = np.asarray(embedding, dtype="float32")
+    q = q / (np.linalg.norm(q) + 1e-9)
+    sims = centroides @ q
+    # softmax com temperatura baixa: as similaridades de cosseno ficam próximas entre si
+    z = (sims - sims.max()) / INTENT_TEMPERATURA
+    probs = np.exp(z) / np.exp(z).sum()
+    i = int(np.argmax(probs))
+    return {"categoria": CATEGORIAS[i], "confianca": round(float(probs[i]), 4), "origem": "local"}
+
+
+async def _classificar_llm(pergunta: str) -> str:
     prompt = f"""
 Classifique a pergunta abaixo em UMA das categorias da lista. 
 Responda só com o nome EXATO da categoria.
@@ -25,13 +140,15 @@ Categorias: {CATEGORIAS}
 Pergunta: "{pergunta}"
 """
 
-    resp = _client.chat.completions.create(
-        model="gpt-4o-mini",  # econômico e bom para classificação
-        messages=[
-            {"role": "system", "content": "Você é um classificador de intenções."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    with etapa("intencao_llm"):
+        resp = await get_async_openai().chat.completions.create(
+            model="gpt-4o-mini",  # econômico e bom para classificação
+            messages=[
+                {"role": "system", "content": "Você é um classificador de intenções."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+    registrar_uso("gpt-4o-mini", getattr(resp, "usage", None))
 
     categoria = resp.choices[0].message.content.strip()
 
@@ -45,3 +162,59 @@ Pergunta: "{pergunta}"
         # fallback final
         return "Produtos e Serviços"
     return categoria
+
+
+async def classificar_intencao_detalhada(
+    pergunta: str,
+    embedding: Optional[List[float]] = None
+) -> Dict[str, Any]:
+    """
+    Retorna {"categoria", "confianca", "origem"} onde origem é "local" ou "llm".
+    Reaproveita `embedding` (o mesmo usado na busca) quando informado.
+    """
+    with etapa("intencao"):
+        return await _classificar(pergunta, embedding)
+
+
+def classificar_local(embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+    """Classificação pelos centróides (microssegundos); None se a ingestão ainda não os gerou."""
+    centroides = _obter_centroides()
+    return _classificar_local(embedding, centroides) if centroides is not None else None
+
+
+def centroides_disponiveis() -> bool:
+    return _obter_centroides() is not None
+
+
+def confiante(local: Optional[Dict[str, Any]]) -> bool:
+    """A classificação local basta (sem consultar o LLM)?"""
+    return local is not None and local["confianca"] >= INTENT_CONFIANCA_MIN
+
+
+async def classificar_por_llm(pergunta: str, local: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Fallback do LLM; `local` (a classificação insuficiente) só empresta a confiança."""
+    categoria = await _classificar_llm(pergunta)
+    return {
+        "categoria": categoria,
+        "confianca": local["confianca"] if local and local["categoria"] == categoria else None,
+        "origem": "llm",
+    }
+
+
+async def _classificar(pergunta: str, embedding: Optional[List[float]]) -> Dict[str, Any]:
+    local = None
+    if centroides_disponiveis():
+        if embedding is None:
+            embedding = await embed_async(pergunta)
+        local = classificar_local(embedding)
+        if confiante(local):
+            return local
+    return await classificar_por_llm(pergunta, local)
+
+
+async def classificar_intencao(pergunta: str, embedding: Optional[List[float]] = None) -> str:
+    """
+    Classifica a pergunta em uma das categorias conhecidas.
+    Retorna sempre uma das strings em CATEGORIAS.
+    """
+    return (await classificar_intencao_detalhada(pergunta, embedding))["categoria"]
@@ -1,3 +1,6 @@
+import math
+
+
 def calcular_metricas(respostas):
     """
     respostas: lista de dicionários no formato:
@@ -34,3 +37,75 @@ def calcular_metricas(respostas):
         "cobertura_semantica": round(cobertura_media, 2),
         "recall@3": round(recall3, 2)
     }
+
+
+# === Métricas de recuperação (sem juiz LLM): ranking recuperado × gabarito ===
+
+
+def _relevancias(relevantes):
+    # lista de ids (relevância 1) ou dicionário id -> relevância graduada
+    if isinstance(relevantes, dict):
+        return {k: float(v) for k, v in relevantes.items() if v}
+    return {k: 1.0 for k in relevantes}
+
+
+def recall_em_k(recuperados, relevantes, k):
+    """Fração dos relevantes que aparece entre os k primeiros recuperados."""
+    rel = _relevancias(relevantes)
+    if not rel:
+        return 0.0
+    return len(set(recuperados[:k]) & set(rel)) / len(rel)
+
+
+def reciprocal_rank(recuperados, relevantes, k=None):
+    """1/posição do primeiro relevante (0 se nenhum); a média sobre as perguntas é o MRR."""
+    rel = _relevancias(relevantes)
+    for i, item in enumerate(recuperados[:k] if k else recuperados):
+        if item in rel:
+            return 1.0 / (i + 1)
+    return 0.0
+
+
+def ndcg_em_k(recuperados, relevantes, k):
+    """nDCG@k com ganho 2^rel - 1 (relevância binária vira ganho 1)."""
+    rel = _relevancias(relevantes)
+    dcg = sum((2 ** rel.get(item, 0.0) - 1) / math.log2(i + 2) for i, item in enumerate(recuperados[:k]))
+    ideal = sorted(rel.values(), reverse=True)[:k]
+    idcg = sum((2 ** r - 1) / math.log2(i + 2) for i, r in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+
+def percentis(valores, ps=(50, 95, 99)):
+    """Percentis por interpolação linear (mesmo critério do numpy)."""
+    if not valores:
+        return {f"p{p}": None for p in ps}
+    ordenados = sorted(valores)
+    saida = {}
+    for p in ps:
+        pos = (len(ordenados) - 1) * p / 100
+        baixo = math.floor(pos)
+        alto = min(baixo + 1, len(ordenados) - 1)
+        saida[f"p{p}"] = ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (pos - baixo)
+    return saida
+
+
+def calcular_metricas_recuperacao(consultas, ks=(1, 3, 5, 10)):
+    """
+    consultas: lista de dicionários no formato:
+    {
+        "recuperados": ["id3", "id7", "id1"],   # ranking devolvido pelo recuperador
+        "relevantes": ["id1", "id3"],           # gabarito (ou {"id1": 2, "id3": 1})
+        "latencia_ms": 42.0
+    }
+    """
+    total = len(consultas)
+    saida = {"consultas": total}
+    if not total:
+        return saida
+    for k in ks:
+        saida[f"recall@{k}"] = round(sum(recall_em_k(c["recuperados"], c["relevantes"], k) for c in consultas) / total, 4)
+        saida[f"ndcg@{k}"] = round(sum(ndcg_em_k(c["recuperados"], c["relevantes"], k) for c in consultas) / total, 4)
+    saida["mrr"] = round(sum(reciprocal_rank(c["recuperados"], c["relevantes"]) for c in consultas) / total, 4)
+    latencias = [c["latencia_ms"] for c in consultas if c.get("latencia_ms") is not None]
+    saida.update({f"{nome}_ms": round(v, 1) if v is not None else None for nome, v in percentis(latencias).items()})
+    return saida
@@ -0,0 +1,67 @@
+# services/mmrService.py
+import os
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+# Maximal Marginal Relevance: λ·sim(pergunta, d) − (1−λ)·max sim(d, já escolhidos)
+MMR_ATIVO = os.getenv("MMR_ATIVO", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+MMR_FATOR_CANDIDATOS = int(os.getenv("MMR_FATOR_CANDIDATOS", "3"))  # busca top_k × fator candidatos
+# candidato com similaridade ≥ este valor a um já escolhido é tratado como repetido e descartado
+MMR_REDUNDANCIA_MAX = float(os.getenv("MMR_REDUNDANCIA_MAX", "0.95"))
+
+
+def _normalizar(X: np.ndarray) -> np.ndarray:
+    return X / (np.linalg.norm(X, axis=-1, keepdims=True) + 1e-9)
+
+
+def selecionar_mmr(
+    consulta: Sequence[float],
+    vetores: Sequence[Sequence[float]],
+    top_k: int,
+    lambda_: float = MMR_LAMBDA,
+    redundancia_max: float = MMR_REDUNDANCIA_MAX,
+) -> List[int]:
+    """
+    Índices dos candidatos escolhidos, em ordem de escolha. As similaridades
+    (pergunta × candidatos e candidatos × candidatos) saem de uma única
+    multiplicação de matrizes; a seleção gulosa só faz máximos sobre elas.
+    """
+    if len(vetores) == 0 or top_k <= 0:
+        return []
+    V = _normalizar(np.asarray(vetores, dtype="float32"))
+    q = _normalizar(np.asarray(consulta, dtype="float32"))
+    M = np.vstack([q[None, :], V])
+    sims = M @ V.T                 # linha 0: relevância; demais: candidato × candidato
+    relevancia, entre = sims[0], sims[1:]
+
+    escolhidos = [int(np.argmax(relevancia))]
+    redundancia = entre[escolhidos[0]].copy()   # max sim de cada candidato aos escolhidos
+    disponivel = np.ones(len(V), dtype=bool)
+    disponivel[escolhidos[0]] = False
+    disponivel &= redundancia < redundancia_max
+
+    while len(escolhidos) < top_k and disponivel.any():
+        pontuacao = lambda_ * relevancia - (1 - lambda_) * redundancia
+        pontuacao[~disponivel] = -np.inf
+        i = int(np.argmax(pontuacao))
+        escolhidos.append(i)
+        disponivel[i] = False
+        redundancia = np.maximum(redundancia, entre[i])
+        disponivel &= redundancia < redundancia_max
+    return escolhidos
+
+
+def diversificar(
+    consulta: Sequence[float],
+    matches: List[Dict[str, Any]],
+    top_k: int,
+    lambda_: float = MMR_LAMBDA,
+) -> List[Dict[str, Any]]:
+    """Reordena matches (com "values") por MMR; devolve até top_k, sem os vetores."""
+    com_vetor = [m for m in matches if m.get("values")]
+    if len(com_vetor) != len(matches):
+        return [{k: v for k, v in m.items() if k != "values"} for m in matches[:top_k]]
+    indices = selecionar_mmr(consulta, [m["values"] for m in matches], top_k, lambda_)
+    return [{k: v for k, v in matches[i].items() if k != "values"} for i in indices]
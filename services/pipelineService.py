@@ -0,0 +1,110 @@
+# services/pipelineService.py
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from services.embeddingService import embed_async
+from services.intentService import (
+    CATEGORIAS,
+    centroides_disponiveis,
+    classificar_local,
+    classificar_por_llm,
+    confiante,
+)
+from services.searchService import buscar_chunks_por_vetor
+from services.telemetriaService import definir_categoria, etapa
+
+# Busca especulativa: quando a intenção depende do LLM, consulta todas as categorias
+# enquanto ele responde (com o classificador local confiante, uma consulta só)
+BUSCA_ESPECULATIVA = os.getenv("BUSCA_ESPECULATIVA", "true").lower() == "true"
+
+
+def _ms(inicio: float) -> float:
+    return round((time.perf_counter() - inicio) * 1000, 1)
+
+
+async def recuperar_com_intencao(
+    pergunta: str,
+    top_k: int = 6,
+    embedding: Optional[List[float]] = None,
+    intencao: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Embedding → classificação local → uma busca filtrada. Quando a intenção depende
+    do LLM, ele roda em paralelo com o que não depende dele: o embedding (sem
+    centróides) ou, com BUSCA_ESPECULATIVA, a busca filtrada de cada categoria, da
+    qual se usa a da categoria escolhida (idêntica à consulta feita depois).
+    Retorna também os tempos por etapa (ms). `embedding` e `intencao` já calculados
+    (ex.: pelo cache de respostas) são reaproveitados.
+    """
+    inicio = time.perf_counter()
+    tempos: Dict[str, float] = {}
+
+    async def _embedding():
+        vetor = await embed_async(pergunta)
+        tempos["embedding_ms"] = _ms(inicio)
+        return vetor
+
+    async def _classificar_llm(local=None):
+        t = time.perf_counter()
+        with etapa("intencao"):
+            resultado = await classificar_por_llm(pergunta, local)
+        tempos["intencao_ms"] = _ms(t)
+        return resultado
+
+    async def _buscar(categoria: str) -> List[Dict[str, Any]]:
+        t = time.perf_counter()
+        resultado = await buscar_chunks_por_vetor(embedding, categoria, top_k=top_k, pergunta=pergunta)
+        tempos["busca_ms"] = _ms(t)
+        return resultado
+
+    async def _buscar_todas() -> Dict[str, List[Dict[str, Any]]]:
+        t = time.perf_counter()
+        resultados = await asyncio.gather(
+            *(buscar_chunks_por_vetor(embedding, c, top_k=top_k, pergunta=pergunta) for c in CATEGORIAS)
+        )
+        tempos["busca_ms"] = _ms(t)
+        return dict(zip(CATEGORIAS, resultados))
+
+    local = None
+    if intencao is None and embedding is None and not centroides_disponiveis():
+        # sem classificador local o LLM não depende do embedding: os dois em paralelo
+        embedding, intencao = await asyncio.gather(_embedding(), _classificar_llm())
+    elif embedding is None:
+        embedding = await _embedding()
+    else:
+        tempos["embedding_ms"] = _ms(inicio)
+
+    if intencao is None:
+        t = time.perf_counter()
+        with etapa("intencao"):
+            local = classificar_local(embedding)
+        tempos["intencao_ms"] = _ms(t)
+        if confiante(local):
+            intencao = local
+
+    if intencao is not None:
+        categoria = intencao["categoria"]
+        trechos = await _buscar(categoria)
+    elif BUSCA_ESPECULATIVA:
+        intencao, por_categoria = await asyncio.gather(_classificar_llm(local), _buscar_todas())
+        categoria = intencao["categoria"]
+        trechos = por_categoria.get(categoria)
+        if trechos is None:
+            trechos = await _buscar(categoria)
+    else:
+        intencao = await _classificar_llm(local)
+        categoria = intencao["categoria"]
+        trechos = await _buscar(categoria)
+
+    definir_categoria(categoria)   # rótulo das métricas desta requisição
+    tempos["total_ms"] = _ms(inicio)
+    return {
+        "embedding": embedding,
+        "categoria": categoria,
+        "confianca": intencao["confianca"],
+        "origem_intencao": intencao["origem"],
+        "trechos": trechos,
+        "tempos": tempos,
+    }
@@ -0,0 +1,236 @@
+# services/projecaoService.py
+import os
+import json
+import threading
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.vectorStoreService import VECTOR_STORE_DIR
+
+# Base 2D (PCA) ajustada uma vez, na ingestão, sobre todos os chunks; salva junto do índice
+PROJECAO_DIR = os.getenv("PROJECAO_DIR", VECTOR_STORE_DIR)
+_BASE = "projecao.npz"          # média, componentes e variância explicada
+_MAPA = "mapa.npy"              # coordenadas 2D (float32, n x 2) de todos os chunks
+_MAPA_META = "mapa_meta.json"   # ids, códigos de categoria (mesma ordem) e lista de categorias
+
+
+def ajustar_base(matriz: np.ndarray, componentes: int = 2) -> Dict[str, np.ndarray]:
+    """
+    PCA da matriz centrada. Com mais chunks que dimensões (n >= d), via autovetores
+    da covariância d x d: O(n·d²) num único produto de matrizes, viável para 100k+
+    vetores. Com poucos chunks (n < d), via SVD da própria matriz n x d: O(n²·d),
+    sem montar a covariância d x d.
+    """
+    X = np.asarray(matriz, dtype="float64")
+    media = X.mean(axis=0)
+    Xc = X - media
+    if len(X) < X.shape[1]:
+        _, valores_singulares, vt = np.linalg.svd(Xc, full_matrices=False)   # ordem decrescente
+        variancias = valores_singulares ** 2
+        total = float(variancias.sum()) or 1.0
+        faltam = componentes - len(vt)                                        # n < componentes
+        eixos = np.vstack([vt[:componentes], np.zeros((max(faltam, 0), X.shape[1]))])
+        variancias = np.concatenate([variancias[:componentes], np.zeros(max(faltam, 0))])
+        return {
+            "media": media.astype("float32"),
+            "componentes": eixos.astype("float32"),                        # (k, d)
+            "variancia": (variancias / total).astype("float32"),
+        }
+    return _base_da_covariancia(media, (Xc.T @ Xc) / max(len(X) - 1, 1), componentes)
+
+
+def _base_da_covariancia(media: np.ndarray, cov: np.ndarray, componentes: int) -> Dict[str, np.ndarray]:
+    autovalores, autovetores = np.linalg.eigh(cov)        # ordem crescente
+    ordem = np.argsort(autovalores)[::-1][:componentes]
+    total = float(autovalores.clip(min=0).sum()) or 1.0
+    return {
+        "media": media.astype("float32"),
+        "componentes": autovetores[:, ordem].T.astype("float32"),   # (k, d)
+        "variancia": (autovalores[ordem].clip(min=0) / total).astype("float32"),
+    }
+
+
+class AcumuladorPCA:
+    """
+    Média e covariância do corpus recebidas em lotes (memória d x d, não n x d).
+    Enquanto houver menos linhas que dimensões, guarda as linhas (no máximo d x d)
+    para `ajustar_base` usar o SVD; dali em diante, só somas.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self._linhas = []
+        self._soma: Optional[np.ndarray] = None
+        self._produto: Optional[np.ndarray] = None
+
+    def adicionar(self, vetores: Sequence[Sequence[float]]):
+        X = np.asarray(vetores, dtype="float64")
+        if not len(X):
+            return
+        self.n += len(X)
+        if self._produto is None:
+            self._linhas.append(X)
+            if self.n < X.shape[1]:
+                return
+            X = np.vstack(self._linhas)
+            self._linhas = []
+            self._soma = np.zeros(X.shape[1])
+            self._produto = np.zeros((X.shape[1], X.shape[1]))
+        self._soma += X.sum(axis=0)
+        self._produto += X.T @ X
+
+    def base(self, componentes: int = 2) -> Dict[str, np.ndarray]:
+        if not self.n:
+            raise ValueError("Nenhum embedding acumulado.")
+        if self._produto is None:
+            return ajustar_base(np.vstack(self._linhas), componentes)
+        media = self._soma / self.n
+        cov = (self._produto - self.n * np.outer(media, media)) / max(self.n - 1, 1)
+        return _base_da_covariancia(media, cov, componentes)
+
+
+def projetar_com(base: Dict[str, np.ndarray], vetores: Sequence[Sequence[float]]) -> np.ndarray:
+    return (np.asarray(vetores, dtype="float32") - base["media"]) @ base["componentes"].T
+
+
+def salvar_projecao(chunks: Sequence[Dict[str, Any]], embeddings: Sequence[Sequence[float]], diretorio: str = PROJECAO_DIR) -> int:
+    """Ajusta a base sobre todo o corpus e grava base + mapa 2D do corpus."""
+    matriz = np.asarray(embeddings, dtype="float32")
+    if len(matriz) != len(chunks) or not len(matriz):
+        raise ValueError("Quantidade de chunks e de embeddings não confere.")
+    return salvar_projecao_em_lotes(ajustar_base(matriz), [(chunks, matriz)], len(matriz), diretorio)
+
+
+def salvar_projecao_em_lotes(
+    base: Dict[str, np.ndarray],
+    lotes: Iterable[Tuple[Sequence[Dict[str, Any]], Sequence[Sequence[float]]]],
+    total: int,
+    diretorio: str = PROJECAO_DIR,
+) -> int:
+    """
+    Grava a `base` e o mapa 2D de `total` chunks recebidos em lotes (chunks, embeddings):
+    as coordenadas vão direto para o .npy mapeado em disco. Os três arquivos são
+    escritos com nomes temporários e trocados no fim, a base por último: a API,
+    que recarrega quando a base muda, nunca lê uma base nova com mapa antigo.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    caminhos = {nome: os.path.join(diretorio, nome) for nome in (_MAPA, _MAPA_META, _BASE)}
+    coords = np.lib.format.open_memmap(caminhos[_MAPA] + ".tmp", mode="w+", dtype="float32", shape=(total, 2))
+    ids, categorias_linha = [], []
+    for chunks, embeddings in lotes:
+        inicio = len(ids)
+        if inicio + len(chunks) > total:
+            raise ValueError("Mais chunks que o total informado.")
+        coords[inicio:inicio + len(chunks)] = projetar_com(base, embeddings)
+        ids.extend(c["id"] for c in chunks)
+        categorias_linha.extend(c.get("categoria", "") for c in chunks)
+    if len(ids) != total:
+        raise ValueError("Quantidade de chunks diferente do total informado.")
+    coords.flush()
+    del coords
+
+    categorias = sorted(set(categorias_linha))
+    codigo = {c: i for i, c in enumerate(categorias)}
+    with open(caminhos[_MAPA_META] + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({
+            "categorias": categorias,
+            "ids": ids,
+            "codigos": [codigo[c] for c in categorias_linha],
+            "variancia": [float(v) for v in base["variancia"]],
+        }, f, ensure_ascii=False)
+    with open(caminhos[_BASE] + ".tmp", "wb") as f:
+        np.savez(f, **base)
+    for caminho in caminhos.values():   # ordem de inserção: mapa, meta, base
+        os.replace(caminho + ".tmp", caminho)
+    _cache.clear()
+    return total
+
+
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {}
+
+
+def _carregar(diretorio: str = PROJECAO_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Base e mapa em memória; recarrega quando a base é trocada (nova ingestão).
+    A base é o último arquivo trocado por `salvar_projecao_em_lotes`.
+    """
+    caminho = os.path.join(diretorio, _BASE)
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    versao = (estado.st_ino, estado.st_mtime_ns)
+    with _lock:
+        if _cache.get("versao") != versao:
+            with np.load(caminho) as npz:
+                base = {k: npz[k] for k in ("media", "componentes", "variancia")}
+            with open(os.path.join(diretorio, _MAPA_META), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            _cache.clear()
+            _cache.update(
+                versao=versao,
+                base=base,
+                # mmap: páginas do mapa são lidas do disco sob demanda
+                coords=np.load(os.path.join(diretorio, _MAPA), mmap_mode="r"),
+                codigos=np.asarray(meta["codigos"], dtype="uint16"),
+                ids=meta["ids"],
+                categorias=meta["categorias"],
+            )
+        return dict(_cache)
+
+
+def obter_base() -> Optional[Dict[str, np.ndarray]]:
+    dados = _carregar()
+    return dados["base"] if dados else None
+
+
+def projetar(vetores: Sequence[Sequence[float]]) -> Optional[np.ndarray]:
+    """Coordenadas 2D na base do corpus (um produto de matrizes), ou None se não houver base."""
+    base = obter_base()
+    return projetar_com(base, vetores) if base is not None else None
+
+
+def pagina_mapa(pagina: int = 0, tamanho: int = 5000) -> Optional[Dict[str, Any]]:
+    """Fatia do mapa do corpus: coordenadas, código da categoria e id de cada chunk."""
+    dados = _carregar()
+    if dados is None:
+        return None
+    total = len(dados["ids"])
+    inicio = max(0, pagina) * tamanho
+    fim = max(inicio, min(total, inicio + tamanho))
+    coords = np.asarray(dados["coords"][inicio:fim])
+    return {
+        "total": total,
+        "pagina": pagina,
+        "tamanho": tamanho,
+        "categorias": dados["categorias"],
+        "variancia": [float(v) for v in dados["base"]["variancia"]],
+        "ids": dados["ids"][inicio:fim],
+        "pontos": [
+            [round(float(x), 5), round(float(y), 5), int(c)]
+            for (x, y), c in zip(coords, dados["codigos"][inicio:fim])
+        ],
+    }
+
+
+def mapa_binario(pagina: int = 0, tamanho: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Mesma fatia em binário compacto: por ponto, x e y (float32 little-endian)
+    seguidos do código da categoria (uint16) — 10 bytes por chunk.
+    `tamanho=0` devolve o corpus inteiro.
+    """
+    dados = _carregar()
+    if dados is None:
+        return None
+    total = len(dados["ids"])
+    inicio = max(0, pagina) * tamanho if tamanho else 0
+    fim = max(inicio, min(total, inicio + tamanho)) if tamanho else total
+    inicio = min(inicio, fim)
+    registros = np.empty(fim - inicio, dtype=[("x", "<f4"), ("y", "<f4"), ("categoria", "<u2")])
+    coords = np.asarray(dados["coords"][inicio:fim])
+    registros["x"] = coords[:, 0]
+    registros["y"] = coords[:, 1]
+    registros["categoria"] = dados["codigos"][inicio:fim]
+    return {"total": total, "inicio": inicio, "categorias": dados["categorias"], "conteudo": registros.tobytes()}
@@ -1,19 +1,15 @@
 from services.searchService import buscar_chunks_relevantes
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
+from services.clientService import get_async_openai
+from services.telemetriaService import etapa, registrar_uso
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("api_key_openIA"))
-
-def responder_simples(pergunta: str) -> str:
-    trechos = buscar_chunks_relevantes(pergunta)
+async def responder_simples(pergunta: str) -> str:
+    trechos = await buscar_chunks_relevantes(pergunta)
 
     if not trechos:
         return "❌ Resposta não encontrada."
 
     contexto = "\n\n".join(
-        f"[Fonte {i+1} - {t.metadata.get('titulo')}]: {t.metadata.get('content')}"
+        f"[Fonte {i+1} - {t['metadata'].get('titulo')}]: {t['metadata'].get('content')}"
         for i, t in enumerate(trechos)
     )
 
@@ -27,13 +23,15 @@ Pergunta: {pergunta}
 Resposta:
 """
 
-    resposta = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "Você é um assistente que responde com base em documentos técnicos."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
-    )
+    with etapa("completion"):
+        resposta = await get_async_openai().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "Você é um assistente que responde com base em documentos técnicos."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2
+        )
+    registrar_uso("gpt-3.5-turbo", getattr(resposta, "usage", None))
 
     return resposta.choices[0].message.content.strip()
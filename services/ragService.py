@@ -1,20 +1,10 @@
 
-from services.searchService import buscar_chunks_relevantes_por_categoria
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("api_key_openIA"))
-
-def _montar_contexto(trechos) -> str:
-    linhas = []
-    for i, t in enumerate(trechos, start=1):
-        meta = t["metadata"]
-        titulo = meta.get("titulo") or "-"
-        content = meta.get("content") or meta.get("trecho") or ""
-        linhas.append(f"(C{i} • {titulo}) {content}")
-    return "\n".join(linhas)
+import time
+from services.clientService import get_async_openai
+from services.contextoService import montar_contexto
+from services.pipelineService import recuperar_com_intencao
+from services.respostaCacheService import cache_rag, consultar, guardar
+from services.telemetriaService import etapa, registrar_uso
 
 def _prompt_resposta(pergunta: str, contexto: str) -> str:
     return f"""
@@ -53,39 +43,105 @@ Resumo: ...
 • ...
 """
 
-async def gerar_resposta_com_citacoes(pergunta: str):
-    from services.intentService import classificar_intencao
-    categoria = await classificar_intencao(pergunta)
-
-    # top_k ↑ para dar mais cobertura
-    trechos = buscar_chunks_relevantes_por_categoria(pergunta, categoria, top_k=6)
+SYSTEM_MSG = "Responda APENAS com base no CONTEXTO. Não invente e não cite fontes."
 
-    contexto = _montar_contexto(trechos)
-    prompt = _prompt_resposta(pergunta, contexto)
+async def _preparar(pergunta: str, embedding=None, intencao=None):
+    # classificação e busca em paralelo; top_k ↑ para dar mais cobertura
+    recuperacao = await recuperar_com_intencao(pergunta, top_k=6, embedding=embedding, intencao=intencao)
+    categoria = recuperacao["categoria"]
 
-    resp = client.chat.completions.create(
-        model="gpt-3.5-turbo",   # troque se quiser (ex.: gpt-4o-mini)
-        messages=[
-            {"role": "system", "content": "Responda APENAS com base no CONTEXTO. Não invente e não cite fontes."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.45,
-        max_tokens=650
-    )
-
-    resposta_modelo = resp.choices[0].message.content.strip()
+    # corte por score, sem sentenças repetidas e dentro do orçamento de tokens
+    with etapa("contexto"):
+        montado = montar_contexto(recuperacao["trechos"])
+    trechos = montado["trechos"]
+    prompt = _prompt_resposta(pergunta, montado["contexto"])
 
     fontes = [
         {
             "titulo": t["metadata"].get("titulo"),
+            "titulos": t["metadata"].get("titulos") or [t["metadata"].get("titulo")],
             "categoria": t["metadata"].get("categoria"),
             "trecho": t["metadata"].get("content") or t["metadata"].get("trecho") or ""
         }
         for t in trechos
     ]
+    messages = [
+        {"role": "system", "content": SYSTEM_MSG},
+        {"role": "user", "content": prompt}
+    ]
+    return categoria, fontes, messages, recuperacao["tempos"], montado["tokens"]
+
+async def gerar_resposta_com_citacoes(pergunta: str):
+    inicio = time.perf_counter()
+    em_cache, ctx = await consultar(cache_rag, pergunta)
+    if em_cache is not None:
+        tempos = {"total_ms": round((time.perf_counter() - inicio) * 1000, 1)}
+        return {**em_cache, "tempos": tempos, "cache": True}
+
+    categoria, fontes, messages, tempos, tokens = await _preparar(pergunta, ctx["embedding"], ctx["intencao"])
+
+    with etapa("completion"):
+        resp = await get_async_openai().chat.completions.create(
+            model="gpt-3.5-turbo",   # troque se quiser (ex.: gpt-4o-mini)
+            messages=messages,
+            temperature=0.45,
+            max_tokens=650
+        )
+    registrar_uso("gpt-3.5-turbo", getattr(resp, "usage", None))
+
+    resposta_modelo = resp.choices[0].message.content.strip()
+    guardar(cache_rag, ctx["embedding"], categoria, {
+        "categoria": categoria, "resposta": resposta_modelo, "fontes": fontes
+    })
 
     return {
         "categoria": categoria,
         "resposta": resposta_modelo,  # texto sem citar fontes
-        "fontes": fontes              # mostradas na aba "Fontes" da sua UI
+        "fontes": fontes,             # mostradas na aba "Fontes" da sua UI
+        "tempos": tempos,
+        "tokens": tokens,
+        "cache": False
     }
+
+async def gerar_resposta_com_citacoes_stream(pergunta: str):
+    """
+    Variante em streaming: emite ("meta", {categoria, fontes}),
+    depois ("delta", {texto}) a cada pedaço e por fim ("fim", {categoria, resposta, fontes}).
+    """
+    inicio = time.perf_counter()
+    em_cache, ctx = await consultar(cache_rag, pergunta)
+    if em_cache is not None:
+        tempos = {"total_ms": round((time.perf_counter() - inicio) * 1000, 1)}
+        yield "meta", {"categoria": em_cache["categoria"], "fontes": em_cache["fontes"], "tempos": tempos, "cache": True}
+        yield "delta", {"texto": em_cache["resposta"]}
+        yield "fim", {"categoria": em_cache["categoria"], "resposta": em_cache["resposta"], "fontes": em_cache["fontes"]}
+        return
+
+    categoria, fontes, messages, tempos, tokens = await _preparar(pergunta, ctx["embedding"], ctx["intencao"])
+    yield "meta", {"categoria": categoria, "fontes": fontes, "tempos": tempos, "tokens": tokens, "cache": False}
+
+    partes = []
+    with etapa("completion"):   # até o último token
+        stream = await get_async_openai().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            temperature=0.45,
+            max_tokens=650,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for evento in stream:
+            if getattr(evento, "usage", None) is not None:
+                registrar_uso("gpt-3.5-turbo", evento.usage)
+            if not evento.choices:
+                continue
+            delta = evento.choices[0].delta.content or ""
+            if delta:
+                partes.append(delta)
+                yield "delta", {"texto": delta}
+
+    resposta_modelo = "".join(partes).strip()
+    guardar(cache_rag, ctx["embedding"], categoria, {
+        "categoria": categoria, "resposta": resposta_modelo, "fontes": fontes
+    })
+    yield "fim", {"categoria": categoria, "resposta": resposta_modelo, "fontes": fontes}
@@ -0,0 +1,194 @@
+# services/respostaCacheService.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.embeddingService import embed_async
+from services.intentService import classificar_intencao_detalhada
+from services.telemetriaService import definir_categoria
+from services.vectorStoreService import versao_indice
+
+# Cache semântico de respostas: perguntas parecidas (mesma categoria) reaproveitam a resposta
+RESPOSTA_CACHE_SIMILARIDADE = float(os.getenv("RESPOSTA_CACHE_SIMILARIDADE", "0.95"))
+RESPOSTA_CACHE_TTL_S = float(os.getenv("RESPOSTA_CACHE_TTL_S", "3600"))
+RESPOSTA_CACHE_MAX = int(os.getenv("RESPOSTA_CACHE_MAX", "1000"))
+RESPOSTA_CACHE_ATIVO = os.getenv("RESPOSTA_CACHE_ATIVO", "true").lower() == "true"
+
+# intervalo entre verificações do marcador de versão do índice
+_VERSAO_INTERVALO_S = 5.0
+
+
+class CacheRespostas:
+    """
+    Entradas (embedding normalizado, categoria, valor) com TTL e despejo LRU.
+    Os embeddings ficam numa matriz pré-alocada (cresce dobrando até `max_itens`
+    linhas; linhas de entradas removidas são reaproveitadas), e a busca compara
+    a pergunta com todas as entradas da categoria numa única multiplicação,
+    sem copiar vetores. Todo o conteúdo é descartado quando a versão do índice
+    muda (nova ingestão).
+    """
+
+    def __init__(
+        self,
+        limiar: float = RESPOSTA_CACHE_SIMILARIDADE,
+        ttl_s: float = RESPOSTA_CACHE_TTL_S,
+        max_itens: int = RESPOSTA_CACHE_MAX,
+    ):
+        self.limiar = limiar
+        self.ttl_s = ttl_s
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        self._itens: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._seq = 0
+        self._limpar_matriz()
+        self._versao = versao_indice()
+        self._versao_checada = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def _limpar_matriz(self):
+        self._vetores: Optional[np.ndarray] = None   # (capacidade, d)
+        self._codigos = np.zeros(0, dtype="int32")    # categoria de cada linha; -1 = livre
+        self._chaves: List[int] = []                  # linha → chave em _itens
+        self._livres: List[int] = []
+        self._usadas = 0                              # linhas já ocupadas alguma vez
+        self._codigo_categoria: Dict[str, int] = {}
+
+    def _verificar_versao(self):
+        agora = time.monotonic()
+        if agora - self._versao_checada < _VERSAO_INTERVALO_S:
+            return
+        self._versao_checada = agora
+        versao = versao_indice()
+        if versao != self._versao:
+            self._versao = versao
+            self._itens.clear()
+            self._limpar_matriz()
+
+    def _remover(self, chave: int):
+        linha = self._itens.pop(chave)["linha"]
+        self._codigos[linha] = -1
+        self._livres.append(linha)
+
+    def _expirar(self):
+        limite = time.monotonic() - self.ttl_s
+        for chave in [k for k, v in self._itens.items() if v["criado"] < limite]:
+            self._remover(chave)
+
+    def _linha_livre(self, dimensao: int) -> int:
+        if self._livres:
+            return self._livres.pop()
+        if self._vetores is None:
+            self._vetores = np.zeros((min(self.max_itens, 64), dimensao), dtype="float32")
+            self._codigos = np.full(len(self._vetores), -1, dtype="int32")
+        elif self._usadas == len(self._vetores):
+            # sem linhas livres ⇒ menos de max_itens entradas: ainda cabe crescer
+            capacidade = min(self.max_itens, 2 * len(self._vetores))
+            vetores = np.zeros((capacidade, dimensao), dtype="float32")
+            vetores[:self._usadas] = self._vetores
+            codigos = np.full(capacidade, -1, dtype="int32")
+            codigos[:self._usadas] = self._codigos
+            self._vetores, self._codigos = vetores, codigos
+        self._chaves.append(0)
+        self._usadas += 1
+        return self._usadas - 1
+
+    def buscar(self, embedding: List[float], categoria: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Melhor entrada com similaridade ≥ limiar (na categoria, se informada)."""
+        q = np.asarray(embedding, dtype="float32")
+        q = q / (np.linalg.norm(q) + 1e-9)
+        with self._lock:
+            self._verificar_versao()
+            self._expirar()
+            if not self._itens:
+                return None
+            codigos = self._codigos[:self._usadas]
+            if categoria is None:
+                mascara = codigos >= 0
+            elif categoria in self._codigo_categoria:
+                mascara = codigos == self._codigo_categoria[categoria]
+            else:
+                return None
+            if not mascara.any():
+                return None
+            sims = np.where(mascara, self._vetores[:self._usadas] @ q, -np.inf)
+            linha = int(np.argmax(sims))
+            if sims[linha] < self.limiar:
+                return None
+            chave = self._chaves[linha]
+            self._itens.move_to_end(chave)
+            return {**self._itens[chave]["valor"], "similaridade": round(float(sims[linha]), 4)}
+
+    def guardar(self, embedding: List[float], categoria: str, valor: Dict[str, Any]):
+        v = np.asarray(embedding, dtype="float32")
+        v = v / (np.linalg.norm(v) + 1e-9)
+        with self._lock:
+            if self.max_itens <= 0:
+                return
+            while len(self._itens) >= self.max_itens:
+                self._remover(next(iter(self._itens)))
+            linha = self._linha_livre(len(v))
+            self._seq += 1
+            self._vetores[linha] = v
+            self._codigos[linha] = self._codigo_categoria.setdefault(categoria, len(self._codigo_categoria))
+            self._chaves[linha] = self._seq
+            self._itens[self._seq] = {
+                "linha": linha,
+                "categoria": categoria,
+                "valor": valor,
+                "criado": time.monotonic(),
+            }
+
+    def invalidar(self):
+        with self._lock:
+            self._itens.clear()
+            self._limpar_matriz()
+
+    def registrar(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"itens": len(self._itens), "hits": self.hits, "misses": self.misses}
+
+
+# um cache por formato de resposta (os prompts do chat e do RAG diferem)
+cache_rag = CacheRespostas()
+cache_chat = CacheRespostas()
+
+
+async def consultar(cache: CacheRespostas, pergunta: str) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Retorna (valor em cache ou None, contexto). O contexto traz o embedding e,
+    se já tiver sido calculada, a intenção, para o caminho normal não repeti-los.
+    A intenção só é classificada quando existe algum candidato acima do limiar.
+    """
+    embedding = await embed_async(pergunta)
+    contexto: Dict[str, Any] = {"embedding": embedding, "intencao": None}
+    if not RESPOSTA_CACHE_ATIVO:
+        return None, contexto
+
+    if cache.buscar(embedding) is not None:
+        intencao = await classificar_intencao_detalhada(pergunta, embedding)
+        contexto["intencao"] = intencao
+        valor = cache.buscar(embedding, intencao["categoria"])
+        if valor is not None:
+            cache.registrar(True)
+            definir_categoria(intencao["categoria"])
+            return valor, contexto
+
+    cache.registrar(False)
+    return None, contexto
+
+
+def guardar(cache: CacheRespostas, embedding: List[float], categoria: str, valor: Dict[str, Any]):
+    if RESPOSTA_CACHE_ATIVO:
+        cache.guardar(embedding, categoria, valor)
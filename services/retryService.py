@@ -0,0 +1,75 @@
+# services/retryService.py
+import os
+import time
+import random
+import logging
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+RETRY_TENTATIVAS = int(os.getenv("RETRY_TENTATIVAS", "6"))
+RETRY_BASE_S = float(os.getenv("RETRY_BASE_S", "1.0"))
+RETRY_MAX_S = float(os.getenv("RETRY_MAX_S", "60"))
+
+# falhas de rede/timeout que valem nova tentativa mesmo sem status HTTP
+_NOMES_TRANSITORIOS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "ServiceUnavailableException"}
+
+
+def status_http(erro: BaseException):
+    for attr in ("status_code", "status"):
+        valor = getattr(erro, attr, None)
+        if isinstance(valor, int):
+            return valor
+    resposta = getattr(erro, "response", None)
+    return getattr(resposta, "status_code", None)
+
+
+def erro_retentavel(erro: BaseException) -> bool:
+    """429 (rate limit), 5xx e falhas transitórias de conexão."""
+    status = status_http(erro)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(erro).__name__ in _NOMES_TRANSITORIOS
+
+
+def erro_retentavel_pinecone(erro: BaseException) -> bool:
+    """Só 429: o cliente Pinecone (urllib3) já repete 5xx e falhas de conexão, com backoff."""
+    return status_http(erro) == 429
+
+
+def _espera(tentativa: int, erro: BaseException) -> float:
+    # respeita o Retry-After quando a API informa; senão, backoff exponencial com jitter
+    cabecalhos = getattr(getattr(erro, "response", None), "headers", None) or {}
+    try:
+        return min(RETRY_MAX_S, float(cabecalhos.get("retry-after")))
+    except (TypeError, ValueError):
+        return min(RETRY_MAX_S, RETRY_BASE_S * 2 ** tentativa) * random.uniform(0.5, 1.0)
+
+
+def com_retentativas(
+    funcao: Callable[..., T],
+    *args,
+    tentativas: int = RETRY_TENTATIVAS,
+    retentavel: Callable[[BaseException], bool] = erro_retentavel,
+    **kwargs,
+) -> T:
+    """
+    Executa `funcao`, repetindo com backoff exponencial enquanto o erro for retentável.
+
+    Os SDKs têm retentativas próprias; para não multiplicá-las:
+    - OpenAI (`max_retries`, padrão 2): passe um cliente com `max_retries=0`
+      (ver 2_limparChunks.py e o `cliente` de `embed_lote`);
+    - Pinecone (5 retentativas em 5xx/conexão, sem opção pública para desligar):
+      use `retentavel=erro_retentavel_pinecone`, que só repete 429.
+    """
+    for tentativa in range(tentativas):
+        try:
+            return funcao(*args, **kwargs)
+        except Exception as e:
+            if tentativa == tentativas - 1 or not retentavel(e):
+                raise
+            espera = _espera(tentativa, e)
+            logger.warning("%s (status %s); nova tentativa em %.1fs", type(e).__name__, status_http(e), espera)
+            time.sleep(espera)
@@ -0,0 +1,227 @@
+# services/ruidoService.py
+import os
+import re
+import hashlib
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Set
+
+import numpy as np
+
+from services.embeddingService import embed_lote, lotes_por_tokens
+
+# Pesos dos sinais no score de cada sentença
+RUIDO_PESO_CATEGORIA = float(os.getenv("RUIDO_PESO_CATEGORIA", "0.5"))  # cosseno com o centróide da categoria
+RUIDO_PESO_DOCUMENTO = float(os.getenv("RUIDO_PESO_DOCUMENTO", "0.3"))  # cosseno com o restante do chunk
+RUIDO_PESO_LEXICO = float(os.getenv("RUIDO_PESO_LEXICO", "0.2"))        # especificidade do vocabulário na categoria
+# Desvios robustos (mediana/MAD da categoria) abaixo dos quais a sentença é descartada ou vai ao LLM
+RUIDO_Z_DESCARTE = float(os.getenv("RUIDO_Z_DESCARTE", "3.0"))
+RUIDO_Z_AMBIGUO = float(os.getenv("RUIDO_Z_AMBIGUO", "1.5"))
+# penalidade (em desvios) para sentença idêntica presente em mais de uma categoria
+RUIDO_Z_REPETICAO = float(os.getenv("RUIDO_Z_REPETICAO", "3.0"))
+# chunks por chamada de embeddings nas passadas de construção do filtro
+RUIDO_LOTE = int(os.getenv("RUIDO_LOTE", "256"))
+
+MANTER, DESCARTAR, AMBIGUA = "manter", "descartar", "ambigua"
+
+_SENTENCAS = re.compile(r"(?<=[.!?])\s+")
+_PALAVRAS = re.compile(r"[a-z0-9]{4,}")
+
+
+def dividir_sentencas(texto: str) -> List[str]:
+    return [s.strip() for s in _SENTENCAS.split(texto or "") if s.strip()]
+
+
+def normalizar(texto: str) -> str:
+    s = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode().lower()
+    s = re.sub(r"[^a-z0-9\s]", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _palavras(texto: str) -> List[str]:
+    return _PALAVRAS.findall(normalizar(texto))
+
+
+def _unitarios(matriz: np.ndarray) -> np.ndarray:
+    return matriz / (np.linalg.norm(matriz, axis=1, keepdims=True) + 1e-9)
+
+
+def _embeddings(textos: Sequence[str]) -> np.ndarray:
+    vetores: List[List[float]] = []
+    for inicio, fim, _ in lotes_por_tokens(textos):
+        vetores.extend(embed_lote(textos[inicio:fim]))
+    return _unitarios(np.asarray(vetores, dtype="float32"))
+
+
+def _em_lotes(registros: Iterable[Dict[str, Any]], tamanho: int) -> Iterator[List[Dict[str, Any]]]:
+    lote: List[Dict[str, Any]] = []
+    for r in registros:
+        lote.append(r)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _chave_sentenca(sentenca: str) -> bytes:
+    return hashlib.blake2b(normalizar(sentenca).encode("utf-8"), digest_size=8).digest()
+
+
+class FiltroRuido:
+    """
+    Pontua cada sentença dos chunks contra o próprio chunk e a categoria:
+    - cosseno com o centróide das sentenças da categoria;
+    - cosseno com a média das demais sentenças do chunk;
+    - especificidade lexical: fração de ocorrências das palavras que caem na
+      categoria (ruído injetado em todas as categorias ou inédito pontua baixo);
+    - penalidade para sentenças repetidas literalmente em mais de uma categoria.
+    O score vira um desvio robusto (mediana/MAD) dentro da categoria; outliers
+    fortes são descartados e a faixa intermediária fica marcada como ambígua.
+
+    `registros` é percorrido duas vezes, em lotes de RUIDO_LOTE chunks (lista,
+    ou iterável que refaz os chunks a cada passada): a primeira acumula
+    centróides, frequências de documento e hashes de sentenças por categoria;
+    a segunda, a mediana/MAD dos scores. O conteúdo não fica em memória:
+    `decisoes(registro)` pontua o chunk na hora (embeddings já no cache).
+    """
+
+    def __init__(self, registros: Iterable[Dict[str, Any]], lote: int = RUIDO_LOTE):
+        somas: Dict[str, np.ndarray] = {}
+        # frequência de documento das palavras: por categoria e no total
+        self._df_categoria: Dict[str, Counter] = defaultdict(Counter)
+        self._df_total: Counter = Counter()
+        # hash da sentença normalizada → primeira categoria; repetidas = vistas em mais de uma
+        categoria_da_sentenca: Dict[bytes, str] = {}
+        self._repetidas: Set[bytes] = set()
+        for r, sentencas, vetores in self._percorrer(registros, lote):
+            c = r.get("categoria", "")
+            soma = vetores.sum(axis=0, dtype="float64")
+            somas[c] = somas[c] + soma if c in somas else soma
+            palavras = set().union(*(_palavras(s) for s in sentencas))
+            self._df_categoria[c].update(palavras)
+            self._df_total.update(palavras)
+            for s in sentencas:
+                chave = _chave_sentenca(s)
+                if categoria_da_sentenca.setdefault(chave, c) != c:
+                    self._repetidas.add(chave)
+        del categoria_da_sentenca
+        self._centroides = {c: _unitarios(s[None, :])[0].astype("float32") for c, s in somas.items()}
+
+        scores: Dict[str, List[np.ndarray]] = defaultdict(list)
+        for r, sentencas, vetores in self._percorrer(registros, lote):
+            c = r.get("categoria", "")
+            scores[c].append(self._pontuar(c, sentencas, vetores))
+        self._escala: Dict[str, tuple] = {}
+        for c, partes in scores.items():
+            todos = np.concatenate(partes)
+            mediana = float(np.median(todos))
+            mad = float(np.median(np.abs(todos - mediana))) * 1.4826 or 1e-6
+            self._escala[c] = (mediana, mad)
+
+    @staticmethod
+    def _percorrer(registros, lote):
+        """(registro, sentenças, embeddings) dos chunks com sentenças; uma chamada de embeddings por lote."""
+        for grupo in _em_lotes(registros, lote):
+            sentencas = [dividir_sentencas(r["content"]) for r in grupo]
+            todas = [s for ss in sentencas for s in ss]
+            if not todas:
+                continue
+            vetores = _embeddings(todas)
+            inicio = 0
+            for r, ss in zip(grupo, sentencas):
+                if ss:
+                    yield r, ss, vetores[inicio:inicio + len(ss)]
+                    inicio += len(ss)
+
+    def _pontuar(self, categoria: str, sentencas: List[str], vetores: np.ndarray) -> np.ndarray:
+        centroide = self._centroides[categoria]
+        df_categoria = self._df_categoria[categoria]
+        soma_chunk = vetores.sum(axis=0)
+        scores = np.zeros(len(sentencas), dtype="float32")
+        for i, s in enumerate(sentencas):
+            sim_categoria = float(vetores[i] @ centroide)
+            if len(sentencas) > 1:
+                resto = _unitarios((soma_chunk - vetores[i])[None, :])[0]
+                sim_documento = float(vetores[i] @ resto)
+            else:
+                sim_documento = sim_categoria
+            # contagens sem o próprio chunk
+            especificidades = []
+            for p in set(_palavras(s)):
+                total = self._df_total[p] - 1
+                especificidades.append((df_categoria[p] - 1) / total if total > 0 else 0.0)
+            lexico = float(np.mean(especificidades)) if especificidades else 0.0
+            scores[i] = (
+                RUIDO_PESO_CATEGORIA * sim_categoria
+                + RUIDO_PESO_DOCUMENTO * sim_documento
+                + RUIDO_PESO_LEXICO * lexico
+            )
+        return scores
+
+    def decisoes(self, registro: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Decisão por sentença de um chunk do corpus usado na construção do filtro."""
+        c = registro.get("categoria", "")
+        sentencas = dividir_sentencas(registro["content"])
+        if not sentencas or c not in self._escala:
+            return []
+        scores = self._pontuar(c, sentencas, _embeddings(sentencas))
+        mediana, mad = self._escala[c]
+        desvios = (scores - mediana) / mad
+        resultado = []
+        for s, score, desvio in zip(sentencas, scores, desvios):
+            z = float(desvio)
+            if _chave_sentenca(s) in self._repetidas:
+                z -= RUIDO_Z_REPETICAO
+            decisao = DESCARTAR if z < -RUIDO_Z_DESCARTE else AMBIGUA if z < -RUIDO_Z_AMBIGUO else MANTER
+            resultado.append({"sentenca": s, "score": round(float(score), 4), "z": round(z, 3), "decisao": decisao})
+        return resultado
+
+
+def avaliar_filtro(
+    filtro: FiltroRuido,
+    registros: Sequence[Dict[str, Any]],
+    referencia: Dict[str, str],
+) -> Dict[str, Any]:
+    """
+    Precisão/recall do filtro local contra a limpeza feita pelo LLM
+    (`referencia`: id → conteúdo limpo). Uma sentença conta como ruído quando
+    não aparece no texto limpo do mesmo chunk. Reporta dois cenários: só o
+    filtro local (ambíguas mantidas) e o teto com as ambíguas resolvidas.
+    """
+    vp = fp = fn = vn = 0
+    vp_teto = fp_teto = fn_teto = 0
+    ambiguas = 0
+    for r in registros:
+        if r["id"] not in referencia:
+            continue
+        limpo = normalizar(referencia[r["id"]])
+        for d in filtro.decisoes(r):
+            ruido = normalizar(d["sentenca"]) not in limpo
+            descartada = d["decisao"] == DESCARTAR
+            ambiguas += d["decisao"] == AMBIGUA
+            vp += ruido and descartada
+            fp += (not ruido) and descartada
+            fn += ruido and not descartada
+            vn += (not ruido) and not descartada
+            # teto: o LLM acerta todas as ambíguas
+            teto = descartada or (d["decisao"] == AMBIGUA and ruido)
+            vp_teto += ruido and teto
+            fp_teto += (not ruido) and teto
+            fn_teto += ruido and not teto
+
+    def razao(a, b):
+        return round(a / b, 4) if b else 0.0
+
+    total = vp + fp + fn + vn
+    return {
+        "sentencas": total,
+        "ruido_referencia": vp + fn,
+        "descartadas_local": vp + fp,
+        "ambiguas_llm": ambiguas,
+        "fracao_llm": razao(ambiguas, total),
+        "precisao": razao(vp, vp + fp),
+        "recall": razao(vp, vp + fn),
+        "precisao_com_llm": razao(vp_teto, vp_teto + fp_teto),
+        "recall_com_llm": razao(vp_teto, vp_teto + fn_teto),
+    }
@@ -1,46 +1,71 @@
 
-from typing import List, Optional, Dict, Any
 import os
-from openai import OpenAI
-from pinecone import Pinecone
+import asyncio
+from typing import List, Optional, Dict, Any
+
+from services.bm25Service import buscar_bm25
+from services.embeddingService import embed_async
+from services.mmrService import MMR_ATIVO, MMR_FATOR_CANDIDATOS, diversificar
+from services.telemetriaService import etapa
+from services.vectorStoreService import obter_index
 
-OPENAI_API_KEY = os.getenv("api_key_openIA")
-PINECONE_API_KEY = os.getenv("api_key_pinecone")
-INDEX_NAME = "testeanalistasr"
+# "denso": só o índice vetorial | "hibrido": denso + BM25 local fundidos por RRF
+MODO_BUSCA = os.getenv("MODO_BUSCA", "denso")
+RRF_K = int(os.getenv("RRF_K", "60"))
 
-_openai = OpenAI(api_key=OPENAI_API_KEY)
-_pc = Pinecone(api_key=PINECONE_API_KEY)
-_index = _pc.Index(INDEX_NAME)
+async def _embed(texto: str) -> List[float]:
+    return await embed_async(texto)
 
-def _embed(texto: str) -> List[float]:
-    resp = _openai.embeddings.create(
-        model="text-embedding-3-small",
-        input=texto
-    )
-    return resp.data[0].embedding
+async def _query(**kwargs) -> Dict[str, Any]:
+    # o cliente de índice é síncrono (pool HTTP próprio / FAISS em CPU):
+    # roda em thread para não travar o event loop
+    with etapa("indice"):
+        return await asyncio.to_thread(obter_index().query, **kwargs)
 
-def _normalizar_matches(resp: Dict[str, Any]) -> List[Dict[str, Any]]:
+def _normalizar_matches(resp: Dict[str, Any], com_valores: bool = False) -> List[Dict[str, Any]]:
     matches = []
     for m in (resp.get("matches") or []):
         md = m.get("metadata", {}) or {}
-        matches.append({
+        item = {
             "id": m.get("id"),
             "score": m.get("score"),
             "metadata": {
                 "titulo": md.get("titulo", ""),
+                "titulos": md.get("titulos") or [md.get("titulo", "")],
                 "categoria": md.get("categoria", ""),
                 "content": md.get("content", ""),
             }
-        })
+        }
+        if com_valores:
+            item["values"] = m.get("values")
+        matches.append(item)
     return matches
 
-def buscar_chunks_relevantes_por_categoria(
+def fundir_rrf(listas: List[List[Dict[str, Any]]], top_k: int, k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Reciprocal-rank fusion: score(d) = Σ 1/(k + posição de d em cada lista).
+    `listas[0]` é a densa: o cosseno dela fica em "score_denso" (ausente nos
+    trechos que só o BM25 encontrou) e o valor fundido em "score".
+    """
+    fundidos: Dict[str, Dict[str, Any]] = {}
+    for n, lista in enumerate(listas):
+        for posicao, m in enumerate(lista, start=1):
+            item = fundidos.setdefault(m["id"], {"id": m["id"], "score": 0.0, "metadata": m["metadata"]})
+            item["score"] += 1.0 / (k + posicao)
+            if n == 0:
+                item["score_denso"] = m.get("score")
+    ordenados = sorted(fundidos.values(), key=lambda m: m["score"], reverse=True)[:top_k]
+    for m in ordenados:
+        m["score"] = round(m["score"], 6)
+    return ordenados
+
+async def buscar_chunks_relevantes_por_categoria(
     pergunta: str,
     categoria: str,
     top_k: int = 4
 ) -> List[Dict[str, Any]]:
     """
-    Busca no Pinecone filtrando por categoria no metadata.
+    Busca no índice vetorial (Pinecone ou FAISS local) filtrando por categoria no metadata.
     Retorna lista normalizada:
     [
       {
@@ -51,26 +76,51 @@ def buscar_chunks_relevantes_por_categoria(
       ...
     ]
     """
-    emb = _embed(pergunta)
-    resp = _index.query(
-        vector=emb,
-        top_k=top_k,
-        include_metadata=True,
-        filter={"categoria": {"$eq": categoria}}
-    )
-    return _normalizar_matches(resp)
+    emb = await _embed(pergunta)
+    return await buscar_chunks_por_vetor(emb, categoria, top_k=top_k, pergunta=pergunta)
+
+async def buscar_chunks_por_vetor(
+    embedding: List[float],
+    categoria: Optional[str] = None,
+    top_k: int = 4,
+    pergunta: Optional[str] = None,
+    modo: Optional[str] = None,
+    mmr: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Igual às buscas acima, mas com o embedding da pergunta já calculado
+    (permite reaproveitá-lo na classificação de intenção).
+    Com MMR_ATIVO, busca top_k × MMR_FATOR_CANDIDATOS candidatos com os vetores
+    e devolve até top_k diversificados por MMR (quase duplicatas saem).
+    Com MODO_BUSCA=hibrido e a `pergunta` informada, funde com o BM25 local.
+    `modo` e `mmr` sobrepõem MODO_BUSCA/MMR_ATIVO nesta chamada (comparação de configurações).
+    """
+    modo = MODO_BUSCA if modo is None else modo
+    mmr = MMR_ATIVO if mmr is None else mmr
+    kwargs: Dict[str, Any] = {"vector": embedding, "top_k": top_k, "include_metadata": True}
+    if categoria:
+        kwargs["filter"] = {"categoria": {"$eq": categoria}}
+    if mmr:
+        kwargs.update(top_k=top_k * MMR_FATOR_CANDIDATOS, include_values=True)
+        candidatos = _normalizar_matches(await _query(**kwargs), com_valores=True)
+        with etapa("mmr"):
+            densos = diversificar(embedding, candidatos, top_k)
+    else:
+        densos = _normalizar_matches(await _query(**kwargs))
+    if modo != "hibrido" or not pergunta:
+        return densos
+    # BM25 em memória, sem chamada de rede; em thread porque a primeira busca (e as
+    # verificações periódicas do arquivo) leem o JSONL do disco
+    with etapa("bm25"):
+        lexicos = await asyncio.to_thread(buscar_bm25, pergunta, top_k=top_k, categoria=categoria)
+    return fundir_rrf([densos, lexicos], top_k=top_k)
 
-def buscar_chunks_relevantes(
+async def buscar_chunks_relevantes(
     pergunta: str,
     top_k: int = 5
 ) -> List[Dict[str, Any]]:
     """
     Busca sem filtro de categoria. Retorno normalizado igual ao acima.
     """
-    emb = _embed(pergunta)
-    resp = _index.query(
-        vector=emb,
-        top_k=top_k,
-        include_metadata=True
-    )
-    return _normalizar_matches(resp)
+    emb = await _embed(pergunta)
+    return await buscar_chunks_por_vetor(emb, top_k=top_k, pergunta=pergunta)
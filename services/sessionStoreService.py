@@ -0,0 +1,227 @@
+# services/sessionStoreService.py
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Limites da memória de conversa
+SESSAO_MAX_MENSAGENS = int(os.getenv("SESSAO_MAX_MENSAGENS", "20"))          # por sessão
+SESSAO_TTL_S = float(os.getenv("SESSAO_TTL_S", str(24 * 3600)))             # inatividade
+SESSAO_MAX_BYTES = int(os.getenv("SESSAO_MAX_BYTES", str(64 * 1024 * 1024)))  # teto global (memória)
+
+# "memoria" (padrão, um processo) ou "sqlite" (compartilhado entre workers)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memoria").strip().lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(".cache", "sessoes.sqlite"))
+
+
+def _tamanho(mensagens: List[Dict[str, str]]) -> int:
+    return sum(len(m.get("content") or "") + len(m.get("role") or "") for m in mensagens)
+
+
+class SessionStore(ABC):
+    """Interface das memórias de conversa (chamadas síncronas; o chat as roda em thread)."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        ...
+
+    @abstractmethod
+    def append(self, session_id: str, mensagens: List[Dict[str, str]]):
+        ...
+
+    @abstractmethod
+    def reset(self, session_id: str):
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Memória em processo com limite de mensagens por sessão, expiração por
+    inatividade e teto global de bytes (despeja as sessões menos recentes).
+    """
+
+    def __init__(
+        self,
+        max_mensagens: int = SESSAO_MAX_MENSAGENS,
+        ttl_s: float = SESSAO_TTL_S,
+        max_bytes: int = SESSAO_MAX_BYTES,
+    ):
+        self.max_mensagens = max_mensagens
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._sessoes: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def _remover(self, session_id: str):
+        sessao = self._sessoes.pop(session_id, None)
+        if sessao is not None:
+            self.bytes -= sessao["bytes"]
+
+    def _expirar(self, agora: float):
+        # OrderedDict em ordem de acesso: as ociosas estão no início
+        while self._sessoes:
+            sid, sessao = next(iter(self._sessoes.items()))
+            if agora - sessao["acesso"] <= self.ttl_s:
+                break
+            self._remover(sid)
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            agora = time.time()
+            self._expirar(agora)
+            sessao = self._sessoes.get(session_id)
+            if sessao is None:
+                return []
+            sessao["acesso"] = agora
+            self._sessoes.move_to_end(session_id)
+            return list(sessao["mensagens"])
+
+    def append(self, session_id: str, mensagens: List[Dict[str, str]]):
+        with self._lock:
+            agora = time.time()
+            self._expirar(agora)
+            sessao = self._sessoes.setdefault(session_id, {"mensagens": [], "bytes": 0, "acesso": agora})
+            sessao["mensagens"].extend(mensagens)
+            sessao["mensagens"] = sessao["mensagens"][-self.max_mensagens:]
+            novo = _tamanho(sessao["mensagens"])
+            self.bytes += novo - sessao["bytes"]
+            sessao["bytes"] = novo
+            sessao["acesso"] = agora
+            self._sessoes.move_to_end(session_id)
+            while self.bytes > self.max_bytes and len(self._sessoes) > 1:
+                self._remover(next(iter(self._sessoes)))
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self._remover(session_id)
+
+    def __len__(self):
+        return len(self._sessoes)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Memória persistente em SQLite (modo WAL), compartilhável por vários
+    processos uvicorn. Mantém as últimas `max_mensagens` por sessão e apaga
+    sessões ociosas há mais de `ttl_s`.
+    """
+
+    # a limpeza de sessões ociosas roda a cada N gravações
+    _LIMPEZA_A_CADA = 200
+
+    def __init__(
+        self,
+        caminho: str = SESSION_DB_PATH,
+        max_mensagens: int = SESSAO_MAX_MENSAGENS,
+        ttl_s: float = SESSAO_TTL_S,
+    ):
+        self.max_mensagens = max_mensagens
+        self.ttl_s = ttl_s
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._gravacoes = 0
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessoes (
+                session_id TEXT PRIMARY KEY,
+                acesso REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessoes_acesso ON sessoes(acesso);
+            CREATE TABLE IF NOT EXISTS mensagens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_mensagens_sessao ON mensagens(session_id, id);
+            """
+        )
+        self._conn.commit()
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT acesso FROM sessoes WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return []
+            if time.time() - row[0] > self.ttl_s:
+                self._apagar(session_id)
+                self._conn.commit()
+                return []
+            linhas = self._conn.execute(
+                "SELECT role, content FROM mensagens WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_mensagens),
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE sessoes SET acesso = ? WHERE session_id = ?", (time.time(), session_id)
+            )
+            self._conn.commit()
+        return [{"role": r, "content": c} for r, c in reversed(linhas)]
+
+    def append(self, session_id: str, mensagens: List[Dict[str, str]]):
+        with self._lock:
+            agora = time.time()
+            self._conn.execute(
+                "INSERT INTO sessoes (session_id, acesso) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET acesso = excluded.acesso",
+                (session_id, agora),
+            )
+            self._conn.executemany(
+                "INSERT INTO mensagens (session_id, role, content) VALUES (?, ?, ?)",
+                [(session_id, m["role"], m["content"]) for m in mensagens],
+            )
+            # mantém só as últimas N mensagens da sessão
+            self._conn.execute(
+                "DELETE FROM mensagens WHERE session_id = ? AND id NOT IN ("
+                " SELECT id FROM mensagens WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_mensagens),
+            )
+            self._gravacoes += 1
+            if self._gravacoes % self._LIMPEZA_A_CADA == 0:
+                self._limpar_ociosas(agora)
+            self._conn.commit()
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self._apagar(session_id)
+            self._conn.commit()
+
+    def _apagar(self, session_id: str):
+        self._conn.execute("DELETE FROM mensagens WHERE session_id = ?", (session_id,))
+        self._conn.execute("DELETE FROM sessoes WHERE session_id = ?", (session_id,))
+
+    def _limpar_ociosas(self, agora: float):
+        limite = agora - self.ttl_s
+        self._conn.execute(
+            "DELETE FROM mensagens WHERE session_id IN (SELECT session_id FROM sessoes WHERE acesso < ?)",
+            (limite,),
+        )
+        self._conn.execute("DELETE FROM sessoes WHERE acesso < ?", (limite,))
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def obter_session_store() -> SessionStore:
+    """Memória de conversa configurada em SESSION_BACKEND."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if SESSION_BACKEND == "sqlite":
+                _store = SQLiteSessionStore(SESSION_DB_PATH)
+            elif SESSION_BACKEND == "memoria":
+                _store = MemorySessionStore()
+            else:
+                raise ValueError(f"SESSION_BACKEND inválido: {SESSION_BACKEND}")
+        return _store
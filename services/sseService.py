@@ -0,0 +1,27 @@
+# services/sseService.py
+import json
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from fastapi.responses import StreamingResponse
+
+
+def formatar_evento(evento: str, dados: Dict[str, Any]) -> str:
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+async def _serializar(eventos: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> AsyncIterator[str]:
+    try:
+        async for evento, dados in eventos:
+            yield formatar_evento(evento, dados)
+    except Exception as e:
+        # a resposta já começou: o erro vai como evento, não como status HTTP
+        yield formatar_evento("erro", {"detalhe": str(e)})
+
+
+def resposta_sse(eventos: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> StreamingResponse:
+    """Converte um gerador de (evento, dados) em Server-Sent Events."""
+    return StreamingResponse(
+        _serializar(eventos),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,267 @@
+# services/telemetriaService.py
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Limites (segundos) dos histogramas de latência
+TELEMETRIA_BUCKETS = tuple(
+    float(x) for x in os.getenv("TELEMETRIA_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30").split(",")
+)
+# US$ por 1M de tokens (entrada, saída); sobrescreva com JSON em TELEMETRIA_PRECOS
+_PRECOS_PADRAO = {
+    "gpt-3.5-turbo": [0.50, 1.50],
+    "gpt-4o-mini": [0.15, 0.60],
+    "gpt-5": [1.25, 10.00],
+    "text-embedding-3-small": [0.02, 0.0],
+    "whisper-1": [0.0, 0.0],
+}
+PRECOS = {**_PRECOS_PADRAO, **json.loads(os.getenv("TELEMETRIA_PRECOS", "{}"))}
+
+_SEM_ROTULO = "-"
+
+
+class _Registro:
+    """Contadores e histogramas em memória, rotulados por tuplas; um lock para tudo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+        self._histogramas: Dict[str, Dict[Tuple[Tuple[str, str], ...], List[float]]] = {}
+        self._ajuda: Dict[str, str] = {}
+
+    def somar(self, nome: str, valor: float, rotulos: Dict[str, str], ajuda: str = ""):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            serie = self._contadores.setdefault(nome, {})
+            serie[chave] = serie.get(chave, 0.0) + valor
+            self._ajuda.setdefault(nome, ajuda)
+
+    def observar(self, nome: str, segundos: float, rotulos: Dict[str, str], ajuda: str = ""):
+        chave = tuple(sorted(rotulos.items()))
+        i = bisect.bisect_left(TELEMETRIA_BUCKETS, segundos)
+        with self._lock:
+            serie = self._histogramas.setdefault(nome, {})
+            # [contagem por faixa..., +Inf, soma]
+            valores = serie.get(chave)
+            if valores is None:
+                valores = serie[chave] = [0.0] * (len(TELEMETRIA_BUCKETS) + 2)
+            valores[i] += 1
+            valores[-1] += segundos
+            self._ajuda.setdefault(nome, ajuda)
+
+    def texto_prometheus(self) -> str:
+        linhas: List[str] = []
+        with self._lock:
+            for nome, serie in sorted(self._contadores.items()):
+                linhas += [f"# HELP {nome} {self._ajuda[nome]}", f"# TYPE {nome} counter"]
+                for chave, valor in sorted(serie.items()):
+                    linhas.append(f"{nome}{_rotulos(chave)} {_numero(valor)}")
+            for nome, serie in sorted(self._histogramas.items()):
+                linhas += [f"# HELP {nome} {self._ajuda[nome]}", f"# TYPE {nome} histogram"]
+                for chave, valores in sorted(serie.items()):
+                    acumulado = 0.0
+                    for limite, n in zip(TELEMETRIA_BUCKETS, valores):
+                        acumulado += n
+                        linhas.append(f"{nome}_bucket{_rotulos(chave, le=_numero(limite))} {_numero(acumulado)}")
+                    acumulado += valores[-2]
+                    linhas.append(f"{nome}_bucket{_rotulos(chave, le='+Inf')} {_numero(acumulado)}")
+                    linhas.append(f"{nome}_sum{_rotulos(chave)} {valores[-1]:.6f}")
+                    linhas.append(f"{nome}_count{_rotulos(chave)} {_numero(acumulado)}")
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(chave: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pares = list(chave) + list(extra.items())
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+registro = _Registro()
+
+
+class _Requisicao:
+    """
+    Medições de uma requisição HTTP. Ficam guardadas até o fim da resposta
+    para sair rotuladas com a categoria (que só é conhecida no meio do caminho).
+    """
+
+    __slots__ = ("endpoint", "categoria", "etapas", "janelas", "tokens", "erros")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.categoria = _SEM_ROTULO
+        self.etapas: List[Tuple[str, float]] = []
+        self.janelas: Dict[str, List[float]] = {}   # etapa → [início, fim, chamadas] (Server-Timing)
+        self.tokens: List[Tuple[str, int, int]] = []
+        self.erros: List[Tuple[str, str]] = []
+
+
+_atual: ContextVar[Optional[_Requisicao]] = ContextVar("telemetria_requisicao", default=None)
+
+
+def definir_categoria(categoria: Optional[str]):
+    req = _atual.get()
+    if req is not None and categoria:
+        req.categoria = categoria
+
+
+@contextmanager
+def etapa(nome: str) -> Iterator[None]:
+    """
+    Mede uma etapa (embedding, índice, intenção, completion...). Dentro de uma
+    requisição só anota em memória; fora dela (scripts) registra na hora.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception as erro:
+        _anotar_erro(nome, type(erro).__name__)
+        raise
+    finally:
+        fim = time.perf_counter()
+        req = _atual.get()
+        if req is None:
+            _observar_etapa(nome, fim - inicio, _SEM_ROTULO, _SEM_ROTULO)
+        else:
+            req.etapas.append((nome, fim - inicio))
+            janela = req.janelas.get(nome)
+            if janela is None:
+                req.janelas[nome] = [inicio, fim, 1]
+            else:
+                # chamadas concorrentes (ex.: busca especulativa) contam pelo intervalo total
+                janela[0] = min(janela[0], inicio)
+                janela[1] = max(janela[1], fim)
+                janela[2] += 1
+
+
+def registrar_uso(modelo: str, usage: Any):
+    """Tokens (e custo estimado) de uma resposta da OpenAI que traga `usage`."""
+    if usage is None:
+        return
+    entrada = int(getattr(usage, "prompt_tokens", 0) or 0)
+    saida = int(getattr(usage, "completion_tokens", 0) or 0)
+    req = _atual.get()
+    if req is None:
+        _somar_tokens(modelo, entrada, saida, _SEM_ROTULO, _SEM_ROTULO)
+    else:
+        req.tokens.append((modelo, entrada, saida))
+
+
+def _anotar_erro(nome: str, tipo: str):
+    req = _atual.get()
+    if req is None:
+        _somar_erro(nome, tipo, _SEM_ROTULO, _SEM_ROTULO)
+    else:
+        req.erros.append((nome, tipo))
+
+
+def _observar_etapa(nome: str, segundos: float, endpoint: str, categoria: str):
+    registro.observar(
+        "rag_etapa_segundos", segundos,
+        {"etapa": nome, "endpoint": endpoint, "categoria": categoria},
+        "Latência de cada etapa do pipeline (segundos).",
+    )
+
+
+def _somar_tokens(modelo: str, entrada: int, saida: int, endpoint: str, categoria: str):
+    base = {"modelo": modelo, "endpoint": endpoint, "categoria": categoria}
+    ajuda = "Tokens consumidos na OpenAI."
+    registro.somar("rag_tokens_total", entrada, {**base, "tipo": "entrada"}, ajuda)
+    registro.somar("rag_tokens_total", saida, {**base, "tipo": "saida"}, ajuda)
+    preco_entrada, preco_saida = PRECOS.get(modelo, (0.0, 0.0))
+    registro.somar(
+        "rag_custo_usd_total", (entrada * preco_entrada + saida * preco_saida) / 1e6, base,
+        "Custo estimado das chamadas à OpenAI (US$, tabela TELEMETRIA_PRECOS).",
+    )
+
+
+def _somar_erro(nome: str, tipo: str, endpoint: str, categoria: str):
+    registro.somar(
+        "rag_erros_total", 1, {"etapa": nome, "erro": tipo, "endpoint": endpoint, "categoria": categoria},
+        "Exceções por etapa.",
+    )
+
+
+def _fechar(req: _Requisicao, segundos: float, status: int):
+    for nome, duracao in req.etapas:
+        _observar_etapa(nome, duracao, req.endpoint, req.categoria)
+    for modelo, entrada, saida in req.tokens:
+        _somar_tokens(modelo, entrada, saida, req.endpoint, req.categoria)
+    for nome, tipo in req.erros:
+        _somar_erro(nome, tipo, req.endpoint, req.categoria)
+    registro.observar(
+        "rag_requisicao_segundos", segundos,
+        {"endpoint": req.endpoint, "categoria": req.categoria, "status": str(status)},
+        "Latência total das requisições HTTP (segundos).",
+    )
+
+
+def server_timing(req: _Requisicao) -> str:
+    return ", ".join(
+        f'{nome};dur={(fim - inicio) * 1000:.1f}' + (f';desc="{n}x"' if n > 1 else "")
+        for nome, (inicio, fim, n) in req.janelas.items()
+    )
+
+
+class MiddlewareTelemetria:
+    """
+    Middleware ASGI puro (não bufferiza o corpo, então SSE continua em streaming):
+    abre o contexto de medição, põe `Server-Timing` nos headers da resposta e,
+    quando ela termina, registra tudo rotulado por endpoint e categoria.
+    Em respostas em streaming, o header só traz as etapas concluídas antes do
+    primeiro byte; as demais entram nas métricas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        req = _Requisicao(_SEM_ROTULO)
+        token = _atual.set(req)
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                req.endpoint = _endpoint(scope)
+                if req.janelas:
+                    cabecalhos = list(mensagem.get("headers", []))
+                    cabecalhos.append((b"server-timing", server_timing(req).encode("latin-1")))
+                    mensagem = {**mensagem, "headers": cabecalhos}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _atual.reset(token)
+            req.endpoint = _endpoint(scope)
+            _fechar(req, time.perf_counter() - inicio, status)
+
+
+def _endpoint(scope) -> str:
+    # caminho da rota (/api/viz/mapa), nunca a URL crua: mantém a cardinalidade baixa
+    rota = scope.get("route")
+    return getattr(rota, "path", None) or "outros"
+
+
+def metricas_prometheus() -> str:
+    return registro.texto_prometheus()
@@ -0,0 +1,285 @@
+# services/vectorStoreService.py
+import os
+import re
+import json
+import time
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+INDEX_NAME = "testeanalistasr"
+
+# "pinecone" (padrão) ou "faiss" (índice local em disco)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "base_vetorial")
+
+# Marcador de versão do índice: muda a cada ingestão (invalida caches derivados do índice)
+INDEX_VERSION_FILE = os.getenv("INDEX_VERSION_FILE", os.path.join(VECTOR_STORE_DIR, "versao.txt"))
+
+_MANIFESTO = "manifesto.json"
+_METADADOS = "metadados.jsonl"
+_INDICE_GLOBAL = "todos.faiss"
+
+
+def _slug(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]+", "_", texto).strip("_") or "sem_categoria"
+
+
+def _categoria_do_filtro(filtro: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Aceita o mesmo formato de filtro usado com o Pinecone:
+    {"categoria": {"$eq": "..."}} ou {"categoria": "..."}.
+    """
+    if not filtro:
+        return None
+    chaves = set(filtro) - {"categoria"}
+    if chaves:
+        raise ValueError(f"Filtro não suportado pelo índice local: {sorted(chaves)}")
+    cond = filtro["categoria"]
+    if isinstance(cond, dict):
+        if set(cond) != {"$eq"}:
+            raise ValueError(f"Operador não suportado pelo índice local: {sorted(cond)}")
+        return cond["$eq"]
+    return cond
+
+
+class FaissIndex:
+    """
+    Índice vetorial local (FAISS) com a mesma interface de `query` do Pinecone.
+    Mantém um índice global e um sub-índice por categoria, de modo que o filtro
+    por categoria não custa nada além da própria busca.
+    Os arquivos são gerados por `ConstrutorIndiceLocal` e carregados sob demanda.
+    """
+
+    def __init__(self, diretorio: str = VECTOR_STORE_DIR):
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+        self._carregado = False
+        self._global = None
+        self._por_categoria: Dict[str, Any] = {}
+        self._metadados: List[Dict[str, Any]] = []
+
+    def _carregar(self):
+        if self._carregado:
+            return
+        with self._lock:
+            if self._carregado:
+                return
+            import faiss
+
+            with open(os.path.join(self.diretorio, _MANIFESTO), "r", encoding="utf-8") as f:
+                manifesto = json.load(f)
+            with open(os.path.join(self.diretorio, _METADADOS), "r", encoding="utf-8") as f:
+                self._metadados = [json.loads(linha) for linha in f]
+
+            self._global = faiss.read_index(os.path.join(self.diretorio, _INDICE_GLOBAL))
+            self._por_categoria = {
+                cat: faiss.read_index(os.path.join(self.diretorio, arquivo))
+                for cat, arquivo in manifesto.get("categorias", {}).items()
+            }
+            self._carregado = True
+
+    def describe_index_stats(self, **_: Any) -> Dict[str, Any]:
+        """Mesmo nome do Pinecone: carrega os arquivos (se preciso) e devolve as contagens."""
+        self._carregar()
+        return {
+            "total_vector_count": self._global.ntotal,
+            "categorias": {cat: idx.ntotal for cat, idx in self._por_categoria.items()},
+        }
+
+    def query(
+        self,
+        vector: Sequence[float],
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        filter: Optional[Dict[str, Any]] = None,
+        **_: Any,
+    ) -> Dict[str, Any]:
+        import faiss
+        import numpy as np
+
+        self._carregar()
+
+        categoria = _categoria_do_filtro(filter)
+        if categoria is None:
+            indice = self._global
+        else:
+            indice = self._por_categoria.get(categoria)
+            if indice is None:
+                return {"matches": [], "namespace": ""}
+
+        k = min(int(top_k), indice.ntotal)
+        if k <= 0:
+            return {"matches": [], "namespace": ""}
+
+        q = np.asarray([vector], dtype="float32")
+        faiss.normalize_L2(q)
+        scores, linhas = indice.search(q, k)
+
+        matches = []
+        for score, linha in zip(scores[0], linhas[0]):
+            if linha < 0:
+                continue
+            md = self._metadados[int(linha)]
+            m: Dict[str, Any] = {"id": md["id"], "score": float(score)}
+            if include_metadata:
+                m["metadata"] = {
+                    "titulo": md.get("titulo", ""),
+                    "titulos": md.get("titulos") or [md.get("titulo", "")],
+                    "categoria": md.get("categoria", ""),
+                    "content": md.get("content", ""),
+                }
+            if include_values:
+                m["values"] = self._global.reconstruct(int(linha)).tolist()
+            matches.append(m)
+        return {"matches": matches, "namespace": ""}
+
+
+class ConstrutorIndiceLocal:
+    """
+    Monta os arquivos do FaissIndex a partir de lotes (chunks, embeddings): os
+    vetores vão direto para os índices FAISS e os metadados para o disco, linha
+    a linha, sem acumular o corpus em listas. `finalizar` grava os índices e o
+    manifesto e registra uma nova versão.
+    """
+
+    def __init__(self, diretorio: str = VECTOR_STORE_DIR):
+        self.diretorio = diretorio
+        self.total = 0
+        self._global = None
+        self._por_categoria: Dict[str, Any] = {}
+        self._temporario = os.path.join(diretorio, _METADADOS + ".tmp")
+        self._f_metadados = None   # aberto no primeiro lote
+
+    def adicionar(self, chunks: Sequence[Dict[str, Any]], embeddings: Sequence[Sequence[float]]):
+        import faiss
+        import numpy as np
+
+        matriz = np.array(embeddings, dtype="float32")   # cópia: normalize_L2 altera no lugar
+        if len(chunks) != len(matriz):
+            raise ValueError("Quantidade de chunks e de embeddings não confere.")
+        if not len(chunks):
+            return
+        faiss.normalize_L2(matriz)
+        dim = matriz.shape[1]
+        if self._global is None:
+            os.makedirs(self.diretorio, exist_ok=True)
+            self._f_metadados = open(self._temporario, "w", encoding="utf-8")
+            self._global = faiss.IndexFlatIP(dim)
+        self._global.add(matriz)
+
+        linhas_por_cat: Dict[str, List[int]] = {}
+        for i, c in enumerate(chunks):
+            md = {
+                "id": c["id"],
+                "titulo": c.get("titulo", ""),
+                "titulos": c.get("titulos") or [c.get("titulo", "")],
+                "categoria": c.get("categoria", ""),
+                "content": c.get("content", ""),
+            }
+            self._f_metadados.write(json.dumps(md, ensure_ascii=False) + "\n")
+            linhas_por_cat.setdefault(md["categoria"], []).append(i)
+
+        for cat, linhas in linhas_por_cat.items():
+            sub = self._por_categoria.get(cat)
+            if sub is None:
+                sub = self._por_categoria[cat] = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+            locais = np.asarray(linhas, dtype="int64")
+            sub.add_with_ids(matriz[locais], locais + self.total)   # id = linha global
+        self.total += len(chunks)
+
+    def finalizar(self) -> int:
+        """Grava índices, metadados e manifesto; retorna a quantidade de vetores indexados."""
+        import faiss
+
+        if not self.total:
+            raise ValueError("Nenhum chunk para indexar.")
+        self._f_metadados.close()
+
+        faiss.write_index(self._global, os.path.join(self.diretorio, _INDICE_GLOBAL))
+        categorias = {}
+        for cat, sub in self._por_categoria.items():
+            arquivo = f"cat_{_slug(cat)}.faiss"
+            faiss.write_index(sub, os.path.join(self.diretorio, arquivo))
+            categorias[cat] = arquivo
+        os.replace(self._temporario, os.path.join(self.diretorio, _METADADOS))
+
+        with open(os.path.join(self.diretorio, _MANIFESTO), "w", encoding="utf-8") as f:
+            json.dump(
+                {"dimensao": self._global.d, "total": self.total, "categorias": categorias},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+        marcar_nova_versao()
+        return self.total
+
+
+def construir_indice_local(
+    chunks: Iterable[Dict[str, Any]],
+    embeddings: Iterable[Sequence[float]],
+    diretorio: str = VECTOR_STORE_DIR,
+) -> int:
+    """
+    Persiste em `diretorio` o índice global e os sub-índices por categoria.
+    `chunks` segue o formato de chunks_limpos.jsonl (id, titulo, categoria, content)
+    e `embeddings` traz o vetor de cada chunk, na mesma ordem.
+    Retorna a quantidade de vetores indexados.
+    """
+    construtor = ConstrutorIndiceLocal(diretorio)
+    construtor.adicionar(list(chunks), list(embeddings))
+    return construtor.finalizar()
+
+
+def marcar_nova_versao() -> str:
+    """Registra uma nova versão do índice; chame ao final de cada ingestão."""
+    versao = f"{time.time_ns()}"
+    pasta = os.path.dirname(INDEX_VERSION_FILE)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(INDEX_VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(versao)
+    return versao
+
+
+def versao_indice() -> str:
+    try:
+        with open(INDEX_VERSION_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+_index_lock = threading.Lock()
+_index_cache: Dict[str, Any] = {}
+
+
+def obter_index():
+    """
+    Retorna o índice configurado em VECTOR_BACKEND. Ambos expõem
+    `query(vector=..., top_k=..., include_metadata=..., filter=...)`.
+    """
+    with _index_lock:
+        if VECTOR_BACKEND not in _index_cache:
+            if VECTOR_BACKEND == "faiss":
+                _index_cache[VECTOR_BACKEND] = FaissIndex(VECTOR_STORE_DIR)
+            elif VECTOR_BACKEND == "pinecone":
+                from services.clientService import get_pinecone
+
+                _index_cache[VECTOR_BACKEND] = get_pinecone().Index(INDEX_NAME)
+            else:
+                raise ValueError(f"VECTOR_BACKEND inválido: {VECTOR_BACKEND}")
+        return _index_cache[VECTOR_BACKEND]
+
+
+def descartar_index():
+    """Esquece o índice aberto (shutdown da API); o próximo `obter_index` reabre."""
+    with _index_lock:
+        for index in _index_cache.values():
+            fechar = getattr(index, "close", None)
+            if fechar is not None:
+                fechar()
+        _index_cache.clear()
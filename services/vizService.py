@@ -1,29 +1,17 @@
 # services/vizService.py
-import os
 from typing import List, Dict, Any, Tuple
 import numpy as np
-from sklearn.decomposition import PCA
-from openai import OpenAI
-from pinecone import Pinecone
 
-OPENAI_API_KEY = os.getenv("api_key_openIA")
-PINECONE_API_KEY = os.getenv("api_key_pinecone")
-INDEX_NAME = "testeanalistasr"
-
-_openai = OpenAI(api_key=OPENAI_API_KEY)
-_pc = Pinecone(api_key=PINECONE_API_KEY)
-_index = _pc.Index(INDEX_NAME)
+from services.embeddingService import embed_lote
+from services.projecaoService import ajustar_base, obter_base, projetar_com
+from services.vectorStoreService import obter_index
 
 def _embed(texts: List[str]) -> List[List[float]]:
-    resp = _openai.embeddings.create(
-        model="text-embedding-3-small",
-        input=texts
-    )
-    return [d.embedding for d in resp.data]
+    return embed_lote(texts)
 
-def _top_chunks(pergunta: str, top_k: int = 8) -> List[Dict[str, Any]]:
-    vec = _embed([pergunta])[0]
-    res = _index.query(vector=vec, top_k=top_k, include_metadata=True)
+def _top_chunks(vec: List[float], top_k: int = 8) -> List[Dict[str, Any]]:
+    # vetores dos chunks vêm junto com a consulta: nada de re-embedar o `content`
+    res = obter_index().query(vector=vec, top_k=top_k, include_metadata=True, include_values=True)
     matches = []
     for m in (res.get("matches") or []):
         md = m.get("metadata", {}) or {}
@@ -33,6 +21,7 @@ def _top_chunks(pergunta: str, top_k: int = 8) -> List[Dict[str, Any]]:
             "categoria": md.get("categoria", ""),
             "titulo": md.get("titulo", ""),
             "content": md.get("content", ""),
+            "values": m.get("values"),
         })
     return matches
 
@@ -43,15 +32,21 @@ def _cosine_sim_matrix(X: np.ndarray) -> np.ndarray:
     Xn = X / norms
     return np.dot(Xn, Xn.T)
 
-def project_space(pergunta: str, resposta: str | None, top_k: int = 8) -> Dict[str, Any]:
-    """Retorna pontos projetados em 2D (PCA) e metadados para scatter."""
-    chunks = _top_chunks(pergunta, top_k=top_k)
+def build_viz(pergunta: str, resposta: str | None, top_k: int = 8) -> Dict[str, Any]:
+    """
+    Scatter (PCA 2D) e heatmap de similaridade a partir dos mesmos vetores:
+    uma chamada de embedding (pergunta + resposta) e uma consulta ao índice.
+    """
+    textos_embed = [pergunta] + ([resposta] if resposta else [])
+    embs_pr = _embed(textos_embed)
+    chunks = _top_chunks(embs_pr[0], top_k=top_k)
 
     textos = [f"PERGUNTA: {pergunta}"]
     tipos  = ["pergunta"]
     grupos = ["pergunta"]
     cats   = ["Pergunta"]
     titulos= ["Pergunta"]
+    labels = ["Pergunta"]
 
     if resposta:
         textos.append(f"RESPOSTA: {resposta}")
@@ -59,6 +54,7 @@ def project_space(pergunta: str, resposta: str | None, top_k: int = 8) -> Dict[s
         grupos.append("resposta")
         cats.append("Resposta")
         titulos.append("Resposta")
+        labels.append("Resposta")
 
     for c in chunks:
         textos.append(c["content"])
@@ -66,12 +62,15 @@ def project_space(pergunta: str, resposta: str | None, top_k: int = 8) -> Dict[s
         grupos.append(c.get("categoria") or "Chunk")
         cats.append(c.get("categoria") or "Chunk")
         titulos.append(c.get("titulo") or "Chunk")
+        labels.append(f"{c.get('categoria','')}: {c.get('titulo','')}".strip(": "))
 
-    embs = np.array(_embed(textos))
+    embs = np.array(embs_pr + [c["values"] for c in chunks], dtype="float32")
 
-    # PCA para 2D
-    pca = PCA(n_components=2)
-    pts = pca.fit_transform(embs)   # shape (n, 2)
+    # base 2D do corpus (ajustada na ingestão): eixos iguais entre perguntas
+    base = obter_base()
+    if base is None:
+        base = ajustar_base(embs)   # sem base salva: PCA só destes pontos
+    pts = projetar_com(base, embs)   # shape (n, 2)
 
     out = []
     for i in range(len(textos)):
@@ -86,29 +85,20 @@ def project_space(pergunta: str, resposta: str | None, top_k: int = 8) -> Dict[s
         })
 
     return {
-        "points": out,
-        "explained_variance": [float(v) for v in pca.explained_variance_ratio_]
+        "space": {
+            "points": out,
+            "explained_variance": [float(v) for v in base["variancia"]]
+        },
+        "heatmap": {
+            "labels": labels,
+            "matrix": _cosine_sim_matrix(embs).tolist()   # (n x n)
+        }
     }
 
+def project_space(pergunta: str, resposta: str | None, top_k: int = 8) -> Dict[str, Any]:
+    """Retorna pontos projetados em 2D (PCA) e metadados para scatter."""
+    return build_viz(pergunta, resposta, top_k)["space"]
+
 def build_heatmap(pergunta: str, resposta: str | None, top_k: int = 8) -> Dict[str, Any]:
     """Retorna matriz de similaridade e rótulos para heatmap."""
-    chunks = _top_chunks(pergunta, top_k=top_k)
-
-    labels = ["Pergunta"]
-    textos = [pergunta]
-
-    if resposta:
-        labels.append("Resposta")
-        textos.append(resposta)
-
-    for c in chunks:
-        labels.append(f"{c.get('categoria','')}: {c.get('titulo','')}".strip(": "))
-        textos.append(c["content"])
-
-    embs = np.array(_embed(textos))
-    sim = _cosine_sim_matrix(embs)   # (n x n)
-
-    return {
-        "labels": labels,
-        "matrix": sim.tolist()
-    }
+    return build_viz(pergunta, resposta, top_k)["heatmap"]
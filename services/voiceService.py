@@ -2,16 +2,15 @@
 import os
 import base64
 import tempfile
-from uuid import uuid4
 from typing import Any, Dict, Optional
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
 
+from services.clientService import get_async_openai
 from services.chatService import chat_with_rag, new_session_id
+from services.telemetriaService import etapa
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("api_key_openIA"))
 
 _MIN_SIZE_BYTES = 2000  # evita envio de áudio vazio/curtíssimo
 
@@ -63,8 +62,8 @@ async def talk_with_voice(
 
         # 1) Transcreve com Whisper
         try:
-            with tmp_path.open("rb") as f:
-                stt = client.audio.transcriptions.create(
+            with tmp_path.open("rb") as f, etapa("stt"):
+                stt = await get_async_openai().audio.transcriptions.create(
                     model="whisper-1",
                     file=f,
                     language="pt",
@@ -108,18 +107,14 @@ async def talk_with_voice(
         if do_backend_tts and resposta_texto:
             try:
                 voice = os.getenv("TTS_VOICE", "alloy")  # ex.: alloy, verse, etc.
-                mp3_path = Path(tempfile.gettempdir()) / f"tts_{uuid4().hex}.mp3"
-                with client.audio.speech.with_streaming_response.create(
-                    model="tts-1",
-                    voice=voice,
-                    input=resposta_texto,
-                ) as resp:
-                    resp.stream_to_file(mp3_path)
-                audio_b64 = base64.b64encode(mp3_path.read_bytes()).decode("utf-8")
-                try:
-                    mp3_path.unlink(missing_ok=True)
-                except Exception:
-                    pass
+                with etapa("tts"):
+                    async with get_async_openai().audio.speech.with_streaming_response.create(
+                        model="tts-1",
+                        voice=voice,
+                        input=resposta_texto,
+                    ) as resp:
+                        mp3_bytes = await resp.read()
+                audio_b64 = base64.b64encode(mp3_bytes).decode("utf-8")
             except Exception:
                 audio_b64 = None  # não falha a requisição principal
 
@@ -0,0 +1,91 @@
+# tests/conftest.py
+import os
+import re
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+# Os serviços leem a configuração no import: ambiente isolado antes de qualquer
+# `import services...` (sem rede, sem tocar em .cache/ nem em base_vetorial/ do projeto)
+_TMP = tempfile.mkdtemp(prefix="testes_")
+os.environ.update({
+    "api_key_openIA": "teste",
+    "api_key_pinecone": "teste",
+    "VECTOR_STORE_DIR": _TMP,
+    "PROJECAO_DIR": _TMP,
+    "EMBED_CACHE_PATH": os.path.join(_TMP, "embeddings.sqlite"),
+    "BM25_CHUNKS_PATH": os.path.join(_TMP, "chunks.jsonl"),
+    "SESSION_BACKEND": "memoria",
+    "RESPOSTA_CACHE_ATIVO": "false",
+    "AQUECER_CLIENTES": "0",
+})
+# main.py monta "HTML" com caminho relativo, e a pasta do repositório é html/: os testes
+# rodam num diretório temporário com um link, que vale também em disco sensível a maiúsculas
+_TRABALHO = os.path.join(_TMP, "trabalho")
+os.makedirs(_TRABALHO)
+os.symlink(os.path.join(RAIZ, "html"), os.path.join(_TRABALHO, "HTML"))
+os.chdir(_TRABALHO)
+
+
+SERVICOS_FALSOS = ("chat", "classificacao", "avaliacao", "embedding", "whisper", "tts", "indice")
+
+
+class TokenizadorFalso:
+    """Substitui o cl100k_base (que exige download) na contagem de tokens."""
+
+    def encode(self, texto, **_):
+        return re.findall(r"\w+|[^\w\s]", texto)
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def corpus_sintetico(por_categoria=3):
+    from services.intentService import CATEGORIAS
+
+    return [
+        {"id": f"{i}-{j}", "titulo": f"{categoria} - Documento {j}", "categoria": categoria,
+         "content": f"Regra {j} de {categoria}: o processo exige aprovação e registro."}
+        for i, categoria in enumerate(CATEGORIAS) for j in range(por_categoria)
+    ]
+
+
+@pytest.fixture
+def servicos_falsos(monkeypatch):
+    """
+    Instala os dublês de bench/falsos.py (OpenAI, índice e tokenizer) e devolve
+    uma fábrica: `servicos_falsos(latencia_ms=0, corpus=None)`. O índice conta
+    as consultas em `.consultas`.
+    """
+    import services.clientService as clientes
+    import services.contextoService as contexto
+    import services.vectorStoreService as vetores_app
+    from bench.falsos import IndiceFalso, OpenAIFalsoAsync, OpenAIFalsoSync, Perfil, VetoresFalsos
+
+    def instalar(latencia_ms=0, corpus=None):
+        perfis = {nome: Perfil(latencia_ms, sigma=0.0) for nome in SERVICOS_FALSOS}
+        vetores = VetoresFalsos(64)
+        corpus = corpus_sintetico() if corpus is None else corpus
+        falso = OpenAIFalsoAsync(perfis, vetores, ["?"], "Resposta de teste.")
+        indice = IndiceFalso(corpus, vetores, perfis["indice"])
+        indice.consultas = []
+        consultar = indice.query
+
+        def query(**kwargs):
+            indice.consultas.append(kwargs.get("filter"))
+            return consultar(**kwargs)
+
+        indice.query = query
+        monkeypatch.setattr(clientes, "_async_openai", falso)
+        monkeypatch.setattr(clientes, "_openai", OpenAIFalsoSync(falso))
+        monkeypatch.setitem(vetores_app._index_cache, vetores_app.VECTOR_BACKEND, indice)
+        monkeypatch.setattr(contexto, "_tokenizer", lambda: TokenizadorFalso())
+        return SimpleNamespace(openai=falso, vetores=vetores, indice=indice, corpus=corpus)
+
+    return instalar
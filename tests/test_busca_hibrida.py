@@ -0,0 +1,44 @@
+# tests/test_busca_hibrida.py
+"""
+Busca híbrida: ranking BM25 do índice invertido incremental e fusão RRF
+com a lista densa.
+"""
+from services.bm25Service import IndiceBM25
+from services.searchService import fundir_rrf
+
+
+def _indice():
+    indice = IndiceBM25()
+    indice.adicionar("a", "Cartão de crédito com anuidade zero.", {"categoria": "Produtos e Serviços"})
+    indice.adicionar("b", "Senha forte e autenticação em dois fatores.", {"categoria": "Segurança da Informação"})
+    indice.adicionar("c", "Formulário KYC-7 anexado ao cadastro de crédito.", {"categoria": "Compliance"})
+    return indice
+
+
+def test_termo_raro_pesa_mais_que_termo_comum():
+    r = _indice().buscar("crédito kyc", top_k=3)
+
+    assert [m["id"] for m in r] == ["c", "a"]
+    assert r[0]["score"] > r[1]["score"]
+
+
+def test_filtro_de_categoria_e_reindexacao():
+    indice = _indice()
+
+    assert [m["id"] for m in indice.buscar("crédito", categoria="Compliance")] == ["c"]
+
+    indice.adicionar("c", "Política de retenção de documentos.", {"categoria": "Compliance"})
+    indice.remover("a")
+    assert len(indice) == 2
+    assert indice.buscar("crédito") == []
+
+
+def test_rrf_premia_quem_aparece_nas_duas_listas():
+    densa = [{"id": i, "score": s, "metadata": {}} for i, s in (("x", 0.9), ("y", 0.8), ("z", 0.7))]
+    lexica = [{"id": i, "score": s, "metadata": {}} for i, s in (("z", 7.0), ("w", 5.0))]
+
+    r = fundir_rrf([densa, lexica], top_k=3)
+
+    assert [m["id"] for m in r] == ["z", "x", "y"]
+    assert r[0]["score_denso"] == 0.7
+    assert "score_denso" not in fundir_rrf([densa, lexica], top_k=4)[-1]   # "w": só BM25
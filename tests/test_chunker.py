@@ -0,0 +1,126 @@
+# tests/test_chunker.py
+"""
+Chunking (transformadores/1_limparDados_GerarChunks.py): a segmentação com
+soma incremental de tokens gera os mesmos chunks do algoritmo original, os
+ids são determinísticos, e o plano de deduplicação em duas passadas do
+orquestrador gera os mesmos chunks e ids da versão em memória.
+"""
+import os
+import re
+import importlib.util
+
+import pytest
+
+from conftest import RAIZ, TokenizadorFalso
+from services.dedupService import Deduplicador, PlanoDedup
+
+DOCUMENTOS = {
+    "01_Onboarding_1.txt": ("Onboarding - Documento 1", "Onboarding", (
+        "O cliente deve apresentar documento com foto. O comprovante de residência tem validade de 90 dias. "
+        "A análise cadastral é concluída em até dois dias úteis. Contas PJ exigem contrato social registrado."
+    )),
+    "02_Onboarding_2.txt": ("Onboarding - Documento 2", "Onboarding", (
+        "A análise cadastral é concluída em até dois dias úteis. O gerente confirma os dados por telefone. "
+        "Menores de idade abrem conta apenas com responsável legal."
+    )),
+    "03_Compliance_1.txt": ("Compliance - Documento 1", "Compliance", (
+        "Operações acima do limite são comunicadas ao regulador. Registros são mantidos por cinco anos."
+    )),
+}
+
+
+@pytest.fixture
+def chunker(monkeypatch):
+    """Carrega o script com tokenizer e divisor de sentenças locais (sem downloads)."""
+    import nltk
+    import tiktoken
+
+    monkeypatch.setattr(nltk, "download", lambda *a, **k: True)
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda nome: TokenizadorFalso())
+    caminho = os.path.join(RAIZ, "transformadores", "1_limparDados_GerarChunks.py")
+    spec = importlib.util.spec_from_file_location("chunker_teste", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    monkeypatch.setattr(modulo, "sent_tokenize", lambda t: [s for s in re.split(r"(?<=[.!?])\s+", t) if s])
+    return modulo
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    for nome, (titulo, categoria, corpo) in DOCUMENTOS.items():
+        (tmp_path / nome).write_text(f"Título: {titulo}\nCategoria: {categoria}\n\n{corpo}\n", encoding="utf-8")
+    return tmp_path
+
+
+def _original(chunker, texto, max_tokens):
+    # algoritmo anterior: recontava o chunk inteiro a cada sentença
+    chunks, atual = [], ""
+    for sentenca in chunker.sent_tokenize(chunker.limpar_texto(texto)):
+        candidato = atual + " " + sentenca
+        if chunker.contar_tokens(candidato) <= max_tokens:
+            atual = candidato
+        else:
+            if atual:
+                chunks.append(atual.strip())
+            atual = sentenca
+    if atual:
+        chunks.append(atual.strip())
+    return chunks
+
+
+@pytest.mark.parametrize("max_tokens", [5, 12, 20, 40, 1000])
+def test_segmentacao_incremental_equivale_a_original(chunker, max_tokens):
+    texto = " ".join(corpo for _, _, corpo in DOCUMENTOS.values())
+
+    chunks = chunker.segmentar(texto, max_tokens=max_tokens, overlap_tokens=0)
+
+    assert [c["content"] for c in chunks] == _original(chunker, texto, max_tokens)
+    assert all(c["tokens"] == chunker.contar_tokens(c["content"]) for c in chunks)
+
+
+def test_ids_deterministicos(chunker, pasta):
+    caminho = str(pasta / "01_Onboarding_1.txt")
+
+    ids = [c["id"] for c in chunker.gerar_chunks_arquivo(caminho)]
+
+    assert ids == [c["id"] for c in chunker.gerar_chunks_arquivo(caminho)]
+    assert all(re.fullmatch(r"01-onboarding-1#\d+#[0-9a-f]{16}", i) for i in ids)
+
+
+def test_editar_um_arquivo_so_muda_os_ids_dele(chunker, pasta, monkeypatch):
+    monkeypatch.setattr(chunker, "CHUNK_MAX_TOKENS", 20)
+
+    def ids():
+        dedup = Deduplicador(escopo="arquivo")
+        return {c["id"] for a in chunker.listar_arquivos(str(pasta)) for c in chunker.gerar_chunks_deduplicados(a, dedup)}
+
+    antes = ids()
+    editado = pasta / "03_Compliance_1.txt"
+    editado.write_text(editado.read_text(encoding="utf-8").replace("cinco", "dez"), encoding="utf-8")
+    mudaram = antes ^ ids()
+
+    assert mudaram and {i.split("#")[0] for i in mudaram} == {"03-compliance-1"}
+
+
+def test_mudar_so_o_titulo_troca_o_id(chunker):
+    chunk = {"id": "doc#0#0", "content": "Texto.", "titulo": "A", "categoria": "C", "fonte": "doc.txt"}
+
+    assert chunker.reidentificar(chunk)["id"] != chunker.reidentificar({**chunk, "titulo": "B"})["id"]
+
+
+def test_plano_do_orquestrador_equivale_ao_processamento_em_memoria(chunker, pasta):
+    arquivos = list(chunker.listar_arquivos(str(pasta)))
+
+    # processar_pasta: deduplica em ordem, ids recalculados no fim
+    dedup = Deduplicador(escopo="corpus")
+    sobreviventes = [c for a in arquivos for c in chunker.deduplicar_chunks(chunker.gerar_chunks_arquivo(a), dedup)]
+    em_memoria = [chunker.reidentificar(c) for c in sobreviventes]
+
+    # orquestrador: primeira passada decide, a etapa de chunking refaz e aplica (em qualquer ordem)
+    plano = PlanoDedup(Deduplicador(escopo="corpus"))
+    for a in arquivos:
+        plano.registrar(a, chunker.gerar_chunks_arquivo(a))
+    planejado = [c for a in reversed(arquivos) for c in chunker.gerar_chunks_planejados(a, plano)]
+
+    assert dedup.sentencas_removidas == 1
+    assert sorted(planejado, key=lambda c: c["id"]) == sorted(em_memoria, key=lambda c: c["id"])
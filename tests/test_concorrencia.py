@@ -0,0 +1,82 @@
+# tests/test_concorrencia.py
+"""
+N requisições simultâneas a /api/chat/message contra dublês lentos da OpenAI e
+do índice (bench/falsos.py): com o caminho assíncrono as esperas se sobrepõem,
+então o lote inteiro leva o tempo de uma requisição, não N vezes esse tempo.
+"""
+import re
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from bench.falsos import IndiceFalso, OpenAIFalsoAsync, OpenAIFalsoSync, Perfil, VetoresFalsos
+
+LATENCIA_MS = 200   # cada chamada aos dublês (embedding, intenção, índice, completion)
+N = 20              # requisições simultâneas
+
+_SERVICOS = ("chat", "classificacao", "avaliacao", "embedding", "whisper", "tts", "indice")
+
+
+class _Tokenizador:
+    """Substitui o cl100k_base (que exige download) na contagem de tokens do contexto."""
+
+    def encode(self, texto, **_):
+        return re.findall(r"\w+|[^\w\s]", texto)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    import main
+    import services.clientService as clientes
+    import services.contextoService as contexto
+    import services.vectorStoreService as vetores_app
+    from services.intentService import CATEGORIAS
+
+    perfis = {nome: Perfil(LATENCIA_MS, sigma=0.0) for nome in _SERVICOS}
+    vetores = VetoresFalsos(64)
+    corpus = [
+        {"id": f"{i}-{j}", "titulo": f"{categoria} - Documento {j}", "categoria": categoria,
+         "content": f"Regra {j} de {categoria}: o processo exige aprovação e registro."}
+        for i, categoria in enumerate(CATEGORIAS) for j in range(3)
+    ]
+    falso = OpenAIFalsoAsync(perfis, vetores, ["?"], "Resposta de teste.")
+    monkeypatch.setattr(clientes, "_async_openai", falso)
+    monkeypatch.setattr(clientes, "_openai", OpenAIFalsoSync(falso))
+    monkeypatch.setitem(vetores_app._index_cache, vetores_app.VECTOR_BACKEND, IndiceFalso(corpus, vetores, perfis["indice"]))
+    monkeypatch.setattr(contexto, "_tokenizer", lambda: _Tokenizador())
+    return main.app
+
+
+def test_requisicoes_simultaneas_sobrepoem_as_esperas(app):
+    from services.intentService import CATEGORIAS
+
+    async def rodar():
+        # o cliente do índice é síncrono e roda em threads: o pool padrão (cpu + 4)
+        # seria o gargalo com N × categorias consultas especulativas ao mesmo tempo
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(N * len(CATEGORIAS)))
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste", timeout=None) as cliente:
+
+            async def perguntar(i):
+                r = await cliente.post("/api/chat/message", json={"message": f"Compliance: regra {i}?"})
+                assert r.status_code == 200, r.text
+                assert r.json()["resposta"]
+
+            await perguntar(-1)   # aquecimento: imports adiados, sessão, tokenizer
+            inicio = time.perf_counter()
+            await perguntar(-2)
+            uma = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(perguntar(i) for i in range(N)))
+            return uma, time.perf_counter() - inicio
+
+    uma, todas = asyncio.run(rodar())
+
+    # uma requisição encadeia algumas esperas dos dublês (embedding → intenção ∥ busca → completion)
+    assert uma >= 2 * LATENCIA_MS / 1000
+    # em série, as N levariam ~N × `uma`; sobrepostas, ~1 ×
+    assert todas < 2 * uma, f"{N} simultâneas em {todas:.2f}s; uma sozinha em {uma:.2f}s"
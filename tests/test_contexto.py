@@ -0,0 +1,61 @@
+# tests/test_contexto.py
+"""
+Montagem do contexto: corte adaptativo de score (inclusive com os trechos
+fundidos por RRF na busca híbrida) e orçamento de tokens.
+"""
+import pytest
+
+from services.contextoService import contar_tokens, montar_contexto
+from services.searchService import fundir_rrf
+
+
+@pytest.fixture(autouse=True)
+def tokenizador(servicos_falsos):
+    servicos_falsos()
+
+
+def _trecho(id_, conteudo, score=None):
+    return {"id": id_, "score": score, "metadata": {"titulo": id_, "content": conteudo}}
+
+
+def test_trecho_so_do_bm25_sobrevive_ao_corte_da_busca_hibrida():
+    densos = [
+        _trecho("a", "Política de senhas exige troca trimestral.", 0.82),
+        _trecho("b", "Acesso remoto só pela VPN corporativa.", 0.80),
+        _trecho("c", "Texto pouco relacionado à pergunta.", 0.30),
+    ]
+    lexicos = [_trecho("kyc", "O formulário KYC-7 deve ser anexado ao cadastro.")]
+
+    fundidos = fundir_rrf([densos, lexicos], top_k=4)
+    r = montar_contexto(fundidos)
+
+    ids = [t["id"] for t in r["trechos"]]
+    assert "kyc" in ids                 # sem cosseno: não passa pelo corte denso
+    assert "c" not in ids               # 0.30 < 0.82 × CONTEXTO_SCORE_RELATIVO
+    assert "KYC-7" in r["contexto"]
+
+
+def test_orcamento_de_tokens_e_historico_recente():
+    trechos = [_trecho(f"t{i}", f"Regra {i} do processo de cadastro com várias palavras de conteúdo.", 0.9 - i * 0.01)
+               for i in range(8)]
+    historico = [{"role": "user", "content": f"mensagem antiga número {i}"} for i in range(120)]
+
+    r = montar_contexto(trechos, historico, max_tokens=900)
+
+    assert 0 < len(r["trechos"]) < len(trechos)
+    assert r["tokens"]["total"] <= 900
+    assert r["tokens"]["total"] == contar_tokens(r["contexto"]) + len(r["trechos"]) + r["tokens"]["historico"]
+    assert 0 < len(r["historico"]) < len(historico)
+    assert r["historico"] == historico[-len(r["historico"]):]   # só as mais recentes
+
+
+def test_sentenca_repetida_entra_uma_vez():
+    trechos = [
+        _trecho("a", "Senhas expiram a cada 90 dias. Use autenticação em dois fatores.", 0.9),
+        _trecho("b", "Senhas expiram a cada 90 dias. Bloqueio após cinco tentativas.", 0.88),
+    ]
+
+    r = montar_contexto(trechos)
+
+    assert r["contexto"].count("90 dias") == 1
+    assert "Bloqueio após cinco tentativas." in r["contexto"]
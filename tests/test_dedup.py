@@ -0,0 +1,74 @@
+# tests/test_dedup.py
+"""
+Deduplicação MinHash/LSH: chunks quase idênticos colapsam no primeiro (que
+acumula os títulos), sentenças repetidas saem dos chunks seguintes, e o
+plano em duas passadas do orquestrador reproduz o resultado em memória.
+"""
+from services.dedupService import Deduplicador, PlanoDedup, assinatura, jaccard_estimado
+
+TEXTO = (
+    "O cliente deve apresentar documento com foto e comprovante de residência. "
+    "A análise cadastral é concluída em até dois dias úteis após o envio."
+)
+
+
+def _chunk(id_, conteudo, titulo, categoria="Onboarding", fonte=None):
+    return {"id": id_, "content": conteudo, "titulo": titulo, "categoria": categoria, "fonte": fonte or f"{titulo}.txt"}
+
+
+def test_jaccard_estimado():
+    a = assinatura(TEXTO)
+    assert jaccard_estimado(a, assinatura(TEXTO)) == 1.0
+    assert jaccard_estimado(a, assinatura("Texto completamente diferente sobre política de senhas.")) < 0.2
+    assert assinatura("") is None
+
+
+def test_quase_duplicata_colapsa_e_acumula_titulos():
+    dedup = Deduplicador(sentencas=False, escopo="corpus")
+
+    primeiro = dedup.adicionar(_chunk("1", TEXTO, "Doc 1"))
+    repetido = dedup.adicionar(_chunk("2", TEXTO + " Sem exceções.", "Doc 2"))
+    outra_categoria = dedup.adicionar(_chunk("3", TEXTO, "Doc 3", categoria="Compliance"))
+
+    assert repetido is None
+    assert primeiro["titulos"] == ["Doc 1", "Doc 2"]
+    assert outra_categoria is not None           # só colapsa dentro da categoria
+    assert dedup.chunks_removidos == 1
+
+
+def test_sentenca_repetida_sai_do_chunk_seguinte():
+    dedup = Deduplicador(sentencas=True, escopo="corpus")
+    repetida = "A análise cadastral é concluída em até dois dias úteis após o envio."
+
+    dedup.adicionar(_chunk("1", TEXTO, "Doc 1"))
+    segundo = dedup.adicionar(_chunk("2", f"Contas PJ exigem contrato social registrado. {repetida}", "Doc 2"))
+
+    assert segundo["content"] == "Contas PJ exigem contrato social registrado."
+    assert dedup.sentencas_removidas == 1
+
+
+def test_escopo_arquivo_nao_colapsa_entre_fontes():
+    dedup = Deduplicador(escopo="arquivo")
+
+    assert dedup.adicionar(_chunk("1", TEXTO, "Doc 1")) is not None
+    assert dedup.adicionar(_chunk("2", TEXTO, "Doc 2")) is not None
+    assert dedup.adicionar(_chunk("3", TEXTO, "Doc 2")) is None
+
+
+def test_plano_em_duas_passadas_reproduz_a_versao_em_memoria():
+    arquivos = {
+        "a.txt": [_chunk("a#0", TEXTO, "Doc A", fonte="a.txt"),
+                  _chunk("a#1", "Contas PJ exigem contrato social registrado.", "Doc A", fonte="a.txt")],
+        "b.txt": [_chunk("b#0", TEXTO, "Doc B", fonte="b.txt"),
+                  _chunk("b#1", "Contas PJ exigem contrato social. Limite inicial depende do score.", "Doc B", fonte="b.txt")],
+    }
+    dedup = Deduplicador(escopo="corpus")
+    em_memoria = [n for chunks in arquivos.values() for n in map(dedup.adicionar, chunks) if n is not None]
+
+    plano = PlanoDedup(Deduplicador(escopo="corpus"))
+    for nome, chunks in arquivos.items():
+        plano.registrar(nome, chunks)
+    planejado = [novo for nome in reversed(list(arquivos)) for _, novo in plano.aplicar(nome, arquivos[nome])]
+
+    assert sorted(planejado, key=lambda c: c["id"]) == sorted(em_memoria, key=lambda c: c["id"])
+    assert em_memoria[0]["titulos"] == ["Doc A", "Doc B"]
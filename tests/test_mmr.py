@@ -0,0 +1,49 @@
+# tests/test_mmr.py
+"""
+Seleção MMR: o mais relevante sai primeiro, quase-duplicatas de um já
+escolhido são descartadas e a diversidade desempata contra a relevância.
+"""
+import numpy as np
+
+from services.mmrService import diversificar, selecionar_mmr
+
+
+def _vetor(angulo_graus):
+    a = np.radians(angulo_graus)
+    return [float(np.cos(a)), float(np.sin(a)), 0.0]
+
+
+CONSULTA = [1.0, 0.0, 0.0]
+
+
+def test_mais_relevante_primeiro_e_quase_duplicata_descartada():
+    vetores = [_vetor(10), _vetor(10.5), _vetor(-40)]   # 0 e 1 quase idênticos
+
+    escolhidos = selecionar_mmr(CONSULTA, vetores, top_k=3, lambda_=0.7, redundancia_max=0.95)
+
+    assert escolhidos == [0, 2]
+
+
+def test_diversidade_vence_relevancia_com_lambda_baixo():
+    vetores = [_vetor(0), _vetor(20), _vetor(-30)]
+
+    so_relevancia = selecionar_mmr(CONSULTA, vetores, top_k=2, lambda_=1.0, redundancia_max=1.01)
+    com_diversidade = selecionar_mmr(CONSULTA, vetores, top_k=2, lambda_=0.3, redundancia_max=1.01)
+
+    assert so_relevancia == [0, 1]
+    assert com_diversidade == [0, 2]
+
+
+def test_limites():
+    assert selecionar_mmr(CONSULTA, [], top_k=3) == []
+    assert selecionar_mmr(CONSULTA, [_vetor(0)], top_k=0) == []
+    assert len(selecionar_mmr(CONSULTA, [_vetor(a) for a in (0, 45, 90, 135)], top_k=2, redundancia_max=1.01)) == 2
+
+
+def test_diversificar_remove_os_vetores():
+    matches = [{"id": str(i), "score": 1.0, "values": _vetor(a)} for i, a in enumerate((10, 10.5, -40))]
+
+    r = diversificar(CONSULTA, matches, top_k=3)
+
+    assert [m["id"] for m in r] == ["0", "2"]
+    assert all("values" not in m for m in r)
@@ -0,0 +1,62 @@
+# tests/test_pipeline.py
+"""
+Recuperação com intenção: com o classificador local confiante sai uma única
+consulta filtrada; a busca especulativa (todas as categorias) só acontece
+quando a intenção depende do LLM.
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+import services.intentService as intencao
+import services.pipelineService as pipeline
+from services.intentService import CATEGORIAS, centroides_por_categoria
+
+
+@pytest.fixture
+def falsos(servicos_falsos):
+    return servicos_falsos()
+
+
+def _com_centroides(monkeypatch, falsos):
+    vetores = np.asarray([falsos.vetores.vetor(c["content"]) for c in falsos.corpus], dtype="float32")
+    centroides = centroides_por_categoria(vetores, [c["categoria"] for c in falsos.corpus])
+    monkeypatch.setattr(intencao, "_obter_centroides", lambda: centroides)
+
+
+def _recuperar(pergunta):
+    return asyncio.run(pipeline.recuperar_com_intencao(pergunta, top_k=3))
+
+
+def test_classificacao_local_confiante_faz_uma_consulta(monkeypatch, falsos):
+    _com_centroides(monkeypatch, falsos)
+    monkeypatch.setattr(intencao, "INTENT_CONFIANCA_MIN", 0.0)
+
+    r = _recuperar("Regra 1 de Onboarding: o processo exige aprovação e registro.")
+
+    assert r["origem_intencao"] == "local"
+    assert r["categoria"] == "Onboarding"
+    assert falsos.indice.consultas == [{"categoria": {"$eq": "Onboarding"}}]
+
+
+def test_fallback_do_llm_especula_em_todas_as_categorias(monkeypatch, falsos):
+    _com_centroides(monkeypatch, falsos)
+    monkeypatch.setattr(intencao, "INTENT_CONFIANCA_MIN", 1.01)   # local nunca basta
+    monkeypatch.setattr(pipeline, "BUSCA_ESPECULATIVA", True)
+
+    r = _recuperar("Compliance: qual a regra?")
+
+    assert r["origem_intencao"] == "llm"
+    assert r["categoria"] == "Compliance"
+    assert len(falsos.indice.consultas) == len(CATEGORIAS)
+    assert r["trechos"] and all(t["metadata"]["categoria"] == "Compliance" for t in r["trechos"])
+
+
+def test_sem_centroides_o_llm_roda_junto_com_o_embedding(monkeypatch, falsos):
+    monkeypatch.setattr(intencao, "_obter_centroides", lambda: None)
+
+    r = _recuperar("Compliance: qual a regra?")
+
+    assert r["origem_intencao"] == "llm"
+    assert falsos.indice.consultas == [{"categoria": {"$eq": "Compliance"}}]
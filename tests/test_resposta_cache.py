@@ -0,0 +1,50 @@
+# tests/test_resposta_cache.py
+"""
+Cache semântico de respostas: só devolve a entrada quando o cosseno com a
+pergunta atinge o limiar, respeita a categoria e despeja a menos usada.
+"""
+import numpy as np
+
+from services.respostaCacheService import CacheRespostas
+
+
+def _vetor(angulo_graus):
+    a = np.radians(angulo_graus)
+    return [float(np.cos(a)), float(np.sin(a)), 0.0, 0.0]
+
+
+def test_limiar_de_similaridade():
+    cache = CacheRespostas(limiar=0.95, ttl_s=60, max_itens=10)
+    cache.guardar(_vetor(0), "Compliance", {"resposta": "r1"})
+
+    perto = cache.buscar(_vetor(15))          # cos 15° ≈ 0.966
+    longe = cache.buscar(_vetor(20))          # cos 20° ≈ 0.940
+
+    assert perto == {"resposta": "r1", "similaridade": 0.9659}
+    assert longe is None
+
+
+def test_categoria_e_melhor_candidato():
+    cache = CacheRespostas(limiar=0.9, ttl_s=60, max_itens=10)
+    cache.guardar(_vetor(0), "Compliance", {"resposta": "compliance"})
+    cache.guardar(_vetor(5), "Onboarding", {"resposta": "onboarding"})
+
+    assert cache.buscar(_vetor(4))["resposta"] == "onboarding"
+    assert cache.buscar(_vetor(4), "Compliance")["resposta"] == "compliance"
+    assert cache.buscar(_vetor(4), "Produtos e Serviços") is None
+
+
+def test_despejo_lru_e_ttl():
+    cache = CacheRespostas(limiar=0.99, ttl_s=60, max_itens=2)
+    for i, angulo in enumerate((0, 30, 60)):
+        if i == 2:
+            cache.buscar(_vetor(0))               # "0" volta a ser a mais recente
+        cache.guardar(_vetor(angulo), "C", {"resposta": angulo})
+
+    assert cache.buscar(_vetor(0))["resposta"] == 0
+    assert cache.buscar(_vetor(30)) is None       # menos usada: despejada
+    assert cache.estatisticas()["itens"] == 2
+
+    cache.ttl_s = -1
+    assert cache.buscar(_vetor(60)) is None
+    assert cache.estatisticas()["itens"] == 0
@@ -0,0 +1,48 @@
+# tests/test_sessao.py
+"""
+Memória de conversa em SQLite: ordem das mensagens, limite por sessão,
+expiração por inatividade e compartilhamento entre instâncias (workers).
+"""
+from services.sessionStoreService import SQLiteSessionStore
+
+
+def _mensagens(*textos):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": t} for i, t in enumerate(textos)]
+
+
+def test_guarda_em_ordem_e_mantem_so_as_ultimas(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessoes.sqlite"), max_mensagens=3)
+
+    store.append("s1", _mensagens("a", "b"))
+    store.append("s1", _mensagens("c", "d"))
+    store.append("s2", _mensagens("x"))
+
+    assert [m["content"] for m in store.get("s1")] == ["b", "c", "d"]
+    assert [m["content"] for m in store.get("s2")] == ["x"]
+    assert store.get("inexistente") == []
+
+
+def test_reset_e_expiracao(tmp_path):
+    caminho = str(tmp_path / "sessoes.sqlite")
+    store = SQLiteSessionStore(caminho)
+    store.append("s1", _mensagens("a"))
+    store.append("s2", _mensagens("b"))
+
+    store.reset("s1")
+    assert store.get("s1") == []
+
+    expirada = SQLiteSessionStore(caminho, ttl_s=-1)   # qualquer sessão já está ociosa
+    assert expirada.get("s2") == []
+    assert store.get("s2") == []                          # apagada no banco, não só na instância
+
+
+def test_workers_compartilham_o_banco(tmp_path):
+    caminho = str(tmp_path / "sessoes.sqlite")
+    worker_a = SQLiteSessionStore(caminho)
+    worker_b = SQLiteSessionStore(caminho)
+
+    worker_a.append("s1", _mensagens("pergunta", "resposta"))
+    worker_b.append("s1", _mensagens("outra pergunta"))
+
+    assert [m["content"] for m in worker_a.get("s1")] == ["pergunta", "resposta", "outra pergunta"]
+    assert worker_b.get("s1")[1] == {"role": "assistant", "content": "resposta"}
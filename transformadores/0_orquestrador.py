@@ -1,20 +1,266 @@
-import subprocess
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import functools
+import importlib.util
 
-def rodar_script(caminho):
-    print(f"\n--- Executando {caminho} ---")
-    resultado = subprocess.run(["python", caminho], capture_output=True, text=True)
-    print(resultado.stdout)
-    if resultado.stderr:
-        print("Erros:", resultado.stderr)
+# permite `python transformadores/0_orquestrador.py` a partir da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
 
-if __name__ == "__main__":
-    scripts = [
-        "transformadores/1_base_vetorial.py",
-        "transformadores/2_limparDados_GerarChunks.py",
-        "transformadores/3_limparChunks.py"
+# === Parâmetros (workers por etapa, tamanho das filas e dos lotes) ===
+PASTA_DOCUMENTOS = os.getenv("INGESTAO_PASTA", "documentos")
+ARQUIVO_SAIDA = os.getenv("INGESTAO_SAIDA", "chunks_limpos.jsonl")
+WORKERS_CHUNK = int(os.getenv("INGESTAO_WORKERS_CHUNK", "4"))
+WORKERS_LIMPEZA = int(os.getenv("INGESTAO_WORKERS_LIMPEZA", "8"))
+WORKERS_EMBED = int(os.getenv("INGESTAO_WORKERS_EMBED", "4"))
+WORKERS_UPSERT = int(os.getenv("INGESTAO_WORKERS_UPSERT", "2"))
+TAMANHO_FILA = int(os.getenv("INGESTAO_FILA", "256"))
+TAMANHO_LOTE = int(os.getenv("INGESTAO_LOTE", "50"))
+
+_FIM = object()
+
+
+def carregar_etapa(nome_arquivo):
+    """Importa um script numerado (ex.: 1_limparDados_GerarChunks.py) como módulo."""
+    caminho = os.path.join(RAIZ, "transformadores", nome_arquivo)
+    nome = "etapa_" + os.path.splitext(nome_arquivo)[0]
+    spec = importlib.util.spec_from_file_location(nome, caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo  # permite serializar funções do módulo (pools de processos)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+class Etapa:
+    """
+    Pool de threads que consome `entrada`, aplica `funcao` (que devolve um
+    iterável de saídas) e publica em `saida`. As filas são limitadas, então
+    uma etapa lenta segura as anteriores (backpressure) e a memória fica constante.
+    """
+
+    def __init__(self, nome, funcao, entrada, saida, workers):
+        self.nome = nome
+        self.funcao = funcao
+        self.entrada = entrada
+        self.saida = saida
+        self.processados = 0
+        self.falhas = 0
+        self._ativos = workers
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._rodar, name=f"{nome}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def iniciar(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def aguardar(self):
+        for t in self._threads:
+            t.join()
+
+    def _rodar(self):
+        while True:
+            item = self.entrada.get()
+            if item is _FIM:
+                self.entrada.put(_FIM)  # repassa o sinal aos outros workers da etapa
+                break
+            try:
+                for resultado in self.funcao(item) or ():
+                    if self.saida is not None:
+                        self.saida.put(resultado)
+                with self._lock:
+                    self.processados += 1
+            except Exception as e:
+                with self._lock:
+                    self.falhas += 1
+                print(f"❌ [{self.nome}] {e}")
+
+        with self._lock:
+            self._ativos -= 1
+            ultimo = self._ativos == 0
+        if ultimo and self.saida is not None:
+            self.saida.put(_FIM)
+
+
+class Loteador:
+    """Agrupa itens de `entrada` em listas de até `tamanho` para a próxima etapa."""
+
+    def __init__(self, entrada, saida, tamanho):
+        self.entrada = entrada
+        self.saida = saida
+        self.tamanho = tamanho
+        self._thread = threading.Thread(target=self._rodar, name="loteador", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def aguardar(self):
+        self._thread.join()
+
+    def _rodar(self):
+        lote = []
+        while True:
+            item = self.entrada.get()
+            if item is _FIM:
+                break
+            lote.append(item)
+            if len(lote) >= self.tamanho:
+                self.saida.put(lote)
+                lote = []
+        if lote:
+            self.saida.put(lote)
+        self.saida.put(_FIM)
+
+
+class Corpus:
+    """Chunks de todos os arquivos, refeitos a cada iteração: permite várias passadas sem guardar o corpus."""
+
+    def __init__(self, arquivos, gerar_chunks):
+        self.arquivos = arquivos
+        self.gerar_chunks = gerar_chunks
+
+    def __iter__(self):
+        for caminho in self.arquivos:
+            yield from self.gerar_chunks(caminho)
+
+
+def rodar_pipeline():
+    from services.dedupService import Deduplicador, PlanoDedup
+    from services.embeddingService import embed_lote, estatisticas
+    from services.retryService import com_retentativas, erro_retentavel_pinecone
+    from services.ruidoService import FiltroRuido
+    from services.vectorStoreService import (
+        VECTOR_BACKEND, VECTOR_STORE_DIR, ConstrutorIndiceLocal, marcar_nova_versao, obter_index,
+    )
+
+    chunker = carregar_etapa("1_limparDados_GerarChunks.py")
+    limpeza = carregar_etapa("2_limparChunks.py")
+    vetorial = carregar_etapa("3_base_vetorial.py")
+    # mesmo seletor da API: o Pinecone recebe upserts incrementais; o índice FAISS
+    # local não tem upsert e é reconstruído no fim (embeddings já estarão no cache)
+    local = VECTOR_BACKEND == "faiss"
+    index = None if local else obter_index()
+    # ids determinísticos: só chunks novos/alterados vão para embedding + upsert
+    existentes = set() if local else vetorial.listar_ids_indexados(index)
+    produzidos = set()
+
+    q_arquivos = queue.Queue(maxsize=TAMANHO_FILA)
+    q_chunks = queue.Queue(maxsize=TAMANHO_FILA)
+    q_limpos = queue.Queue(maxsize=TAMANHO_FILA)
+    q_lotes = queue.Queue(maxsize=max(1, TAMANHO_FILA // TAMANHO_LOTE))
+    q_vetores = queue.Queue(maxsize=max(1, TAMANHO_FILA // TAMANHO_LOTE))
+
+    saida_lock = threading.Lock()
+    # o arquivo final é lido pela API (BM25_CHUNKS_PATH): só é trocado no fim, inteiro
+    temporario = ARQUIVO_SAIDA + ".tmp"
+    f_saida = open(temporario, "w", encoding="utf-8")
+
+    def embedar(lote):
+        with saida_lock:
+            produzidos.update(c["id"] for c in lote)
+        novos = [c for c in lote if c["id"] not in existentes]
+        if not novos:
+            yield lote, []
+            return
+        embeddings = com_retentativas(embed_lote, [vetorial.preparar_texto(c) for c in novos], cliente=vetorial.client)
+        if local:
+            yield lote, []
+            return
+        yield lote, [vetorial.montar_vetor(c, e) for c, e in zip(novos, embeddings)]
+
+    def enviar(item):
+        lote, vetores = item
+        if vetores:
+            com_retentativas(index.upsert, vectors=vetores, retentavel=erro_retentavel_pinecone)
+        with saida_lock:
+            for chunk in lote:
+                f_saida.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        return ()
+
+    inicio = time.perf_counter()
+    arquivos = list(chunker.listar_arquivos(PASTA_DOCUMENTOS))
+    dedup = Deduplicador() if chunker.DEDUP_ATIVO else None
+    gerar_chunks = chunker.gerar_chunks_arquivo
+    if dedup is not None and (dedup.escopo == "corpus" or limpeza.LIMPEZA_MODO == "local"):
+        # primeira passada, em ordem, que só decide o destino de cada chunk (guarda
+        # assinaturas e títulos, não conteúdo): no escopo "corpus" os sobreviventes
+        # ainda recebem títulos de arquivos posteriores, e o filtro local refaz os
+        # chunks a cada passada, que não podem voltar ao deduplicador
+        plano = PlanoDedup(dedup)
+        for caminho in arquivos:
+            plano.registrar(caminho, chunker.gerar_chunks_arquivo(caminho))
+        gerar_chunks = functools.partial(chunker.gerar_chunks_planejados, plano=plano)
+    elif dedup is not None:
+        # escopo "arquivo": índices separados por fonte, seguro entre workers
+        gerar_chunks = functools.partial(chunker.gerar_chunks_deduplicados, dedup=dedup)
+
+    filtro = None
+    if limpeza.LIMPEZA_MODO == "local":
+        # o filtro precisa de agregados do corpus inteiro (centróides e vocabulário
+        # por categoria): duas passadas que refazem os chunks em vez de guardá-los
+        filtro = FiltroRuido(Corpus(arquivos, gerar_chunks))
+
+    etapas = [
+        Etapa("chunking", gerar_chunks, q_arquivos, q_chunks, WORKERS_CHUNK),
+        Etapa("limpeza", lambda r: [limpeza.limpar_registro(r, filtro)], q_chunks, q_limpos, WORKERS_LIMPEZA),
+        Loteador(q_limpos, q_lotes, TAMANHO_LOTE),
+        Etapa("embedding", embedar, q_lotes, q_vetores, WORKERS_EMBED),
+        Etapa("upsert", enviar, q_vetores, None, WORKERS_UPSERT),
     ]
+    for etapa in etapas:
+        etapa.iniciar()
+
+    for caminho in arquivos:
+        q_arquivos.put(caminho)
+    q_arquivos.put(_FIM)
 
-    for script in scripts:
-        rodar_script(script)
+    for etapa in etapas:
+        etapa.aguardar()
+    f_saida.close()
 
-    print("\n✅ Processamento finalizado!")
+    falhas = sum(e.falhas for e in etapas if isinstance(e, Etapa))
+    obsoletos = existentes - produzidos
+    if falhas:
+        print(f"⚠️ {falhas} falhas: {ARQUIVO_SAIDA} mantido; saída parcial em {temporario}")
+    if falhas and local:
+        print(f"⚠️ índice local em {VECTOR_STORE_DIR} mantido sem reconstrução")
+    elif falhas:
+        # um chunk que falhou não pode ser tomado como removido
+        print(f"⚠️ remoção de {len(obsoletos)} vetores obsoletos adiada para a próxima execução")
+    else:
+        if not local:
+            vetorial.remover_ids(index, obsoletos)
+            print(f"🧹 Vetores obsoletos removidos: {len(obsoletos)}")
+        # centróides, projeção 2D e (FAISS) índice local, em lotes lidos do arquivo;
+        # os embeddings já estão no cache
+        construtor = ConstrutorIndiceLocal(VECTOR_STORE_DIR) if local else None
+        total = vetorial.gerar_artefatos(temporario, construtor)
+        print(f"🗺️ Projeção 2D ({total} pontos) e centróides de intenção salvos")
+        if construtor is not None and total:
+            print(f"💾 Índice FAISS reconstruído em {VECTOR_STORE_DIR}: {construtor.total} vetores")
+        os.replace(temporario, ARQUIVO_SAIDA)
+    marcar_nova_versao()
+
+    duracao = time.perf_counter() - inicio
+    print(f"\n📄 Arquivos: {len(arquivos)} em {duracao:.1f}s")
+    for etapa in etapas:
+        if isinstance(etapa, Etapa):
+            print(f"   {etapa.nome:<10} processados={etapa.processados} falhas={etapa.falhas}")
+    if dedup is not None:
+        print(f"🧬 Deduplicação ({dedup.escopo}): {dedup.chunks_removidos} chunks e {dedup.sentencas_removidas} sentenças colapsados")
+    print("📦 Cache de embeddings:", estatisticas())
+    return not falhas
+
+
+if __name__ == "__main__":
+    if rodar_pipeline():
+        print(f"\n✅ Processamento finalizado! Chunks limpos em {ARQUIVO_SAIDA}")
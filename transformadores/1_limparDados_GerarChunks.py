@@ -1,21 +1,64 @@
 import os
+import sys
 import re
 import json
-from uuid import uuid4
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from nltk.tokenize import sent_tokenize
 from unidecode import unidecode
 import tiktoken
 import nltk
 
+# permite `python transformadores/1_limparDados_GerarChunks.py` a partir da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from services.dedupService import Deduplicador
+
 # Baixar tokenizer de frases 
-nltk.download('punkt')
+nltk.download('punkt', quiet=True)
 
 # Inicializar tokenizer do modelo da OpenAI
 tokenizer = tiktoken.get_encoding("cl100k_base")
 
+# Parâmetros do chunking
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "1000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))  # janela deslizante (0 = sem sobreposição)
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", str(os.cpu_count() or 1)))
+# perto do limite a soma incremental é conferida com a contagem exata do chunk
+MARGEM_CONTAGEM_EXATA = 16
+# colapsa chunks/sentenças quase idênticos entre documentos (MinHash/LSH)
+DEDUP_ATIVO = os.getenv("DEDUP_ATIVO", "1") == "1"
+
 def contar_tokens(texto):
     return len(tokenizer.encode(texto))
 
+def slug_fonte(caminho_arquivo):
+    nome = os.path.splitext(os.path.basename(caminho_arquivo))[0]
+    return re.sub(r"[^a-z0-9]+", "-", unidecode(nome).lower()).strip("-")
+
+def digest_chunk(chunk):
+    """Hash do conteúdo e dos metadados que vão ao índice: mudar qualquer um deles troca o id."""
+    campos = {
+        "content": chunk["content"],
+        "titulo": chunk.get("titulo", ""),
+        "categoria": chunk.get("categoria", ""),
+        "fonte": chunk.get("fonte", ""),
+        "titulos": chunk.get("titulos") or [chunk.get("titulo", "")],
+    }
+    serializado = json.dumps(campos, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()[:16]
+
+def id_chunk(caminho_arquivo, posicao, chunk):
+    """Id determinístico `<fonte>#<posição>#<hash>`: re-ingestões geram os mesmos ids."""
+    return f"{slug_fonte(caminho_arquivo)}#{posicao}#{digest_chunk(chunk)}"
+
+def reidentificar(chunk):
+    """Recalcula o hash do id depois que a deduplicação alterou conteúdo ou `titulos`."""
+    slug, posicao, _ = chunk["id"].split("#")
+    return {**chunk, "id": f"{slug}#{posicao}#{digest_chunk(chunk)}"}
+
 def limpar_texto(texto):
     texto = unidecode(texto)
     texto = texto.lower()
@@ -42,52 +85,166 @@ def extrair_metadados_e_conteudo(texto):
     texto_corpo = " ".join(corpo)
     return titulo, categoria, texto_corpo
 
-def dividir_em_chunks(texto, max_tokens=1000):
+def _posicoes(texto, sentencas):
+    """Offsets [inicio, fim) de cada sentença dentro de `texto`."""
+    posicoes = []
+    cursor = 0
+    for sentenca in sentencas:
+        inicio = texto.find(sentenca, cursor)
+        if inicio < 0:
+            inicio = cursor
+        posicoes.append((inicio, inicio + len(sentenca)))
+        cursor = inicio + len(sentenca)
+    return posicoes
+
+def segmentar(texto, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Agrupa sentenças em chunks de até `max_tokens`, somando os tokens de cada
+    sentença uma única vez (linear no tamanho do texto). Com `overlap_tokens` > 0,
+    cada chunk recomeça com as últimas sentenças do anterior que caibam nesse valor.
+    Retorna dicts {content, tokens, offset_inicio, offset_fim} (offsets no texto limpo).
+    """
     texto_limpo = limpar_texto(texto)
     sentencas = sent_tokenize(texto_limpo)
+    posicoes = _posicoes(texto_limpo, sentencas)
+
+    # tokens de " sentença" (quando anexada a um chunk) e de "sentença" (quando abre um chunk)
+    tokens_anexada = [contar_tokens(" " + s) for s in sentencas]
+    tokens_sozinha = {}
+
+    def sozinha(i):
+        if i not in tokens_sozinha:
+            tokens_sozinha[i] = contar_tokens(sentencas[i])
+        return tokens_sozinha[i]
+
+    def custo(indices, inicio_do_texto):
+        # o primeiro chunk do texto começa com espaço (mesma contagem do chunker original)
+        primeiro = tokens_anexada[indices[0]] if inicio_do_texto else sozinha(indices[0])
+        return primeiro + sum(tokens_anexada[i] for i in indices[1:])
+
+    def texto_de(indices, inicio_do_texto):
+        return (" " if inicio_do_texto else "") + " ".join(sentencas[i] for i in indices)
+
+    def emitir(indices):
+        content = " ".join(sentencas[i] for i in indices).strip()
+        return {
+            "content": content,
+            "tokens": contar_tokens(content),
+            "offset_inicio": posicoes[indices[0]][0],
+            "offset_fim": posicoes[indices[-1]][1],
+        }
 
     chunks = []
-    chunk_atual = ""
-    for sentenca in sentencas:
-        temp_chunk = chunk_atual + " " + sentenca
-        if contar_tokens(temp_chunk) <= max_tokens:
-            chunk_atual = temp_chunk
-        else:
-            if chunk_atual:
-                chunks.append(chunk_atual.strip())
-            chunk_atual = sentenca
-    if chunk_atual:
-        chunks.append(chunk_atual.strip())
+    atual = []          # índices das sentenças do chunk em construção
+    tokens_atual = 0
+    inicio_do_texto = True
+    for i in range(len(sentencas)):
+        candidato = tokens_atual + tokens_anexada[i]
+        if abs(candidato - max_tokens) <= MARGEM_CONTAGEM_EXATA:
+            candidato = contar_tokens(texto_de(atual + [i], inicio_do_texto))
+
+        if candidato <= max_tokens:
+            atual.append(i)
+            tokens_atual = candidato
+            continue
+
+        if atual:
+            chunks.append(emitir(atual))
+        inicio_do_texto = False
+
+        # sobreposição: sentenças finais do chunk anterior que somam até overlap_tokens
+        reaproveitadas = []
+        soma = 0
+        for j in reversed(atual if overlap_tokens > 0 else []):
+            soma += tokens_anexada[j]
+            if soma > overlap_tokens:
+                break
+            reaproveitadas.insert(0, j)
+        atual = reaproveitadas + [i]
+        while len(atual) > 1 and custo(atual, False) > max_tokens:
+            atual.pop(0)
+        tokens_atual = custo(atual, False)
+
+    if atual:
+        chunks.append(emitir(atual))
     return chunks
 
-def processar_pasta(pasta_entrada, caminho_saida_jsonl):
-    jsonl_final = []
-
-    for nome_arquivo in os.listdir(pasta_entrada):
+def dividir_em_chunks(texto, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    return [c["content"] for c in segmentar(texto, max_tokens, overlap_tokens)]
+
+def gerar_chunks_arquivo(caminho_arquivo):
+    with open(caminho_arquivo, "r", encoding="utf-8") as f:
+        texto = f.read()
+
+    titulo, categoria, corpo = extrair_metadados_e_conteudo(texto)
+    if not corpo.strip():
+        return
+
+    fonte = os.path.basename(caminho_arquivo)
+    for posicao, chunk in enumerate(segmentar(corpo)):
+        item = {
+            "fonte": fonte,
+            "titulo": titulo,
+            "categoria": categoria,
+            "content": chunk["content"],
+            "tokens": chunk["tokens"],
+            "offset_inicio": chunk["offset_inicio"],
+            "offset_fim": chunk["offset_fim"]
+        }
+        yield {"id": id_chunk(caminho_arquivo, posicao, item), **item}
+
+def _recontar(item, novo):
+    if novo["content"] != item["content"]:
+        novo["tokens"] = contar_tokens(novo["content"])
+    return novo
+
+def deduplicar_chunks(chunks, dedup):
+    """Sobreviventes de `chunks` ao `dedup`; os ids ficam para `reidentificar`."""
+    for item in chunks:
+        novo = dedup.adicionar(item)
+        if novo is not None:
+            yield _recontar(item, novo)
+
+def gerar_chunks_deduplicados(caminho_arquivo, dedup):
+    """Escopo "arquivo": nenhum outro arquivo altera estes chunks, então os ids já saem finais."""
+    return [reidentificar(c) for c in deduplicar_chunks(gerar_chunks_arquivo(caminho_arquivo), dedup)]
+
+def gerar_chunks_planejados(caminho_arquivo, plano):
+    """Segunda passada de um `PlanoDedup`: refaz os chunks do arquivo e aplica as decisões já tomadas (ids finais)."""
+    itens = gerar_chunks_arquivo(caminho_arquivo)
+    return [reidentificar(_recontar(item, novo)) for item, novo in plano.aplicar(caminho_arquivo, itens)]
+
+def _chunks_do_arquivo(caminho_arquivo):
+    # executado nos processos do pool: devolve a lista (geradores não são serializáveis)
+    return list(gerar_chunks_arquivo(caminho_arquivo))
+
+def listar_arquivos(pasta_entrada):
+    for nome_arquivo in sorted(os.listdir(pasta_entrada)):
         if nome_arquivo.endswith(".txt"):
-            caminho_arquivo = os.path.join(pasta_entrada, nome_arquivo)
-            with open(caminho_arquivo, "r", encoding="utf-8") as f:
-                texto = f.read()
-
-            titulo, categoria, corpo = extrair_metadados_e_conteudo(texto)
-            if not corpo.strip():
-                continue
-
-            chunks = dividir_em_chunks(corpo)
-
-            for chunk in chunks:
-                jsonl_final.append({
-                    "id": str(uuid4()),
-                    "titulo": titulo,
-                    "categoria": categoria,
-                    "content": chunk
-                })
-
+            yield os.path.join(pasta_entrada, nome_arquivo)
+
+def processar_pasta(pasta_entrada, caminho_saida_jsonl, workers=CHUNK_WORKERS):
+    arquivos = list(listar_arquivos(pasta_entrada))
+    dedup = Deduplicador() if DEDUP_ATIVO else None
+    saida = []
+
+    # arquivos distribuídos entre processos; `map` preserva a ordem de saída
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for itens in pool.map(_chunks_do_arquivo, arquivos):
+            saida.extend(itens if dedup is None else deduplicar_chunks(itens, dedup))
+
+    # ids e gravação só no fim: no escopo "corpus", sobreviventes ainda recebem
+    # títulos de duplicatas em arquivos posteriores
+    if dedup is not None:
+        saida = [reidentificar(item) for item in saida]
     with open(caminho_saida_jsonl, "w", encoding="utf-8") as f_out:
-        for item in jsonl_final:
+        for item in saida:
             f_out.write(json.dumps(item, ensure_ascii=False) + "\n")
 
-    print(f"✅ Gerado: {caminho_saida_jsonl} com {len(jsonl_final)} chunks")
+    print(f"✅ Gerado: {caminho_saida_jsonl} com {len(saida)} chunks")
+    if dedup is not None:
+        print(f"🧬 Deduplicação: {dedup.chunks_removidos} chunks e {dedup.sentencas_removidas} sentenças colapsados")
 
 # 🔧 Execute o processamento
-processar_pasta("documentos", "chunks_com_metadados_ate_1000_tokens.jsonl")
+if __name__ == "__main__":
+    processar_pasta("documentos", "chunks_com_metadados_ate_1000_tokens.jsonl")
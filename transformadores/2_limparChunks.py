@@ -1,25 +1,44 @@
 import os
+import sys
 import json
 import re
-from openai import OpenAI
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
-# === 1. Carregar chave da OpenAI do .env ===
+# permite `python transformadores/2_limparChunks.py` a partir da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from services.clientService import get_openai
+from services.retryService import com_retentativas
+from services.ruidoService import FiltroRuido, MANTER, AMBIGUA
+
+# === 1. Carregar variáveis de ambiente ===
 load_dotenv()
-api_key = os.getenv("api_key_openIA")
 
-# === 2. Inicializar cliente OpenAI ===
-client = OpenAI(api_key=api_key)
+# === 2. Cliente OpenAI compartilhado (pool de conexões) ===
+# sem retentativas do SDK: `com_retentativas` já repete 429/5xx com backoff
+client = get_openai().with_options(max_retries=0)
 
 # === 3. Parâmetros ===
 ARQUIVO_ENTRADA = "chunks_com_metadados_ate_1000_tokens.jsonl"
 ARQUIVO_SAIDA = "chunks_limpos.jsonl"
+ARQUIVO_CHECKPOINT = ARQUIVO_SAIDA + ".parcial"  # registros já limpos da execução atual
 MODELO = "gpt-3.5-turbo"
 TEMPERATURE = 0.0
-
-# === 4. Função para limpar chunk com OpenAI API v1 ===
-def limpar_chunk(content, categoria):
-    prompt = f"""
+LIMPEZA_CONCORRENCIA = int(os.getenv("LIMPEZA_CONCORRENCIA", "8"))
+LIMPEZA_CACHE_PATH = os.getenv("LIMPEZA_CACHE_PATH", os.path.join(".cache", "limpeza.sqlite"))
+# "llm": todo chunk passa pelo LLM | "local": filtro local e LLM só para sentenças ambíguas
+LIMPEZA_MODO = os.getenv("LIMPEZA_MODO", "llm").strip().lower()
+if LIMPEZA_MODO not in ("llm", "local"):
+    raise ValueError(f"LIMPEZA_MODO inválido: {LIMPEZA_MODO} (use llm ou local)")
+
+SYSTEM_MSG = "Você é um assistente que limpa textos técnicos."
+PROMPT = """
 Você é um assistente que filtra ruídos e frases sem sentido em textos técnicos.
 
 Texto original:
@@ -29,19 +48,71 @@ Categoria: {categoria}
 
 Remova quaisquer frases ou trechos que não façam sentido, estejam fora de contexto ou sejam ruído (ex: 'banana azul voadora', números aleatórios, frases irrelevantes). Retorne apenas o conteúdo útil e relevante.
 """
-    try:
-        response = client.chat.completions.create(
-            model=MODELO,
-            messages=[
-                {"role": "system", "content": "Você é um assistente que limpa textos técnicos."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=TEMPERATURE
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print("❌ Erro com a OpenAI:", e)
-        return content  # fallback: retorna original
+PROMPT_SENTENCA = """
+A frase abaixo pertence a um documento técnico da categoria "{categoria}".
+
+Frase: \"\"\"{content}\"\"\"
+
+Ela é ruído (sem sentido, fora de contexto, irrelevante ou texto de teste)? Responda apenas RUIDO ou UTIL.
+"""
+
+# === 4. Cache das respostas do LLM: hash(content, categoria, modelo, prompt) → texto ===
+class CacheLimpeza:
+    def __init__(self, caminho):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS limpeza (chave TEXT PRIMARY KEY, texto TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get(self, chave):
+        with self._lock:
+            linha = self._conn.execute("SELECT texto FROM limpeza WHERE chave = ?", (chave,)).fetchone()
+        return linha[0] if linha else None
+
+    def put(self, chave, texto):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO limpeza (chave, texto) VALUES (?, ?)", (chave, texto))
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def obter_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheLimpeza(LIMPEZA_CACHE_PATH)
+        return _cache
+
+def chave_limpeza(content, categoria, prompt=PROMPT):
+    bruto = json.dumps([content, categoria, MODELO, TEMPERATURE, SYSTEM_MSG, prompt], ensure_ascii=False)
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+# === 4.1 Limpar chunk com a OpenAI (cacheado; erros são propagados após as retentativas) ===
+def limpar_chunk(content, categoria, prompt=PROMPT):
+    cache = obter_cache()
+    chave = chave_limpeza(content, categoria, prompt)
+    texto = cache.get(chave)
+    if texto is not None:
+        return texto
+
+    response = com_retentativas(
+        client.chat.completions.create,
+        model=MODELO,
+        messages=[
+            {"role": "system", "content": SYSTEM_MSG},
+            {"role": "user", "content": prompt.format(content=content, categoria=categoria)}
+        ],
+        temperature=TEMPERATURE
+    )
+    texto = response.choices[0].message.content.strip()
+    cache.put(chave, texto)
+    return texto
 
 # === 5. Função de pós-processamento ===
 def posprocessar(texto):
@@ -66,20 +137,81 @@ def posprocessar(texto):
     return texto.strip()
 
 
-# === 6. Processar o arquivo ===
-with open(ARQUIVO_ENTRADA, "r", encoding="utf-8") as f_in, \
-     open(ARQUIVO_SAIDA, "w", encoding="utf-8") as f_out:
-
-    for linha in f_in:
-        registro = json.loads(linha)
-        original = registro["content"]
-        categoria = registro.get("categoria", "")
-
-        print(f"🔍 Limpando chunk da categoria: {categoria}")
-        texto_limpo = limpar_chunk(original, categoria)
-        texto_limpo = posprocessar(texto_limpo)
-        registro["content"] = texto_limpo
-
-        f_out.write(json.dumps(registro, ensure_ascii=False) + "\n")
-
-print(f"\n✅ Processo finalizado. Arquivo salvo: {ARQUIVO_SAIDA}")
+# === 6. Limpar um registro (chunk) ===
+def sentenca_e_ruido(sentenca, categoria):
+    return limpar_chunk(sentenca, categoria, PROMPT_SENTENCA).upper().startswith("RUIDO")
+
+def limpar_registro(registro, filtro=None):
+    categoria = registro.get("categoria", "")
+    if filtro is None:
+        texto_limpo = limpar_chunk(registro["content"], categoria)
+        return {**registro, "content": posprocessar(texto_limpo)}
+
+    # caminho rápido: o filtro local decide; o LLM só desempata as ambíguas
+    mantidas = [
+        d["sentenca"] for d in filtro.decisoes(registro)
+        if d["decisao"] == MANTER
+        or (d["decisao"] == AMBIGUA and not sentenca_e_ruido(d["sentenca"], categoria))
+    ]
+    return {**registro, "content": posprocessar(" ".join(mantidas))}
+
+
+# === 7. Checkpoint por id de chunk ===
+def carregar_checkpoint(caminho=ARQUIVO_CHECKPOINT):
+    feitos = {}
+    if os.path.exists(caminho):
+        with open(caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue  # última linha truncada por uma interrupção
+                feitos[registro["id"]] = registro
+    return feitos
+
+
+# === 8. Processar o arquivo (concorrente e retomável) ===
+def processar_arquivo(entrada=ARQUIVO_ENTRADA, saida=ARQUIVO_SAIDA, checkpoint=ARQUIVO_CHECKPOINT):
+    with open(entrada, "r", encoding="utf-8") as f_in:
+        registros = [json.loads(linha) for linha in f_in]
+
+    # o filtro local precisa do corpus inteiro (centróides e vocabulário por categoria)
+    filtro = FiltroRuido(registros) if LIMPEZA_MODO == "local" else None
+
+    feitos = carregar_checkpoint(checkpoint)
+    pendentes = [r for r in registros if r["id"] not in feitos]
+    print(f"🔍 {len(registros)} chunks | {len(feitos)} já limpos (checkpoint) | {len(pendentes)} pendentes")
+
+    falhas = 0
+    with open(checkpoint, "a", encoding="utf-8") as f_ck, \
+         ThreadPoolExecutor(LIMPEZA_CONCORRENCIA) as pool:
+        futuros = {pool.submit(limpar_registro, r, filtro): r for r in pendentes}
+        for i, futuro in enumerate(as_completed(futuros), start=1):
+            original = futuros[futuro]
+            try:
+                registro = futuro.result()
+            except Exception as e:
+                falhas += 1
+                print(f"❌ Erro ao limpar chunk {original['id']}: {e}")
+                continue
+            feitos[registro["id"]] = registro
+            f_ck.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            f_ck.flush()
+            if i % 50 == 0:
+                print(f"   {i}/{len(pendentes)} limpos")
+
+    if falhas:
+        print(f"⚠️ {falhas} chunks falharam; rode novamente para retomar do checkpoint ({checkpoint}).")
+        return False
+
+    # saída final na ordem original de entrada
+    with open(saida, "w", encoding="utf-8") as f_out:
+        for r in registros:
+            f_out.write(json.dumps(feitos[r["id"]], ensure_ascii=False) + "\n")
+    os.remove(checkpoint)
+    return True
+
+
+if __name__ == "__main__":
+    if processar_arquivo():
+        print(f"\n✅ Processo finalizado. Arquivo salvo: {ARQUIVO_SAIDA}")
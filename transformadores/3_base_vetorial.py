@@ -1,54 +1,209 @@
 import os
+import sys
 import json
-import openai
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from tqdm import tqdm
 from dotenv import load_dotenv
+
+# permite `python transformadores/3_base_vetorial.py` a partir da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
 from services.authenticationService import autentication_pinecone
+from services.clientService import get_openai
+from services.embeddingService import embed, embed_lote, estatisticas, lotes_por_tokens
+from services.intentService import AcumuladorCentroides
+from services.projecaoService import AcumuladorPCA, salvar_projecao_em_lotes
+from services.retryService import com_retentativas, erro_retentavel_pinecone
+from services.vectorStoreService import marcar_nova_versao
 
 # === 1. Carregar variáveis de ambiente ===
 load_dotenv()
-openai.api_key = os.getenv("api_key_openIA")
 
-# === 2. Inicializar cliente Pinecone ===
-pc = autentication_pinecone()
+# === 2. Parâmetros ===
 INDEX_NAME = "testeanalistasr"
-index = pc.Index(INDEX_NAME)
-
-# === 3. Carregar chunks do JSONL ===
 ARQUIVO_JSONL = "chunks_limpos.jsonl"
-with open(ARQUIVO_JSONL, "r", encoding="utf-8") as f:
-    chunks = [json.loads(linha) for linha in f]
+BATCH_SIZE = 50  # vetores por upsert no Pinecone
+EMBED_CONCORRENCIA = int(os.getenv("EMBED_CONCORRENCIA", "4"))    # lotes de embedding em paralelo
+UPSERT_CONCORRENCIA = int(os.getenv("UPSERT_CONCORRENCIA", "4"))  # upserts em paralelo
+ARTEFATOS_LOTE = int(os.getenv("ARTEFATOS_LOTE", "1000"))          # chunks por lote ao gerar centróides/projeção
+# sem retentativas do SDK: `com_retentativas` já repete 429/5xx dos embeddings com backoff
+client = get_openai().with_options(max_retries=0)
 
-# === 4. Função para gerar embedding ===
-def gerar_embedding(texto):
-    response = openai.embeddings.create(
-        model="text-embedding-3-small",
-        input=texto
-    )
-    return response.data[0].embedding
+# === 3. Inicializar índice Pinecone ===
+def obter_indice():
+    pc = autentication_pinecone()
+    return pc.Index(INDEX_NAME)
 
-# === 5. Processar e enviar em lotes ===
-BATCH_SIZE = 50
-lote = []
+# === 4. Função para gerar embedding (com cache: re-ingestões não repetem chamadas) ===
+def gerar_embedding(texto):
+    return embed(texto)
 
-for i, chunk in enumerate(tqdm(chunks, desc="🔁 Enviando para Pinecone")):
-    texto = chunk["content"].replace('"', '').strip()
-    embedding = gerar_embedding(texto)
+# === 5. Montar o vetor no formato do Pinecone ===
+def preparar_texto(chunk):
+    return chunk["content"].replace('"', '').strip()
 
-    vetor = {
+def montar_vetor(chunk, embedding):
+    texto = preparar_texto(chunk)
+    return {
         "id": chunk["id"],
         "values": embedding,
         "metadata": {
             "titulo": chunk["titulo"],
             "categoria": chunk["categoria"],
+            "fonte": chunk.get("fonte", ""),
+            "titulos": chunk.get("titulos") or [chunk["titulo"]],
             "content": texto  # ✅ agora salvamos o conteúdo original
         }
     }
 
-    lote.append(vetor)
+# === 6. Embeddings em lotes por tokens + upserts concorrentes ===
+def enviar_chunks(index, chunks):
+    """
+    Agrupa os chunks em requisições de embedding limitadas por tokens, mantém
+    vários lotes de embedding e de upsert em voo ao mesmo tempo e repete com
+    backoff exponencial em 429/5xx. Retorna o total de vetores enviados.
+    """
+    textos = [preparar_texto(c) for c in chunks]
+    lotes = lotes_por_tokens(textos)
+    total_tokens = sum(t for _, _, t in lotes)
+
+    progresso = tqdm(total=len(chunks), desc="🔁 Enviando para Pinecone")
+    lock = threading.Lock()
+    enviados = {"chunks": 0, "tokens": 0}
+    inicio = time.perf_counter()
+
+    def subir(vetores, tokens):
+        com_retentativas(index.upsert, vectors=vetores, retentavel=erro_retentavel_pinecone)
+        with lock:
+            enviados["chunks"] += len(vetores)
+            enviados["tokens"] += tokens
+            duracao = max(time.perf_counter() - inicio, 1e-9)
+            progresso.update(len(vetores))
+            progresso.set_postfix(
+                chunks_s=f"{enviados['chunks'] / duracao:.1f}",
+                tokens_s=f"{enviados['tokens'] / duracao:.0f}",
+            )
+
+    with ThreadPoolExecutor(EMBED_CONCORRENCIA) as pool_embed, \
+            ThreadPoolExecutor(UPSERT_CONCORRENCIA) as pool_upsert:
+
+        def embedar(ini, fim, tokens):
+            embeddings = com_retentativas(embed_lote, textos[ini:fim], cliente=client)
+            vetores = [montar_vetor(c, e) for c, e in zip(chunks[ini:fim], embeddings)]
+            # tokens do lote rateados entre as partes do upsert, só para o relatório
+            return [
+                pool_upsert.submit(subir, vetores[j:j + BATCH_SIZE], tokens * len(vetores[j:j + BATCH_SIZE]) // len(vetores))
+                for j in range(0, len(vetores), BATCH_SIZE)
+            ]
+
+        futuros_embed = [pool_embed.submit(embedar, *lote) for lote in lotes]
+        for futuro in futuros_embed:
+            for futuro_upsert in futuro.result():
+                futuro_upsert.result()
 
-    if len(lote) == BATCH_SIZE or i == len(chunks) - 1:
-        index.upsert(vectors=lote)
+    progresso.close()
+    duracao = time.perf_counter() - inicio
+    print(
+        f"⏱️ {len(chunks)} chunks / {total_tokens} tokens em {duracao:.1f}s "
+        f"({len(chunks) / max(duracao, 1e-9):.1f} chunks/s, {total_tokens / max(duracao, 1e-9):.0f} tokens/s, "
+        f"{len(lotes)} requisições de embedding)"
+    )
+    return len(chunks)
+
+# === 7. Sincronização por diferença (ids determinísticos: fonte#posição#hash) ===
+def listar_ids_indexados(index, prefixo=None):
+    ids = set()
+    token = None
+    while True:
+        pagina = com_retentativas(
+            index.list_paginated, prefix=prefixo, pagination_token=token, retentavel=erro_retentavel_pinecone
+        )
+        ids.update(v.id for v in pagina.vectors)
+        token = pagina.pagination.next if pagina.pagination else None
+        if not token:
+            return ids
+
+def remover_ids(index, ids, lote=1000):
+    ids = sorted(ids)
+    for i in range(0, len(ids), lote):
+        com_retentativas(index.delete, ids=ids[i:i + lote], retentavel=erro_retentavel_pinecone)
+
+def sincronizar(index, chunks):
+    """
+    Compara os chunks gerados com os ids já indexados: envia só os novos/alterados
+    (um conteúdo alterado gera outro id) e remove os que não existem mais.
+    Retorna (enviados, removidos).
+    """
+    existentes = listar_ids_indexados(index)
+    atuais = {c["id"] for c in chunks}
+    novos = [c for c in chunks if c["id"] not in existentes]
+    obsoletos = existentes - atuais
+    print(f"🔄 {len(atuais)} chunks | {len(existentes)} já indexados | {len(novos)} para enviar | {len(obsoletos)} para remover")
+
+    if novos:
+        enviar_chunks(index, novos)
+    remover_ids(index, obsoletos)
+    return len(novos), len(obsoletos)
+
+# === 8. Artefatos derivados do corpus: mapa 2D (base PCA ajustada uma vez) e centróides de intenção ===
+def embeddings_do_corpus(chunks):
+    """Embeddings dos chunks, na ordem (saem do cache após o envio)."""
+    textos = [preparar_texto(c) for c in chunks]
+    embeddings = []
+    for ini, fim, _ in lotes_por_tokens(textos):
+        embeddings.extend(com_retentativas(embed_lote, textos[ini:fim], cliente=client))
+    return embeddings
+
+def lotes_do_corpus(caminho, tamanho=ARTEFATOS_LOTE):
+    """(chunks, embeddings) de `caminho` em lotes: memória constante, embeddings do cache."""
+    with open(caminho, "r", encoding="utf-8") as f:
         lote = []
+        for linha in f:
+            lote.append(json.loads(linha))
+            if len(lote) == tamanho:
+                yield lote, np.asarray(embeddings_do_corpus(lote), dtype="float32")
+                lote = []
+        if lote:
+            yield lote, np.asarray(embeddings_do_corpus(lote), dtype="float32")
+
+def gerar_artefatos(caminho, construtor=None):
+    """
+    Grava centróides de intenção e projeção 2D dos chunks em `caminho` (JSONL),
+    lendo em lotes: uma passada acumula centróides e média/covariância da PCA
+    (e alimenta o `construtor` do índice local, se houver); a segunda projeta.
+    Chame antes de `marcar_nova_versao`. Retorna a quantidade de chunks.
+    """
+    centroides = AcumuladorCentroides()
+    pca = AcumuladorPCA()
+    for chunks, embeddings in lotes_do_corpus(caminho):
+        centroides.adicionar(embeddings, [c.get("categoria", "") for c in chunks])
+        pca.adicionar(embeddings)
+        if construtor is not None:
+            construtor.adicionar([{**c, "content": preparar_texto(c)} for c in chunks], embeddings)
+    if not pca.n:
+        return 0
+    centroides.salvar()
+    salvar_projecao_em_lotes(pca.base(), lotes_do_corpus(caminho), pca.n)
+    if construtor is not None:
+        construtor.finalizar()
+    return pca.n
+
+# === 9. Processar e enviar ===
+if __name__ == "__main__":
+    index = obter_indice()
+
+    with open(ARQUIVO_JSONL, "r", encoding="utf-8") as f:
+        chunks = [json.loads(linha) for linha in f]
+
+    sincronizar(index, chunks)
+    del chunks
+    print(f"🗺️ Projeção 2D e centróides de intenção salvos para {gerar_artefatos(ARQUIVO_JSONL)} chunks")
 
-print("✅ Vetores enviados com sucesso para o índice:", INDEX_NAME)
+    marcar_nova_versao()  # invalida o cache semântico de respostas da API
+    print("✅ Vetores enviados com sucesso para o índice:", INDEX_NAME)
+    print("📦 Cache de embeddings:", estatisticas())
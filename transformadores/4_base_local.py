@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+from tqdm import tqdm
+from dotenv import load_dotenv
+
+# permite `python transformadores/4_base_local.py` a partir da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from services.embeddingService import embed_lote
+from services.intentService import salvar_centroides
+from services.vectorStoreService import construir_indice_local, VECTOR_STORE_DIR
+from services.projecaoService import salvar_projecao
+
+# === 1. Carregar variáveis de ambiente ===
+load_dotenv()
+
+# === 2. Carregar chunks do JSONL ===
+ARQUIVO_JSONL = "chunks_limpos.jsonl"
+with open(ARQUIVO_JSONL, "r", encoding="utf-8") as f:
+    chunks = [json.loads(linha) for linha in f]
+
+for chunk in chunks:
+    chunk["content"] = chunk["content"].replace('"', '').strip()
+
+# === 3. Gerar embeddings em lotes ===
+BATCH_SIZE = 100
+embeddings = []
+
+for i in tqdm(range(0, len(chunks), BATCH_SIZE), desc="🔁 Gerando embeddings"):
+    lote = [c["content"] for c in chunks[i:i + BATCH_SIZE]]
+    embeddings.extend(embed_lote(lote))
+
+# === 4. Centróides de intenção (antes do índice: a nova versão do índice faz a API relê-los) ===
+salvar_centroides(chunks, embeddings)
+
+# === 5. Persistir índice FAISS (global + por categoria) ===
+total = construir_indice_local(chunks, embeddings, VECTOR_STORE_DIR)
+
+# === 6. Base 2D (PCA) + mapa do corpus para /api/viz ===
+salvar_projecao(chunks, embeddings)
+
+print(f"✅ Índice local salvo em '{VECTOR_STORE_DIR}' com {total} vetores. Use VECTOR_BACKEND=faiss para ativá-lo.")
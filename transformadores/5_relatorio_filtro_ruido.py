@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+from dotenv import load_dotenv
+
+# permite `python transformadores/5_relatorio_filtro_ruido.py` a partir da raiz do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from services.ruidoService import FiltroRuido, avaliar_filtro
+
+# === 1. Carregar variáveis de ambiente ===
+load_dotenv()
+
+# === 2. Parâmetros ===
+ARQUIVO_BRUTO = "chunks_com_metadados_ate_1000_tokens.jsonl"  # saída do chunking (antes da limpeza)
+ARQUIVO_REFERENCIA = "chunks_limpos.jsonl"                     # limpeza feita pelo LLM
+
+# === 3. Comparar o filtro local com a limpeza do LLM ===
+if __name__ == "__main__":
+    with open(ARQUIVO_BRUTO, "r", encoding="utf-8") as f:
+        registros = [json.loads(linha) for linha in f]
+    with open(ARQUIVO_REFERENCIA, "r", encoding="utf-8") as f:
+        referencia = {r["id"]: r["content"] for r in map(json.loads, f)}
+
+    filtro = FiltroRuido(registros)
+    relatorio = avaliar_filtro(filtro, registros, referencia)
+
+    print("📊 Filtro local de ruído vs. limpeza do LLM")
+    for chave, valor in relatorio.items():
+        print(f"   {chave:<20} {valor}")
+
+    print("\n🔎 Sentenças descartadas localmente:")
+    for r in registros:
+        for d in filtro.decisoes(r):
+            if d["decisao"] == "descartar":
+                print(f"   z={d['z']:>7} | {d['sentenca'][:100]}")